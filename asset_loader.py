@@ -0,0 +1,262 @@
+# ── stdlib
+import math
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+# ── Qt
+from PySide6.QtCore import QObject, QRect, QSize, Qt, QThread, QTimer, Signal, Slot
+from PySide6.QtGui import QColor, QImage, QPainter, QPixmap, QPixmapCache
+from PySide6.QtWidgets import QWidget
+
+from core.metrics import get_metrics
+
+_APP_START = time.perf_counter()
+
+
+def size_bucket(size: QSize, step: int) -> QSize:
+    """Round *size* up to a multiple of *step* so small resizes reuse one variant."""
+    return QSize(max(step, math.ceil(size.width() / step) * step),
+                 max(step, math.ceil(size.height() / step) * step))
+
+
+def cache_key(path: str, size: QSize, dpr: float, mode: str) -> str:
+    return f"asset:{path}@{size.width()}x{size.height()}@{dpr:g}:{mode}"
+
+
+# ════════════════════════════════════════════════════════════════════
+# AssetWorker (decode + scale off the GUI thread)
+# ════════════════════════════════════════════════════════════════════
+class AssetWorker(QObject):
+    """Decodes each source image once and scales it to requested variants."""
+
+    loaded = Signal(str, QImage)      # cache key, scaled image (dpr already set)
+    failed = Signal(str, str)         # cache key, error
+
+    MAX_SOURCES = 4                   # decoded full-size images kept (background + recent illustrations)
+
+    def __init__(self):
+        super().__init__()
+        self._sources: "OrderedDict[str, QImage]" = OrderedDict()   # path -> decoded full-size image
+
+    @Slot(dict)
+    def doWork(self, job: dict):
+        """*job* keys: key, path, size (QSize, logical), dpr, mode ("cover" | "fit")."""
+        try:
+            src = self._sources.get(job["path"])
+            if src is None:
+                src = QImage(job["path"])
+                if src.isNull():
+                    raise OSError(f"cannot decode {job['path']}")
+                # Converting once up front keeps later scales and paints on the fast path
+                src = src.convertToFormat(QImage.Format.Format_RGB32 if not src.hasAlphaChannel()
+                                          else QImage.Format.Format_ARGB32_Premultiplied)
+                self._sources[job["path"]] = src
+                while len(self._sources) > self.MAX_SOURCES:
+                    self._sources.popitem(last=False)
+            else:
+                self._sources.move_to_end(job["path"])
+
+            dpr = job["dpr"]
+            target = job["size"] * dpr
+            if job["mode"] == "cover":
+                aspect = Qt.AspectRatioMode.KeepAspectRatioByExpanding
+            else:
+                aspect = Qt.AspectRatioMode.KeepAspectRatio
+            img = src.scaled(target, aspect, Qt.TransformationMode.SmoothTransformation)
+            img.setDevicePixelRatio(dpr)
+            self.loaded.emit(job["key"], img)
+        except Exception as e:
+            print(f"[AssetWorker] Error loading asset: {e}")
+            self.failed.emit(job["key"], str(e))
+
+
+# ════════════════════════════════════════════════════════════════════
+# AssetLoader (thread wrapper + QPixmapCache front)
+# ════════════════════════════════════════════════════════════════════
+class AssetLoader(QObject):
+    """
+    Pre-scaled image variants keyed by path, size bucket and device pixel
+    ratio.  cached() is a QPixmapCache lookup; request() queues a decode
+    on the worker thread and calls back on the GUI thread once the
+    variant is in the cache.  Requests for a key already in flight are
+    merged.
+    """
+
+    operate = Signal(dict)
+
+    def __init__(self, cache_limit_mb: int = 64, bucket: int = 128):
+        super().__init__()
+        self.bucket = bucket
+        # A full-window variant at 2x DPR is ~30 MB; the 10 MB default would evict it immediately
+        QPixmapCache.setCacheLimit(max(QPixmapCache.cacheLimit(), cache_limit_mb * 1024))
+        self._waiting: Dict[str, List[Callable[[QPixmap], None]]] = {}
+
+        self.workerThread = QThread()
+        self.worker = AssetWorker()
+        self.worker.moveToThread(self.workerThread)
+        self.workerThread.finished.connect(self.worker.deleteLater)
+        self.operate.connect(self.worker.doWork)
+        self.worker.loaded.connect(self._on_loaded)
+        self.worker.failed.connect(self._on_failed)
+        self.workerThread.start(QThread.Priority.LowPriority)
+
+    def variant_key(self, path: str, size: QSize, dpr: float, mode: str = "cover") -> Tuple[str, QSize]:
+        # "cover" (backgrounds) follows window resizes, so sizes are bucketed; "fit" is exact
+        bucket = size_bucket(size, self.bucket) if mode == "cover" else size
+        return cache_key(path, bucket, dpr, mode), bucket
+
+    def cached(self, path: str, size: QSize, dpr: float, mode: str = "cover") -> Optional[QPixmap]:
+        key, _ = self.variant_key(path, size, dpr, mode)
+        pixmap = QPixmapCache.find(key)
+        return pixmap if pixmap is not None and not pixmap.isNull() else None
+
+    def request(self, path: str, size: QSize, dpr: float, callback: Callable[[QPixmap], None],
+                mode: str = "cover") -> None:
+        key, bucket = self.variant_key(path, size, dpr, mode)
+        pixmap = QPixmapCache.find(key)
+        if pixmap is not None and not pixmap.isNull():
+            get_metrics().counter("cache_hits_total", "Cache hits").inc(cache="pixmap")
+            callback(pixmap)
+            return
+        get_metrics().counter("cache_misses_total", "Cache misses").inc(cache="pixmap")
+        if key in self._waiting:
+            self._waiting[key].append(callback)
+            return
+        self._waiting[key] = [callback]
+        self.operate.emit({"key": key, "path": path, "size": bucket, "dpr": dpr, "mode": mode})
+
+    @Slot(str, QImage)
+    def _on_loaded(self, key: str, image: QImage) -> None:
+        pixmap = QPixmap.fromImage(image)
+        QPixmapCache.insert(key, pixmap)
+        for callback in self._waiting.pop(key, []):
+            callback(pixmap)
+
+    @Slot(str, str)
+    def _on_failed(self, key: str, error: str) -> None:
+        self._waiting.pop(key, None)
+
+    def shutdown(self) -> None:
+        self.workerThread.quit()
+        self.workerThread.wait()
+
+
+_loader: Optional[AssetLoader] = None
+
+
+def get_asset_loader() -> AssetLoader:
+    """Process-wide loader (created on first use, after QApplication exists)."""
+    global _loader
+    if _loader is None:
+        from config.config_loader import load_config
+        ui_cfg = load_config().get("ui", {})
+        _loader = AssetLoader(ui_cfg.get("pixmap_cache_mb", 64), ui_cfg.get("background_bucket", 128))
+    return _loader
+
+
+def shutdown_asset_loader() -> None:
+    """Stop the loader's worker if one was ever created (does not create one)."""
+    global _loader
+    if _loader is not None:
+        _loader.shutdown()
+        _loader = None
+
+
+def get_asset_loader_later() -> None:
+    """Create the loader on the next event-loop turn (keeps it off the first paint)."""
+    QTimer.singleShot(0, get_asset_loader)
+
+
+# ════════════════════════════════════════════════════════════════════
+# PaintStats (first paint / per-frame timing)
+# ════════════════════════════════════════════════════════════════════
+PAINT_BUCKETS = (0.001, 0.002, 0.004, 0.008, 0.016, 0.033, 0.05, 0.1, 0.25)
+
+
+class PaintStats:
+    """
+    Reports paintEvent timing through core.metrics: a ``first_paint_seconds``
+    gauge (measured from module import) and a ``paint_seconds`` histogram.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._first_painted = False
+
+    def record(self, started: float) -> None:
+        now = time.perf_counter()
+        metrics = get_metrics()
+        if not self._first_painted:
+            self._first_painted = True
+            metrics.gauge("first_paint_seconds", "Time from start to the widget's first paint").set(
+                now - _APP_START, widget=self.name)
+        metrics.histogram("paint_seconds", "paintEvent duration", buckets=PAINT_BUCKETS).observe(
+            now - started, widget=self.name)
+
+
+# ════════════════════════════════════════════════════════════════════
+# BackgroundWidget (central widget with a cached, pre-scaled background)
+# ════════════════════════════════════════════════════════════════════
+class BackgroundWidget(QWidget):
+    """
+    Paints a background image scaled to cover the widget.  The image is
+    never decoded or scaled in paintEvent: the widget draws the cached
+    variant for its size bucket 1:1 (centre-cropped), falls back to the
+    last variant it had (or a solid colour on the very first paint) and
+    asks the AssetLoader for the right one.
+    """
+
+    def __init__(self, parent=None, color: QColor = QColor(85, 175, 240)):
+        super().__init__(parent)
+        self.color = color
+        self.image_path: Optional[str] = None
+        self._pixmap: Optional[QPixmap] = None
+        self.paint_stats = PaintStats("BackgroundWidget")
+        self.setAttribute(Qt.WidgetAttribute.WA_OpaquePaintEvent)
+
+    def setBackgroundImage(self, path: Optional[str]) -> None:
+        self.image_path = path
+        self._pixmap = None
+        self.update()
+
+    def _on_variant(self, pixmap: QPixmap) -> None:
+        self._pixmap = pixmap
+        self.update()
+
+    def paintEvent(self, event) -> None:
+        started = time.perf_counter()
+        painter = QPainter(self)
+        rect = self.rect()
+        pixmap = self._pixmap
+
+        if self.image_path and _loader is None:
+            # Non-critical: start the loader (config read + thread) after this first frame
+            get_asset_loader_later()
+            QTimer.singleShot(0, self.update)
+        elif self.image_path:
+            loader = _loader
+            dpr = self.devicePixelRatioF()
+            wanted = loader.cached(self.image_path, rect.size(), dpr)
+            if wanted is None:
+                # Not decoded/scaled yet (first paint, new bucket, DPR change): draw what we have
+                loader.request(self.image_path, rect.size(), dpr, self._on_variant)
+            else:
+                pixmap = self._pixmap = wanted
+
+        if pixmap is None:
+            painter.fillRect(event.rect(), self.color)
+        else:
+            size = pixmap.deviceIndependentSize()
+            if size.width() >= rect.width() and size.height() >= rect.height():
+                # Centre-crop at 1:1 device pixels – no scaling in the paint path
+                dpr = pixmap.devicePixelRatio()
+                x = (size.width() - rect.width()) / 2
+                y = (size.height() - rect.height()) / 2
+                source = QRect(int(x * dpr), int(y * dpr), int(rect.width() * dpr), int(rect.height() * dpr))
+                painter.drawPixmap(rect, pixmap, source)
+            else:
+                # Stale smaller variant while the new bucket is being prepared
+                painter.drawPixmap(rect, pixmap)
+        painter.end()
+        self.paint_stats.record(started)
@@ -0,0 +1,216 @@
+# benchmark.py
+"""
+Headless benchmark: replays recorded child sessions through the real
+ChatWorker turn logic (and StableV15Engine illustrations) without a window.
+
+Reports p50/p95 turn latency, the first turn and illustration after
+load, decode tokens/sec, images/min, peak RSS and the JSON parse failure
+rate.
+
+    python benchmark.py                                   # engines from config.yaml
+    python benchmark.py --stub                            # fast fake engines (CI, CPU only)
+    python benchmark.py --corpus stories/ --no-images     # replay saved .story files
+    python benchmark.py --stub --json bench.json          # also write the report as JSON
+    python benchmark.py --warmup                          # warm up first: compare "first turn" with a cold run
+
+A corpus is a JSONL file with {"session": ..., "inputs": [...]} per line,
+or a directory of .story files (their user chat messages are replayed).
+"""
+import argparse
+import json
+import math
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+DEFAULT_CORPUS = "assets/bench/child_sessions.jsonl"
+
+
+# ════════════════════════════════════════════════════════════════════
+# Corpus
+# ════════════════════════════════════════════════════════════════════
+def load_corpus(path: str) -> List[Dict]:
+    p = Path(path)
+    if p.is_dir():
+        from core.storybook import SUFFIX, Storybook
+
+        sessions = []
+        for story in sorted(p.glob(f"*{SUFFIX}")):
+            inputs = [m["text"] for m in Storybook(story).chat if m["role"] == "user"]
+            if inputs:
+                sessions.append({"session": story.stem, "inputs": inputs})
+        return sessions
+    with open(p, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    values = sorted(values)
+    k = (len(values) - 1) * q
+    lo, hi = math.floor(k), math.ceil(k)
+    return values[lo] + (values[hi] - values[lo]) * (k - lo)
+
+
+# ════════════════════════════════════════════════════════════════════
+# Replay
+# ════════════════════════════════════════════════════════════════════
+def replay_session(worker, image_engine, inputs: List[str], *, steps: int,
+                   tracer, num_page_segment: int = 4) -> Dict:
+    """
+    Feed *inputs* through ChatWorker.doWork the way MainApp does, and
+    request an illustration whenever a page gets its 2nd segment.
+    """
+    import format_helper
+    from core.tracing import timed_step_callback
+
+    replies: List[Dict] = []
+    errors: List[Dict] = []
+    worker.resultReady.connect(replies.append)
+    worker.turnFailed.connect(errors.append)
+    worker.story = []
+    pages: List[List[str]] = []
+    turn_ms, image_s, failures = [], [], 0
+
+    for text in inputs:
+        turn_id = tracer.new_turn_id()
+        replies.clear()
+        errors.clear()
+        t0 = time.perf_counter()
+        worker.doWork(text, turn_id)
+        failures += len(errors)     # e.g. a malformed continuation JSON
+        turn_ms.append((time.perf_counter() - t0) * 1000)
+
+        for payload in replies:
+            if payload["type"] not in ("story_line", "ai_suggestion"):
+                continue
+            if not pages or len(pages[-1]) == num_page_segment:
+                pages.append([])
+            pages[-1].append(payload["text"])
+            if image_engine is not None and len(pages[-1]) == 2:
+                prompt = format_helper.first_sentence(pages[-1][1]) + " children's picture book"
+                callback = timed_step_callback()
+                t0 = time.perf_counter()
+                with tracer.span("diffusion", turn_id) as span:
+                    image_engine.generate_image_with_latents(
+                        prompt, seed=len(image_s), num_inference_steps=steps,
+                        callback_on_step_end=callback)
+                    span.set(steps=len(callback.step_ms))
+                image_s.append(time.perf_counter() - t0)
+
+    worker.resultReady.disconnect(replies.append)
+    worker.turnFailed.disconnect(errors.append)
+    return {"turn_ms": turn_ms, "image_s": image_s, "turn_failures": failures}
+
+
+def summarize(results: List[Dict], records: List[Dict], wall_s: float) -> Dict:
+    from core.resource_usage import peak_rss_mb
+
+    turn_ms = [ms for r in results for ms in r["turn_ms"]]
+    image_s = [s for r in results for s in r["image_s"]]
+    parses = [r for r in records if r["span"] == "json_parse"]
+    parse_failures = sum(1 for r in parses if r.get("error") or r.get("ok") is False)
+    decode = [r for r in records if r["span"] == "decode" and r.get("tokens")]
+    decode_tokens = sum(r["tokens"] for r in decode)
+    decode_s = sum(r["ms"] for r in decode) / 1000
+    steps = [r["steps"] for r in records if r["span"] == "diffusion" and r.get("steps")]
+
+    return {
+        "sessions": len(results),
+        "turns": len(turn_ms),
+        "turn_p50_ms": percentile(turn_ms, 0.50),
+        "turn_p95_ms": percentile(turn_ms, 0.95),
+        "first_turn_ms": turn_ms[0] if turn_ms else None,
+        "first_image_s": image_s[0] if image_s else None,
+        "tokens_per_s": decode_tokens / decode_s if decode_s > 0 else None,
+        "images": len(image_s),
+        "images_per_min": 60 * len(image_s) / sum(image_s) if image_s else None,
+        "mean_steps": sum(steps) / len(steps) if steps else None,
+        "json_parses": len(parses),
+        "json_failure_rate": parse_failures / len(parses) if parses else None,
+        "turn_failures": sum(r["turn_failures"] for r in results),
+        "peak_rss_mb": peak_rss_mb(),
+        "wall_s": wall_s,
+    }
+
+
+def print_report(report: Dict) -> None:
+    def fmt(v, spec):
+        return "-" if v is None else format(v, spec)
+
+    print()
+    print(f"sessions / turns     {report['sessions']} / {report['turns']}")
+    print(f"turn latency p50     {fmt(report['turn_p50_ms'], '.1f')} ms")
+    print(f"turn latency p95     {fmt(report['turn_p95_ms'], '.1f')} ms")
+    print(f"first turn / image   {fmt(report['first_turn_ms'], '.1f')} ms / {fmt(report['first_image_s'], '.2f')} s")
+    print(f"decode tokens/s      {fmt(report['tokens_per_s'], '.1f')}")
+    print(f"images / per min     {report['images']} / {fmt(report['images_per_min'], '.1f')}")
+    print(f"JSON failure rate    {fmt(report['json_failure_rate'], '.1%')} "
+          f"({report['json_parses']} parses, {report['turn_failures']} failed turns)")
+    print(f"peak RSS             {report['peak_rss_mb']:.0f} MiB")
+    print(f"wall time            {report['wall_s']:.1f} s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS, help="JSONL of sessions or a directory of .story files")
+    parser.add_argument("--stub", action="store_true",
+                        help="use fake_engines with fast settings (no weights, no network)")
+    parser.add_argument("--no-images", action="store_true", help="skip illustrations")
+    parser.add_argument("--steps", type=int, default=20, help="denoising steps per illustration")
+    parser.add_argument("--sessions", type=int, default=0, help="replay only the first N sessions")
+    parser.add_argument("--warmup", action="store_true",
+                        help="compile (config warmup.compile) and warm up the engines before replaying")
+    parser.add_argument("--json", help="write the report to this file")
+    args = parser.parse_args()
+
+    from chat_engine import ChatWorker
+    from core.tracing import MemorySink, Tracer, set_tracer
+
+    sink = MemorySink()
+    tracer = Tracer(sink, enabled=True)
+    set_tracer(tracer)
+
+    sessions = load_corpus(args.corpus)
+    if args.sessions:
+        sessions = sessions[:args.sessions]
+
+    t0 = time.perf_counter()
+    if args.stub:
+        # Fake engines don't use torch thread pools; nothing to schedule
+        from core.cpu_scheduler import disable_cpu_scheduler
+        from fake_engines import FakeImageEngine, FakeLLMEngine
+        disable_cpu_scheduler()
+        llm = FakeLLMEngine(latency_ms=5, tokens_per_s=2000)
+        image_engine = None if args.no_images else FakeImageEngine(step_ms=2, size=64)
+    else:
+        from core.llm_factory import get_image_engine, get_llm_engine
+        llm = get_llm_engine()
+        image_engine = None if args.no_images else get_image_engine()
+    print(f"[benchmark] engines ready in {time.perf_counter() - t0:.1f} s")
+    if args.warmup:
+        from core.warmup import compile_engine, warm_up_image, warm_up_llm
+        compile_engine(llm)
+        warm_up_llm(llm)
+        if image_engine is not None:
+            compile_engine(image_engine)
+            warm_up_image(image_engine)
+
+    worker = ChatWorker(llm)
+    results = []
+    t0 = time.perf_counter()
+    for session in sessions:
+        print(f"[benchmark] session {session['session']} ({len(session['inputs'])} inputs)")
+        results.append(replay_session(worker, image_engine, session["inputs"],
+                                      steps=args.steps, tracer=tracer))
+    report = summarize(results, sink.records, time.perf_counter() - t0)
+
+    print_report(report)
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,4 +1,5 @@
 # ── stdlib
+import asyncio
 import sys, re, json, textwrap, random, string, collections
 from pathlib import Path
 from typing import Dict, List
@@ -10,106 +11,151 @@ from PySide6.QtWidgets import (
     QTextEdit, QLineEdit, QPushButton, QVBoxLayout, QHBoxLayout, QLabel,
 )
 
-import format_helper
+from config.config_loader import load_config
+from core.cpu_budget import apply_cpu_budget, load_cpu_budget
+from core.cpu_scheduler import get_cpu_scheduler
+from core.metrics import get_metrics
+from core.profiling import get_profiler
+from core.session_scheduler import MERGE, TurnQueue
+from core.story_session import StorySession, run_inline
+from core.tracing import get_tracer
+from core.warmup import prepare_engine
 
 # ════════════════════════════════════════════════════════════════════
 # ChatWorker (runs in background thread)
 # ════════════════════════════════════════════════════════════════════
 class ChatWorker(QObject):
-    """Does all LLM calls off‑thread."""
+    """
+    Qt adapter around core.story_session.StorySession: runs one turn per
+    doWork() on this worker thread and re-emits its events as signals.
+    """
 
-    resultReady = Signal(dict)  # dict with keys: type, text
+    resultReady = Signal(dict)  # dict with keys: type, text, turn_id
+    turnFailed = Signal(dict)   # same keys; text is the error message
+    turnFinished = Signal()     # after every doWork (ChatController starts the next input)
 
     def __init__(self, engine):  # 🡆 no type hint for engine
         super().__init__()
         self.engine = engine
-        self.story: List[str] = []  # authoritative, fixed sentences
-
-    @Slot(str)
-    def doWork(self, user_text: str):
-        # 1) Classification & minimal correction
-        classify_prompt = [
-            {
-                "role": "system",
-                "content": textwrap.dedent(
-                    """
-                    You are an assistant in a children's story‑builder app.
-                    Decide whether the user's message is a STORY SENTENCE
-                    or a QUESTION/CHAT. If it is a story sentence, correct
-                    grammar/spelling minimally but keep the child's voice.
-                    Respond with EXACTLY ONE JSON object, on a single line, no code block
-                    markers, no extra text. 
-                    {"kind":"story", "fixed_line":"..."}  OR
-                    {"kind":"chat",  "answer":"..."}
-                    """
-                ).strip(),
-            },
-            {"role": "user", "content": user_text},
-        ]
-        raw_json = self.engine.generate_reply(classify_prompt, max_new_tokens=128)
-        print(raw_json)
-
+        # Engine runs inline on this QThread (keeps the LLM CPU budget / scheduler slot)
+        self.session = StorySession(engine, runner=run_inline)
+        self.turn_id = ""           # trace id of the turn being processed
+        self._loop = None           # asyncio loop owned by the worker thread
+
+    @property
+    def story(self) -> List[str]:
+        return self.session.story
+
+    @story.setter
+    def story(self, lines: List[str]) -> None:
+        self.session.story = list(lines)
+
+    @Slot()
+    def start(self) -> None:
+        """Runs on the worker thread once it starts: apply the LLM CPU budget."""
+        budget = load_cpu_budget("llm")
+        apply_cpu_budget(budget["threads"], budget["cores"], workload="chat")
+
+    @Slot(str, str)
+    def doWork(self, user_text: str, turn_id: str = ""):
+        tracer = get_tracer()
+        self.turn_id = turn_id
+        if self._loop is None:
+            self._loop = asyncio.new_event_loop()
+        try:
+            with tracer.turn(turn_id or None), tracer.span("turn"), \
+                    get_profiler().capture("chat_turn", turn_id or None):
+                # Interactive chat gets CPU priority over background illustration
+                scheduler = get_cpu_scheduler()
+                if scheduler is None:
+                    self._loop.run_until_complete(self._run_turn(user_text))
+                    return
+                with scheduler.chat_turn():
+                    self._loop.run_until_complete(self._run_turn(user_text))
+        finally:
+            self.turnFinished.emit()
+
+    @Slot()
+    def warmUp(self) -> None:
+        """Dummy turns right after load (config ``warmup``); inputs sent meanwhile wait in ChatController."""
         try:
-            m = re.search(r"\{.*?\}", raw_json, flags=re.S)
-            data = json.loads(m.group(0)) if m else {}
-        except Exception:
-            data = {"kind": "chat", "answer": "I'm sorry, could you rephrase that?"}
-
-        # 2) Handle story path
-        if data.get("kind") == "story":
-            fixed_line = data["fixed_line"].strip()
-            self.story.append(fixed_line)
-            self.resultReady.emit({"type": "story_line", "text": fixed_line})
-
-            # 2b) Ask for continuation
-            story_context = " ".join(self.story[-100:])  # truncate for safety
-            continue_prompt = [
-                {
-                    "role": "system",
-                    "content": textwrap.dedent(
-                        """
-                        Continue this children's story in 2 lively sentences. Make sure the reply forms a complete sentence and ends with a period.
-                        Respond with EXACTLY ONE JSON object, on a single line, no code block
-                        markers, no extra text. 
-                        {"first": "first sentence", "second": "second sentence"},
-                        """
-                    ).strip(),
-                },
-                {"role": "user", "content": story_context},
-            ]
-            raw_next_line = self.engine.generate_reply(continue_prompt, max_new_tokens=120).strip()
-            print(f"raw_next_line: {raw_next_line}")
-
-            json_checked_output = format_helper.get_first_json(raw_next_line)
-            next_line = json_checked_output["first"] + json_checked_output["second"]
-
-            self.story.append(next_line)
-            self.resultReady.emit({"type": "ai_suggestion", "text": next_line})
-
-        else:
-            answer = data["answer"].strip()
-            print(f"answer {answer}")
-            self.resultReady.emit({"type": "chat_answer", "text": answer + " What’s your next line?"})
+            scheduler = get_cpu_scheduler()
+            if scheduler is None:
+                prepare_engine(self.engine, "llm")
+                return
+            with scheduler.chat_turn():
+                prepare_engine(self.engine, "llm")
+        finally:
+            self.turnFinished.emit()
+
+    async def _run_turn(self, user_text: str):
+        async for event in self.session.submit(user_text, turn_id=self.turn_id):
+            if event.type == "error":
+                self.turnFailed.emit(event.to_payload())
+            elif event.type != "token":
+                self.resultReady.emit(event.to_payload())
 
 
 # ════════════════════════════════════════════════════════════════════
 # ChatController (thread wrapper)
 # ════════════════════════════════════════════════════════════════════
 class ChatController(QObject):
-    operate = Signal(str)
+    """
+    Owns the worker thread and feeds it one input at a time.  Inputs sent
+    while a turn runs wait in a bounded TurnQueue (config ``queue``):
+    beyond its depth they are merged into the last waiting input or
+    refused with QueueFull, instead of piling up in Qt's event queue.
+    """
+
+    operate = Signal(str, str)  # user text, turn id (core.tracing)
+    warm = Signal()
 
-    def __init__(self, result_callback, engine):  # 🡆 no type hint
+    def __init__(self, result_callback, engine, error_callback=None):  # 🡆 no type hint
         super().__init__()
+        queue_cfg = load_config().get("queue") or {}
+        self.pending = TurnQueue(queue_cfg.get("depth", 2), queue_cfg.get("overflow", MERGE))
+        self.busy = False
+
         self.workerThread = QThread()
         self.worker = ChatWorker(engine)
         self.worker.moveToThread(self.workerThread)
 
+        self.workerThread.started.connect(self.worker.start)
         self.workerThread.finished.connect(self.worker.deleteLater)
         self.operate.connect(self.worker.doWork)
+        self.warm.connect(self.worker.warmUp)
         self.worker.resultReady.connect(result_callback)
+        self.worker.turnFinished.connect(self._on_turn_finished)
+        if error_callback is not None:
+            self.worker.turnFailed.connect(error_callback)
 
         self.workerThread.start()
 
+    def submit(self, user_text: str, turn_id: str = "") -> str:
+        """Start or queue a turn: ``"started"``, ``"queued"`` or ``"merged"`` (raises QueueFull)."""
+        if not self.busy:
+            self.busy = True
+            self.operate.emit(user_text, turn_id)
+            return "started"
+        return self.pending.put(user_text, turn_id)
+
+    def warm_up(self) -> None:
+        """Warm up the engine on the worker thread; inputs sent meanwhile are queued behind it."""
+        if not self.busy:
+            self.busy = True
+            self.warm.emit()
+
+    @Slot()
+    def _on_turn_finished(self) -> None:
+        item = self.pending.pop()
+        if item is None:
+            self.busy = False
+            return
+        user_text, turn_id, wait_ms = item
+        get_tracer().record("queue_wait", wait_ms, turn_id or None, lane="input", depth=len(self.pending))
+        get_metrics().histogram("queue_wait_seconds", "Time jobs wait in the scheduler").observe(wait_ms / 1000, lane="input")
+        self.operate.emit(user_text, turn_id)
+
     def __del__(self):
         self.workerThread.quit()
         self.workerThread.wait()
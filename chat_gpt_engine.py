@@ -1,9 +1,12 @@
 # chat_gpt_engine.py
 import openai
-from typing import List, Dict, Optional
+from typing import Iterator, List, Dict, Optional
 import os
 from dotenv import load_dotenv
 
+from core.metrics import get_metrics
+from core.tracing import get_tracer
+
 class ChatGPTEngine:
     """ChatGPT API wrapper that mimics Phi3MiniEngine interface."""
     
@@ -49,6 +52,18 @@ class ChatGPTEngine:
             parts.append(f"{m['role']}: {m['content']}")
         return "\n".join(parts)
     
+    @staticmethod
+    def _format_messages(messages: List[Dict[str, str]]) -> List[Dict[str, str]]:
+        """Convert messages to OpenAI format (unknown roles become 'user')."""
+        formatted_messages = []
+        for msg in messages:
+            role = msg.get('role', 'user')
+            formatted_messages.append({
+                'role': role if role in ['user', 'assistant', 'system'] else 'user',
+                'content': msg['content']
+            })
+        return formatted_messages
+    
     def generate_reply(self, 
                        messages: List[Dict[str, str]], 
                        *, 
@@ -64,31 +79,24 @@ class ChatGPTEngine:
             Generated reply text
         """
         try:
-            # Convert messages to OpenAI format
-            formatted_messages = []
-            for msg in messages:
-                role = msg.get('role', 'user')
-                if role in ['user', 'assistant', 'system']:
-                    formatted_messages.append({
-                        'role': role,
-                        'content': msg['content']
-                    })
-                else:
-                    formatted_messages.append({
-                        'role': 'user',
-                        'content': msg['content']
-                    })
+            formatted_messages = self._format_messages(messages)
             
-            # Make API call
-            response = self.client.chat.completions.create(
-                model=self.model_name,
-                messages=formatted_messages,
-                max_tokens=max_new_tokens,
-                temperature=self.temperature,
-                top_p=self.top_p,
-                n=1,
-                stop=None,
-            )
+            # Make API call (prefill/decode are not separable remotely: one span)
+            with get_tracer().span("api_request", model=self.model_name) as span:
+                response = self.client.chat.completions.create(
+                    model=self.model_name,
+                    messages=formatted_messages,
+                    max_tokens=max_new_tokens,
+                    temperature=self.temperature,
+                    top_p=self.top_p,
+                    n=1,
+                    stop=None,
+                )
+                if getattr(response, "usage", None) is not None:
+                    span.set(prompt_tokens=response.usage.prompt_tokens,
+                             tokens=response.usage.completion_tokens)
+                    get_metrics().counter("llm_tokens_total", "Generated tokens").inc(
+                        response.usage.completion_tokens)
             
             # Extract and return the reply
             reply = response.choices[0].message.content
@@ -96,7 +104,35 @@ class ChatGPTEngine:
             
         except openai.OpenAIError as e:
             print(f"OpenAI API error: {e}")
+            get_metrics().counter("errors_total", "Failures by where they happened").inc(where="llm_api")
             return f"Error generating response: {str(e)}"
         except Exception as e:
             print(f"Unexpected error: {e}")
-            return f"Unexpected error occurred: {str(e)}"
\ No newline at end of file
+            return f"Unexpected error occurred: {str(e)}"
+    
+    def stream_reply(self, 
+                     messages: List[Dict[str, str]], 
+                     *, 
+                     max_new_tokens: int = 128) -> Iterator[str]:
+        """Like generate_reply(), but yields the reply in pieces as the API streams it."""
+        try:
+            with get_tracer().span("api_request", model=self.model_name, stream=True):
+                stream = self.client.chat.completions.create(
+                    model=self.model_name,
+                    messages=self._format_messages(messages),
+                    max_tokens=max_new_tokens,
+                    temperature=self.temperature,
+                    top_p=self.top_p,
+                    n=1,
+                    stream=True,
+                )
+                for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        yield chunk.choices[0].delta.content
+        except openai.OpenAIError as e:
+            print(f"OpenAI API error: {e}")
+            get_metrics().counter("errors_total", "Failures by where they happened").inc(where="llm_api")
+            yield f"Error generating response: {str(e)}"
+        except Exception as e:
+            print(f"Unexpected error: {e}")
+            yield f"Unexpected error occurred: {str(e)}"
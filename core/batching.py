@@ -0,0 +1,167 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, Iterator, List, Optional
+
+from core.cpu_budget import apply_cpu_budget, load_cpu_budget
+from core.cpu_scheduler import get_cpu_scheduler
+from core.metrics import get_metrics
+from core.tracing import get_tracer
+
+_DONE = object()   # end of a streamed reply
+
+
+class _Request:
+    __slots__ = ("messages", "max_new_tokens", "turn_id", "future", "pieces")
+
+    def __init__(self, messages, max_new_tokens: int, turn_id: Optional[str], stream: bool):
+        self.messages = messages
+        self.max_new_tokens = max_new_tokens
+        self.turn_id = turn_id
+        self.future: Future = Future()
+        self.pieces: Optional["queue.SimpleQueue"] = queue.SimpleQueue() if stream else None
+
+    def on_text(self, piece: str) -> None:
+        if self.pieces is not None:
+            self.pieces.put(piece)
+
+
+# ════════════════════════════════════════════════════════════════════
+# LLMBatcher
+# ════════════════════════════════════════════════════════════════════
+class LLMBatcher:
+    """
+    Engine proxy that merges generate_reply()/stream_reply() calls made
+    concurrently from several threads (one per session) into batches.
+
+    A single thread owns the real engine.  It takes the oldest request,
+    waits up to *window_ms* for more with the same ``max_new_tokens`` (up
+    to *max_batch*), and runs them as one ``engine.generate_batch()``
+    call.  Engines without generate_batch() are called one request at a
+    time.  Like ChatWorker, the thread applies the LLM CPU budget and
+    holds the CpuScheduler chat slot while generating.
+    """
+
+    def __init__(self, engine, *, max_batch: int = 4, window_ms: float = 20.0):
+        self.engine = engine
+        self.max_batch = max(1, max_batch)
+        self.window_s = window_ms / 1000
+        self.batches = 0
+        self.batched_requests = 0
+        self._queue: "queue.Queue[Optional[_Request]]" = queue.Queue()
+        self._deferred: List[_Request] = []
+        self._thread = threading.Thread(target=self._run, name="llm-batcher", daemon=True)
+        self._thread.start()
+
+    # ------------- Engine interface (called from session threads) -------------
+    def generate_reply(self, messages, *, max_new_tokens: int = 128) -> str:
+        request = _Request(messages, max_new_tokens, get_tracer().current_turn(), stream=False)
+        self._queue.put(request)
+        return request.future.result()
+
+    def stream_reply(self, messages, *, max_new_tokens: int = 128) -> Iterator[str]:
+        request = _Request(messages, max_new_tokens, get_tracer().current_turn(), stream=True)
+        self._queue.put(request)
+        while True:
+            piece = request.pieces.get()
+            if piece is _DONE:
+                break
+            yield piece
+        request.future.result()   # re-raise generation errors
+
+    def build_prompt(self, messages) -> str:
+        return self.engine.build_prompt(messages)
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize() + len(self._deferred)
+
+    def close(self) -> None:
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+
+    # ------------- Batcher thread ----------------------------------------------
+    def _next_batch(self) -> Optional[List[_Request]]:
+        first = self._deferred.pop(0) if self._deferred else self._queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        # Deferred requests first (they are older), then whatever arrives in the window
+        for request in list(self._deferred):
+            if len(batch) < self.max_batch and request.max_new_tokens == first.max_new_tokens:
+                self._deferred.remove(request)
+                batch.append(request)
+        deadline = time.perf_counter() + self.window_s
+        while len(batch) < self.max_batch:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if request is None:
+                self._queue.put(None)     # finish this batch, stop on the next get
+                break
+            if request.max_new_tokens == first.max_new_tokens:
+                batch.append(request)
+            else:
+                self._deferred.append(request)
+        return batch
+
+    def _run(self) -> None:
+        budget = load_cpu_budget("llm")
+        apply_cpu_budget(budget["threads"], budget["cores"], workload="chat")
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                break
+            scheduler = get_cpu_scheduler()
+            if scheduler is None:
+                self._generate(batch)
+            else:
+                with scheduler.chat_turn():
+                    self._generate(batch)
+
+    def _generate(self, batch: List[_Request]) -> None:
+        self.batches += 1
+        self.batched_requests += len(batch)
+        get_metrics().histogram("llm_batch_size", "Requests per LLM batch", buckets=(1, 2, 4, 8, 16)).observe(len(batch))
+        tracer = get_tracer()
+        try:
+            with tracer.turn(batch[0].turn_id), tracer.span("llm_batch", size=len(batch)):
+                if len(batch) > 1 and hasattr(self.engine, "generate_batch"):
+                    replies = self.engine.generate_batch(
+                        [r.messages for r in batch],
+                        max_new_tokens=batch[0].max_new_tokens,
+                        on_text=lambda row, piece: batch[row].on_text(piece),
+                    )
+                else:
+                    replies = [self._generate_one(r) for r in batch]
+            for request, reply in zip(batch, replies):
+                request.future.set_result(reply)
+        except Exception as e:
+            for request in batch:
+                if not request.future.done():
+                    request.future.set_exception(e)
+        finally:
+            for request in batch:
+                request.on_text(_DONE)
+
+    def _generate_one(self, request: _Request) -> str:
+        with get_tracer().turn(request.turn_id):
+            if request.pieces is not None and hasattr(self.engine, "stream_reply"):
+                parts = []
+                for piece in self.engine.stream_reply(request.messages, max_new_tokens=request.max_new_tokens):
+                    parts.append(piece)
+                    request.on_text(piece)
+                return "".join(parts).strip()
+            return self.engine.generate_reply(request.messages, max_new_tokens=request.max_new_tokens)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "batches": self.batches,
+            "mean_batch": round(self.batched_requests / self.batches, 2) if self.batches else 0.0,
+            "pending": self.pending,
+        }
@@ -0,0 +1,68 @@
+import os
+import sys
+from typing import Iterable, Optional
+
+from config.config_loader import load_config
+from core.metrics import get_metrics
+
+
+# ════════════════════════════════════════════════════════════════════
+# Per-workload CPU budget (torch threads + core pinning)
+# ════════════════════════════════════════════════════════════════════
+def load_cpu_budget(workload: str) -> dict:
+    """
+    Return the ``cpu.<workload>`` section of config.yaml
+    (workload: "llm" or "diffusion") as ``{"threads": int, "cores": list}``.
+    """
+    section = (load_config().get("cpu") or {}).get(workload) or {}
+    return {
+        "threads": int(section.get("threads", 0) or 0),
+        "cores": list(section.get("cores") or []),
+    }
+
+
+def set_torch_threads(threads: int, workload: str) -> None:
+    """
+    ``torch.set_num_threads`` for the calling thread, published as the
+    ``torch_threads{workload=…}`` gauge (chat | diffusion).  A no-op
+    without torch (fake engines).
+    """
+    try:
+        import torch
+    except ImportError:
+        return
+    if torch.get_num_threads() != threads:
+        torch.set_num_threads(threads)
+    get_metrics().gauge("torch_threads", "torch intra-op threads of the workload's thread").set(
+        threads, workload=workload)
+
+
+def apply_cpu_budget(threads: int = 0, cores: Optional[Iterable[int]] = None, *, workload: str = "") -> None:
+    """
+    Apply a thread count and core affinity to the *calling* thread.
+
+    Must run on the thread (or in the process) that does the torch work:
+    OpenMP thread pools and Linux affinity masks are inherited from the
+    thread that creates them.  ``threads=0`` / empty *cores* keep defaults.
+    With a *workload* (chat | diffusion) the resulting thread count is
+    published as the ``torch_threads`` gauge.
+    """
+    if cores:
+        cores = sorted(set(cores))
+        if hasattr(os, "sched_setaffinity"):
+            try:
+                os.sched_setaffinity(0, cores)
+            except OSError as e:
+                print(f"[cpu_budget] could not pin to cores {cores}: {e}")
+        else:
+            print("[cpu_budget] core pinning is not supported on this platform; ignored.")
+        if not threads:
+            threads = len(cores)
+
+    if threads > 0:
+        import torch
+        torch.set_num_threads(threads)
+    torch = sys.modules.get("torch")
+    if workload and torch is not None:
+        get_metrics().gauge("torch_threads", "torch intra-op threads of the workload's thread").set(
+            torch.get_num_threads(), workload=workload)
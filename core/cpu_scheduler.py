@@ -0,0 +1,153 @@
+import multiprocessing as mp
+import os
+import threading
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+from config.config_loader import load_config
+from core.cpu_budget import load_cpu_budget, set_torch_threads
+
+
+# ════════════════════════════════════════════════════════════════════
+# Diffusion step hook (usable in-process and in the image service)
+# ════════════════════════════════════════════════════════════════════
+def make_diffusion_step_callback(
+    chat_idle,
+    *,
+    pause: bool,
+    threads_during_chat: int,
+    threads_when_idle: int,
+    max_pause_s: float = 30.0,
+) -> Callable:
+    """
+    Build a ``callback_on_step_end`` for diffusers pipelines.
+
+    Between denoising steps it waits for *chat_idle* (an Event) when
+    *pause* is set, at most *max_pause_s* (a stuck chat turn must not
+    hold the illustration forever), and otherwise shrinks/grows the torch
+    thread count depending on whether a chat turn is running.
+    """
+    def _on_step_end(pipe, step_index, timestep, callback_kwargs):
+        if pause:
+            chat_idle.wait(max_pause_s)
+        set_torch_threads(threads_when_idle if chat_idle.is_set() else threads_during_chat, "diffusion")
+        return callback_kwargs
+
+    return _on_step_end
+
+
+# ════════════════════════════════════════════════════════════════════
+# CpuScheduler
+# ════════════════════════════════════════════════════════════════════
+class CpuScheduler:
+    """
+    Splits the CPU between interactive chat and background illustration.
+
+    While a chat turn runs it gets *chat_threads* intra-op threads and
+    diffusion gets the rest (or pauses between steps); when chat is idle
+    diffusion goes back to *diffusion_threads*.  Thread counts are
+    applied from the thread doing the work, since OpenMP pools are per
+    calling thread.
+
+    *chat_threads* 0 = every core when diffusion pauses during chat, else
+    3/4 of them; *diffusion_threads* 0 = every core.
+    """
+
+    def __init__(
+        self,
+        total_threads: Optional[int] = None,
+        chat_threads: int = 0,
+        pause_diffusion: bool = True,
+        diffusion_threads: int = 0,
+        max_pause_s: float = 30.0,
+    ):
+        self.total_threads = total_threads or os.cpu_count() or 1
+        if not chat_threads:
+            chat_threads = self.total_threads if pause_diffusion else max(1, (self.total_threads * 3) // 4)
+        self.chat_threads = min(chat_threads, self.total_threads)
+        self.diffusion_threads = min(diffusion_threads or self.total_threads, self.total_threads)
+        self.pause_diffusion = pause_diffusion
+        self.max_pause_s = max_pause_s
+
+        # A spawn-context Event can also be handed to the image service process.
+        self.chat_idle = mp.get_context("spawn").Event()
+        self.chat_idle.set()
+        self._lock = threading.Lock()
+        self._active_chats = 0
+
+    @property
+    def diffusion_threads_during_chat(self) -> int:
+        return max(1, min(self.diffusion_threads, self.total_threads - self.chat_threads))
+
+    @contextmanager
+    def chat_turn(self):
+        """Wrap one interactive LLM turn (runs on the chat worker thread)."""
+        with self._lock:
+            self._active_chats += 1
+            self.chat_idle.clear()
+        set_torch_threads(self.chat_threads, "chat")
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._active_chats -= 1
+                if self._active_chats == 0:
+                    self.chat_idle.set()
+
+    def diffusion_step_callback(self) -> Callable:
+        return make_diffusion_step_callback(
+            self.chat_idle,
+            pause=self.pause_diffusion,
+            threads_during_chat=self.diffusion_threads_during_chat,
+            threads_when_idle=self.diffusion_threads,
+            max_pause_s=self.max_pause_s,
+        )
+
+    def diffusion_settings(self) -> dict:
+        """Picklable settings to rebuild the step callback in another process."""
+        return {
+            "pause": self.pause_diffusion,
+            "threads_during_chat": self.diffusion_threads_during_chat,
+            "threads_when_idle": self.diffusion_threads,
+            "max_pause_s": self.max_pause_s,
+        }
+
+
+def _budget_threads(workload: str) -> int:
+    """Threads of the ``cpu.<workload>`` budget (pinned cores count as threads), 0 if unset."""
+    budget = load_cpu_budget(workload)
+    return budget["threads"] or len(budget["cores"])
+
+
+_scheduler: Optional[CpuScheduler] = None
+_scheduler_loaded = False
+_scheduler_lock = threading.Lock()
+
+
+def get_cpu_scheduler() -> Optional[CpuScheduler]:
+    """
+    Process-wide scheduler from config ``scheduler``; None when disabled.
+    Thread counts left at 0 there fall back to the ``cpu.llm`` /
+    ``cpu.diffusion`` budgets.
+    """
+    global _scheduler, _scheduler_loaded
+    with _scheduler_lock:
+        if not _scheduler_loaded:
+            _scheduler_loaded = True
+            cfg = load_config().get("scheduler") or {}
+            if cfg.get("enabled", False):
+                _scheduler = CpuScheduler(
+                    total_threads=cfg.get("total_threads") or None,
+                    chat_threads=cfg.get("chat_threads", 0) or _budget_threads("llm"),
+                    pause_diffusion=cfg.get("pause_diffusion_during_chat", True),
+                    diffusion_threads=_budget_threads("diffusion"),
+                    max_pause_s=float(cfg.get("max_pause_s", 30)),
+                )
+        return _scheduler
+
+
+def disable_cpu_scheduler() -> None:
+    """Turn the scheduler off for this process regardless of config (stub-engine runs)."""
+    global _scheduler, _scheduler_loaded
+    with _scheduler_lock:
+        _scheduler, _scheduler_loaded = None, True
@@ -0,0 +1,277 @@
+import html
+import io
+import multiprocessing
+import os
+import textwrap
+import time
+import uuid
+import zipfile
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+# ════════════════════════════════════════════════════════════════════
+# Storybook export (PDF / EPUB), one page in memory at a time
+# ════════════════════════════════════════════════════════════════════
+
+ProgressCallback = Callable[[int, int], None]   # (pages done, total pages)
+
+
+def encode_page_image(path: Optional[str], max_side: int, fmt: str, quality: int) -> Optional[Tuple[bytes, int, int]]:
+    """
+    Process-pool task: load one illustration, downscale it to *max_side*
+    and encode it as JPEG or WebP.  Returns ``(data, width, height)``.
+    """
+    if not path or not os.path.exists(path):
+        return None
+    from PIL import Image
+
+    with Image.open(path) as img:
+        img.draft("RGB", (max_side, max_side))     # cheap JPEG downscale on decode
+        img = img.convert("RGB")
+        img.thumbnail((max_side, max_side))
+        buf = io.BytesIO()
+        img.save(buf, format=fmt.upper(), quality=quality)
+        return buf.getvalue(), img.width, img.height
+
+
+def _ordered_images(paths: List[Optional[str]], pool: Executor, window: int,
+                    max_side: int, fmt: str, quality: int) -> Iterator[Optional[Tuple[bytes, int, int]]]:
+    """Yield encoded images in page order with at most *window* in flight."""
+    pending: deque = deque()
+    it = iter(paths)
+
+    def submit_next() -> None:
+        for path in it:
+            pending.append(pool.submit(encode_page_image, path, max_side, fmt, quality))
+            return
+
+    for _ in range(window):
+        submit_next()
+    while pending:
+        result = pending.popleft().result()
+        submit_next()
+        yield result
+
+
+# ════════════════════════════════════════════════════════════════════
+# PDF
+# ════════════════════════════════════════════════════════════════════
+def _pdf_text(s: str) -> bytes:
+    s = s.encode("cp1252", "replace").decode("cp1252")
+    s = s.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+    return s.encode("cp1252")
+
+
+class PdfStreamWriter:
+    """
+    Minimal PDF 1.4 writer that emits each page as soon as it is added and
+    only keeps object offsets in memory.  Text uses the built‑in Helvetica
+    font (WinAnsi), images are embedded as JPEG (DCTDecode).
+    """
+
+    PAGE_W, PAGE_H = 595, 842       # A4 in points
+    MARGIN = 48
+    FONT_SIZE = 14
+    LEADING = 20
+
+    def __init__(self, path: Union[str, Path], title: str = ""):
+        self._f = open(path, "wb")
+        self._offsets: Dict[int, int] = {}
+        self._next_id = 4               # 1 catalog, 2 pages, 3 font
+        self._page_ids: List[int] = []
+        self._f.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        self._obj(3, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+        if title:
+            self.add_page(None, [title], font_size=24)
+
+    def _alloc(self) -> int:
+        self._next_id += 1
+        return self._next_id - 1
+
+    def _obj(self, oid: int, body: bytes, stream: Optional[bytes] = None) -> None:
+        self._offsets[oid] = self._f.tell()
+        self._f.write(f"{oid} 0 obj\n".encode())
+        self._f.write(body)
+        if stream is not None:
+            self._f.write(b"\nstream\n")
+            self._f.write(stream)
+            self._f.write(b"\nendstream")
+        self._f.write(b"\nendobj\n")
+
+    def add_page(self, image: Optional[Tuple[bytes, int, int]], paragraphs: List[str],
+                 font_size: Optional[int] = None) -> None:
+        font_size = font_size or self.FONT_SIZE
+        leading = int(font_size * 1.45)
+        width = self.PAGE_W - 2 * self.MARGIN
+        ops: List[bytes] = []
+        resources = b"/Font << /F1 3 0 R >>"
+        y = self.PAGE_H - self.MARGIN
+
+        if image is not None:
+            data, iw, ih = image
+            img_id = self._alloc()
+            self._obj(img_id, (f"<< /Type /XObject /Subtype /Image /Width {iw} /Height {ih} "
+                               f"/ColorSpace /DeviceRGB /BitsPerComponent 8 /Filter /DCTDecode "
+                               f"/Length {len(data)} >>").encode(), data)
+            scale = min(width / iw, (self.PAGE_H * 0.5) / ih)
+            dw, dh = iw * scale, ih * scale
+            y -= dh
+            ops.append(f"q {dw:.2f} 0 0 {dh:.2f} {(self.PAGE_W - dw) / 2:.2f} {y:.2f} cm /Im0 Do Q".encode())
+            resources += f" /XObject << /Im0 {img_id} 0 R >>".encode()
+            y -= leading
+
+        # Helvetica averages ~0.5em per character; good enough for wrapping
+        chars_per_line = max(20, int(width / (font_size * 0.5)))
+        ops.append(f"BT /F1 {font_size} Tf {leading} TL {self.MARGIN} {y - font_size:.2f} Td".encode())
+        for para in paragraphs:
+            for line in textwrap.wrap(para.strip(), chars_per_line) or [""]:
+                ops.append(b"(" + _pdf_text(line) + b") Tj T*")
+            ops.append(b"T*")
+        ops.append(b"ET")
+
+        content = b"\n".join(ops)
+        content_id, page_id = self._alloc(), self._alloc()
+        self._obj(content_id, f"<< /Length {len(content)} >>".encode(), content)
+        self._obj(page_id, (f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {self.PAGE_W} {self.PAGE_H}] "
+                            f"/Contents {content_id} 0 R /Resources << ").encode() + resources + b" >> >>")
+        self._page_ids.append(page_id)
+        self._f.flush()
+
+    def close(self) -> None:
+        kids = " ".join(f"{pid} 0 R" for pid in self._page_ids)
+        self._obj(2, f"<< /Type /Pages /Kids [{kids}] /Count {len(self._page_ids)} >>".encode())
+        self._obj(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+        xref = self._f.tell()
+        size = self._next_id
+        self._f.write(f"xref\n0 {size}\n0000000000 65535 f \n".encode())
+        for oid in range(1, size):
+            self._f.write(f"{self._offsets.get(oid, 0):010d} 00000 n \n".encode())
+        self._f.write(f"trailer\n<< /Size {size} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode())
+        self._f.close()
+
+
+# ════════════════════════════════════════════════════════════════════
+# EPUB
+# ════════════════════════════════════════════════════════════════════
+class EpubStreamWriter:
+    """
+    EPUB 3 writer: each page's XHTML and image go into the zip as they are
+    added; the package document and navigation are written on close().
+    """
+
+    MEDIA_TYPES = {"jpeg": "image/jpeg", "webp": "image/webp"}
+
+    def __init__(self, path: Union[str, Path], title: str = "", image_fmt: str = "jpeg"):
+        self.title = title or "My Storybook"
+        self.image_fmt = image_fmt
+        self._z = zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED)
+        # mimetype must be first and stored uncompressed
+        self._z.writestr(zipfile.ZipInfo("mimetype"), "application/epub+zip", compress_type=zipfile.ZIP_STORED)
+        self._z.writestr("META-INF/container.xml", (
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">'
+            '<rootfiles><rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/>'
+            '</rootfiles></container>'))
+        self._items: List[Tuple[str, str, str]] = []   # (id, href, media-type)
+        self._spine: List[str] = []
+
+    def add_page(self, image: Optional[Tuple[bytes, int, int]], paragraphs: List[str]) -> None:
+        n = len(self._spine) + 1
+        body = []
+        if image is not None:
+            ext = "jpg" if self.image_fmt == "jpeg" else self.image_fmt
+            href = f"images/page_{n}.{ext}"
+            self._z.writestr(f"OEBPS/{href}", image[0], compress_type=zipfile.ZIP_STORED)
+            self._items.append((f"img{n}", href, self.MEDIA_TYPES[self.image_fmt]))
+            body.append(f'<p class="illustration"><img src="{href}" alt="Illustration {n}"/></p>')
+        body.extend(f"<p>{html.escape(p.strip())}</p>" for p in paragraphs)
+        page_href = f"page_{n}.xhtml"
+        self._z.writestr(f"OEBPS/{page_href}", (
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<html xmlns="http://www.w3.org/1999/xhtml"><head>'
+            f'<title>{html.escape(self.title)} – {n}</title>'
+            '<style>img{max-width:100%} .illustration{text-align:center}</style>'
+            f'</head><body>{"".join(body)}</body></html>'))
+        self._items.append((f"page{n}", page_href, "application/xhtml+xml"))
+        self._spine.append(f"page{n}")
+
+    def close(self) -> None:
+        nav_items = "".join(f'<li><a href="page_{i}.xhtml">Page {i}</a></li>'
+                            for i in range(1, len(self._spine) + 1))
+        self._z.writestr("OEBPS/nav.xhtml", (
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops">'
+            f'<head><title>{html.escape(self.title)}</title></head><body>'
+            f'<nav epub:type="toc"><ol>{nav_items}</ol></nav></body></html>'))
+        manifest = "".join(f'<item id="{i}" href="{h}" media-type="{m}"/>' for i, h, m in self._items)
+        spine = "".join(f'<itemref idref="{i}"/>' for i in self._spine)
+        modified = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+        self._z.writestr("OEBPS/content.opf", (
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<package xmlns="http://www.idpf.org/2007/opf" version="3.0" unique-identifier="bookid">'
+            '<metadata xmlns:dc="http://purl.org/dc/elements/1.1/">'
+            f'<dc:identifier id="bookid">urn:uuid:{uuid.uuid4()}</dc:identifier>'
+            f'<dc:title>{html.escape(self.title)}</dc:title><dc:language>en</dc:language>'
+            f'<meta property="dcterms:modified">{modified}</meta></metadata>'
+            f'<manifest><item id="nav" href="nav.xhtml" media-type="application/xhtml+xml" properties="nav"/>'
+            f'{manifest}</manifest><spine>{spine}</spine></package>'))
+        self._z.close()
+
+
+# ════════════════════════════════════════════════════════════════════
+# export_book
+# ════════════════════════════════════════════════════════════════════
+def export_book(
+    pages: List[List[str]],
+    page_images: Dict[int, str],
+    out_path: Union[str, Path],
+    *,
+    title: str = "",
+    fmt: Optional[str] = None,
+    image_fmt: str = "jpeg",
+    max_side: int = 1024,
+    quality: int = 85,
+    max_workers: Optional[int] = None,
+    progress: Optional[ProgressCallback] = None,
+) -> Path:
+    """
+    Export *pages* (MainApp.story_pages_list) with their illustrations to
+    PDF or EPUB (chosen from *fmt* or the file suffix).
+
+    Illustrations are decoded, downscaled and encoded in a process pool;
+    at most ``2 * max_workers`` encoded images are alive at any time and
+    each page is written out as soon as its image is ready.  The book is
+    written next to *out_path* and renamed into place only once every
+    page made it, so a failed export never leaves a truncated file there.
+    """
+    out_path = Path(out_path)
+    fmt = (fmt or out_path.suffix.lstrip(".")).lower()
+    if fmt not in ("pdf", "epub"):
+        raise ValueError(f"Unknown export format: {fmt}")
+    if fmt == "pdf":
+        image_fmt = "jpeg"          # PDF embeds JPEG as-is (DCTDecode)
+
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    part_path = out_path.with_name(f".{out_path.name}.part")
+    writer = PdfStreamWriter(part_path, title) if fmt == "pdf" else EpubStreamWriter(part_path, title, image_fmt)
+    max_workers = max_workers or max(1, min(4, (os.cpu_count() or 2) // 2))
+    paths = [page_images.get(i) for i in range(len(pages))]
+
+    # spawn: workers re-import only the GUI's light top-level modules, never a forked Qt/torch state
+    completed = False
+    try:
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            images = _ordered_images(paths, pool, 2 * max_workers, max_side, image_fmt, quality)
+            for i, (segments, image) in enumerate(zip(pages, images)):
+                writer.add_page(image, segments)
+                if progress is not None:
+                    progress(i + 1, len(pages))
+        completed = True
+    finally:
+        writer.close()
+        if not completed:
+            part_path.unlink(missing_ok=True)
+    os.replace(part_path, out_path)
+    return out_path
@@ -0,0 +1,228 @@
+import io
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+from core.storybook import SUFFIX, Storybook
+
+
+def make_thumbnail(rgb: bytes, size, max_side: int = 160, quality: int = 80) -> bytes:
+    """Downscale raw RGB pixels to a small JPEG for library listings."""
+    from PIL import Image
+
+    img = Image.frombytes("RGB", tuple(size), rgb)
+    img.thumbnail((max_side, max_side))
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=quality)
+    return buf.getvalue()
+
+
+def cover_thumbnail(book: Storybook) -> Optional[bytes]:
+    """Thumbnail of the story's first illustrated page, or None (no image, file gone, undecodable)."""
+    records = book.image_records()
+    if not records:
+        return None
+    try:
+        data = book.read_image_bytes(min(records))
+        if data is None:
+            return None
+        from PIL import Image
+        with Image.open(io.BytesIO(data)) as img:
+            img.draft("RGB", (320, 320))        # cheap JPEG downscale on decode
+            img = img.convert("RGB")
+            return make_thumbnail(img.tobytes(), img.size)
+    except (OSError, ValueError, ImportError) as e:
+        print(f"[StoryLibrary] no cover for {book.path}: {e}")
+        return None
+
+
+def _fts_query(text: str) -> str:
+    """Turn free text into an FTS5 prefix query: every word must match."""
+    words = re.findall(r"\w+", text)
+    return " ".join('"' + w.replace('"', '""') + '"*' for w in words)
+
+
+# ════════════════════════════════════════════════════════════════════
+# StoryLibrary (SQLite index over saved story files)
+# ════════════════════════════════════════════════════════════════════
+class StoryLibrary:
+    """
+    Local index of saved stories: one row per story (title, page count,
+    snippet, small JPEG thumbnail) plus an FTS5 table over page text.
+
+    Listing and search only ever touch this database, never the story
+    files or full-size images.  Falls back to LIKE search when the SQLite
+    build has no FTS5.
+    """
+
+    def __init__(self, db_path: Union[str, Path] = "stories/library.sqlite3"):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self.has_fts = self._create_schema()
+
+    def _create_schema(self) -> bool:
+        c = self._conn
+        c.execute("""
+            CREATE TABLE IF NOT EXISTS stories (
+                story_id   TEXT PRIMARY KEY,
+                path       TEXT NOT NULL,
+                title      TEXT,
+                created    REAL,
+                updated    REAL,
+                page_count INTEGER DEFAULT 0,
+                snippet    TEXT,
+                thumb      BLOB
+            )
+        """)
+        c.execute("CREATE INDEX IF NOT EXISTS stories_updated ON stories(updated DESC)")
+        c.execute("""
+            CREATE TABLE IF NOT EXISTS pages (
+                id       INTEGER PRIMARY KEY,
+                story_id TEXT NOT NULL,
+                page     INTEGER NOT NULL,
+                text     TEXT,
+                UNIQUE (story_id, page)
+            )
+        """)
+        # External-content FTS5 index over pages.text, kept in sync by triggers,
+        # so replacing one page's text is a keyed update rather than a scan.
+        try:
+            c.executescript("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS page_fts USING fts5(
+                    text, content='pages', content_rowid='id', tokenize='porter unicode61'
+                );
+                CREATE TRIGGER IF NOT EXISTS pages_ai AFTER INSERT ON pages BEGIN
+                    INSERT INTO page_fts(rowid, text) VALUES (new.id, new.text);
+                END;
+                CREATE TRIGGER IF NOT EXISTS pages_ad AFTER DELETE ON pages BEGIN
+                    INSERT INTO page_fts(page_fts, rowid, text) VALUES ('delete', old.id, old.text);
+                END;
+                CREATE TRIGGER IF NOT EXISTS pages_au AFTER UPDATE ON pages BEGIN
+                    INSERT INTO page_fts(page_fts, rowid, text) VALUES ('delete', old.id, old.text);
+                    INSERT INTO page_fts(rowid, text) VALUES (new.id, new.text);
+                END;
+            """)
+            has_fts = True
+        except sqlite3.OperationalError:
+            has_fts = False
+        c.commit()
+        return has_fts
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    # ------------- Writes -------------------------------------------------------
+    def upsert_story(self, story_id: str, path: Union[str, Path], *, title: Optional[str] = None,
+                     created: Optional[float] = None, page_count: Optional[int] = None,
+                     snippet: Optional[str] = None) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute("""
+                INSERT INTO stories (story_id, path, title, created, updated, page_count, snippet)
+                VALUES (?, ?, ?, ?, ?, COALESCE(?, 0), ?)
+                ON CONFLICT(story_id) DO UPDATE SET
+                    path       = excluded.path,
+                    title      = COALESCE(excluded.title, stories.title),
+                    updated    = excluded.updated,
+                    page_count = COALESCE(?, stories.page_count),
+                    snippet    = COALESCE(excluded.snippet, stories.snippet)
+            """, (story_id, str(path), title, created or now, now, page_count, snippet, page_count))
+            self._conn.commit()
+
+    def update_page(self, story_id: str, page: int, text: str) -> None:
+        """Replace the indexed text of one page (called after every turn)."""
+        with self._lock:
+            self._conn.execute("""
+                INSERT INTO pages (story_id, page, text) VALUES (?, ?, ?)
+                ON CONFLICT(story_id, page) DO UPDATE SET text = excluded.text
+            """, (story_id, page, text))
+            self._conn.commit()
+
+    def set_thumbnail(self, story_id: str, thumb: bytes) -> None:
+        with self._lock:
+            self._conn.execute("UPDATE stories SET thumb = ? WHERE story_id = ?", (thumb, story_id))
+            self._conn.commit()
+
+    def index_file(self, path: Union[str, Path], thumb: Optional[bytes] = None) -> str:
+        """
+        (Re)index a whole story file, e.g. one copied in from another
+        machine.  Without *thumb* the cover is made from the first page's
+        illustration.
+        """
+        book = Storybook(path)
+        meta = book.meta
+        story_id = meta.get("story_id") or Path(path).stem
+        pages = book.pages
+        self.upsert_story(
+            story_id, path,
+            title=meta.get("title"),
+            created=meta.get("created"),
+            page_count=len(pages),
+            snippet=pages[0][0].strip() if pages and pages[0] else None,
+        )
+        with self._lock:
+            self._conn.execute("DELETE FROM pages WHERE story_id = ?", (story_id,))
+            self._conn.executemany(
+                "INSERT INTO pages (story_id, page, text) VALUES (?, ?, ?)",
+                [(story_id, i, " ".join(p)) for i, p in enumerate(pages)],
+            )
+            self._conn.commit()
+        if thumb is None:
+            thumb = cover_thumbnail(book)
+        if thumb is not None:
+            self.set_thumbnail(story_id, thumb)
+        return story_id
+
+    def scan_dir(self, stories_dir: Union[str, Path]) -> int:
+        """Index story files that are not in the library yet; returns how many."""
+        with self._lock:
+            known = {row[0] for row in self._conn.execute("SELECT path FROM stories")}
+        added = 0
+        for path in Path(stories_dir).glob(f"*{SUFFIX}"):
+            if str(path) not in known:
+                try:
+                    self.index_file(path)
+                    added += 1
+                except (OSError, ValueError) as e:
+                    print(f"[StoryLibrary] skip {path}: {e}")
+        return added
+
+    # ------------- Reads ----------------------------------------------------------
+    def _where(self, query: str):
+        if not query.strip():
+            return "", ()
+        if self.has_fts:
+            q = _fts_query(query)
+            if not q:
+                return "", ()
+            return ("WHERE s.story_id IN (SELECT p.story_id FROM page_fts JOIN pages p ON p.id = page_fts.rowid "
+                    "WHERE page_fts MATCH ?)", (q,))
+        like = f"%{query.strip()}%"
+        return ("WHERE s.title LIKE ? OR s.story_id IN (SELECT story_id FROM pages WHERE text LIKE ?)",
+                (like, like))
+
+    def count(self, query: str = "") -> int:
+        where, args = self._where(query)
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM stories s {where}", args).fetchone()[0]
+
+    def list(self, query: str = "", offset: int = 0, limit: int = 50,
+             with_thumbs: bool = True) -> List[Dict[str, Any]]:
+        """One page of stories, newest first, optionally filtered by full-text *query*."""
+        where, args = self._where(query)
+        cols: Sequence[str] = ("story_id", "path", "title", "updated", "page_count", "snippet")
+        if with_thumbs:
+            cols = tuple(cols) + ("thumb",)
+        sql = (f"SELECT {', '.join('s.' + c for c in cols)} FROM stories s {where} "
+               f"ORDER BY s.updated DESC LIMIT ? OFFSET ?")
+        with self._lock:
+            rows = self._conn.execute(sql, args + (limit, offset)).fetchall()
+        return [dict(zip(cols, row)) for row in rows]
@@ -1,15 +1,52 @@
 from config.config_loader import load_config
-from phi3_mini_engine import Phi3MiniEngine
-from chat_gpt_engine import ChatGPTEngine
+
 
 def get_llm_engine():
     config = load_config()
     engine_type = config["llm"]["engine"]
-    engine_type.lower() # lowercase
+    engine_type = engine_type.lower() # lowercase
 
+    # Engines are imported lazily so "fake" runs need neither transformers nor openai
     if engine_type == "phi3":
-        return Phi3MiniEngine()
+        from phi3_mini_engine import Phi3MiniEngine
+        return Phi3MiniEngine(
+            prompt_cache=config["llm"].get("prompt_cache", True),
+            prompt_cache_verify=config["llm"].get("prompt_cache_verify", 50),
+        )
     elif engine_type == "gpt":
+        from chat_gpt_engine import ChatGPTEngine
         return ChatGPTEngine()
+    elif engine_type == "fake":
+        from fake_engines import FakeLLMEngine
+        fake_cfg = (config.get("fake") or {}).get("llm") or {}
+        return FakeLLMEngine(
+            fake_cfg.get("script"),
+            latency_ms=fake_cfg.get("latency_ms", 50),
+            tokens_per_s=fake_cfg.get("tokens_per_s", 40),
+            malformed_rate=fake_cfg.get("malformed_rate", 0.0),
+        )
     else:
         raise ValueError(f"Unknown LLM engine type: {engine_type}")
+
+
+def get_image_engine():
+    config = load_config()
+    image_cfg = config.get("image", {})
+    engine_type = image_cfg.get("engine", "sd15").lower()
+
+    if engine_type == "sd15":
+        from stable_engine import StableV15Engine
+        return StableV15Engine(
+            memory_mode=image_cfg.get("memory_mode", "default"),
+            memory_options=image_cfg.get("memory") or {},
+            embed_cache_size=image_cfg.get("embed_cache_size", 64),
+        )
+    elif engine_type == "fake":
+        from fake_engines import FakeImageEngine
+        fake_cfg = (config.get("fake") or {}).get("image") or {}
+        return FakeImageEngine(
+            step_ms=fake_cfg.get("step_ms", 50),
+            size=fake_cfg.get("size", 512),
+        )
+    else:
+        raise ValueError(f"Unknown image engine type: {engine_type}")
@@ -0,0 +1,373 @@
+import bisect
+import math
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from config.config_loader import load_config
+from core.resource_usage import current_rss_mb, peak_rss_mb
+from core.tracing import RotatingJsonlSink
+
+# Latency buckets in seconds (LLM calls, turns, illustrations, queue waits)
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, object]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items())) if labels else ()
+
+
+def _format_labels(key: LabelKey, extra: str = "") -> str:
+    parts = [f'{k}="{v}"' for k, v in key]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    """Sample value: integers exactly, floats at full precision (never ``:g``'s 6 digits)."""
+    if isinstance(value, int):
+        return str(value)
+    value = float(value)
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(value)
+
+
+# ════════════════════════════════════════════════════════════════════
+# Metric types
+# ════════════════════════════════════════════════════════════════════
+class _NullMetric:
+    """Returned when metrics are off: every update is a no-op."""
+
+    __slots__ = ()
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        pass
+
+    def set(self, value: float, **labels) -> None:
+        pass
+
+    def observe(self, value: float, **labels) -> None:
+        pass
+
+
+_NULL_METRIC = _NullMetric()
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, doc: str):
+        self.name = name
+        self.doc = doc
+        self._lock = threading.Lock()
+        self._values: Dict[LabelKey, float] = {}
+
+    def samples(self) -> List[Tuple[str, LabelKey, float]]:
+        with self._lock:
+            return [(self.name, key, value) for key, value in self._values.items()]
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            return {_format_labels(key) or "": value for key, value in self._values.items()}
+
+    def drain(self) -> List[Tuple[LabelKey, object]]:
+        """Current values by label key (see MetricsRegistry.drain)."""
+        with self._lock:
+            return list(self._values.items())
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def drain(self) -> List[Tuple[LabelKey, object]]:
+        with self._lock:
+            items = list(self._values.items())
+            self._values.clear()
+        return items
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[_label_key(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Histogram(_Metric):
+    """Fixed buckets; observe() is one bisect plus three additions under a lock."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, doc: str, buckets: Sequence[float] = SECONDS_BUCKETS):
+        super().__init__(name, doc)
+        self.buckets = tuple(sorted(buckets))
+        self._counts: Dict[LabelKey, List[int]] = {}
+        self._sums: Dict[LabelKey, float] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = _label_key(labels)
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._counts.get(key)
+            if counts is None:
+                counts = self._counts[key] = [0] * (len(self.buckets) + 1)
+                self._sums[key] = 0.0
+            counts[idx] += 1
+            self._sums[key] += value
+
+    def merge(self, key: LabelKey, counts: List[int], total: float) -> None:
+        """Add bucket counts and a sum recorded elsewhere (same buckets) under *key*."""
+        if len(counts) != len(self.buckets) + 1:
+            return
+        with self._lock:
+            own = self._counts.get(key)
+            if own is None:
+                own = self._counts[key] = [0] * (len(self.buckets) + 1)
+                self._sums[key] = 0.0
+            for i, count in enumerate(counts):
+                own[i] += count
+            self._sums[key] += total
+
+    def drain(self) -> List[Tuple[LabelKey, object]]:
+        with self._lock:
+            items = [(key, (counts, self._sums[key])) for key, counts in self._counts.items()]
+            self._counts, self._sums = {}, {}
+        return items
+
+    def samples(self) -> List[Tuple[str, LabelKey, float]]:
+        out = []
+        with self._lock:
+            for key, counts in self._counts.items():
+                cumulative = 0
+                for bound, count in zip(self.buckets, counts):
+                    cumulative += count
+                    out.append((f"{self.name}_bucket", key + (("le", repr(bound)),), cumulative))
+                cumulative += counts[-1]
+                out.append((f"{self.name}_bucket", key + (("le", "+Inf"),), cumulative))
+                out.append((f"{self.name}_sum", key, self._sums[key]))
+                out.append((f"{self.name}_count", key, cumulative))
+        return out
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {
+                _format_labels(key) or "": {"count": sum(counts), "sum": round(self._sums[key], 6)}
+                for key, counts in self._counts.items()
+            }
+
+
+# ════════════════════════════════════════════════════════════════════
+# MetricsRegistry
+# ════════════════════════════════════════════════════════════════════
+class MetricsRegistry:
+    """
+    Named counters, gauges and histograms.  counter()/gauge()/histogram()
+    return the existing metric of that name, so call sites can look them
+    up on use; when disabled they return a shared no-op object.
+    """
+
+    def __init__(self, enabled: bool = True, prefix: str = "storypal_"):
+        self.enabled = enabled
+        self.prefix = prefix
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name: str, doc: str, **kwargs):
+        if not self.enabled:
+            return _NULL_METRIC
+        metric = self._metrics.get(name)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.get(name)
+                if metric is None:
+                    metric = self._metrics[name] = cls(self.prefix + name, doc, **kwargs)
+        return metric
+
+    def counter(self, name: str, doc: str = "") -> Counter:
+        return self._get(Counter, name, doc)
+
+    def gauge(self, name: str, doc: str = "") -> Gauge:
+        return self._get(Gauge, name, doc)
+
+    def histogram(self, name: str, doc: str = "", buckets: Sequence[float] = SECONDS_BUCKETS) -> Histogram:
+        return self._get(Histogram, name, doc, buckets=buckets)
+
+    def render_prometheus(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        lines = []
+        for metric in metrics:
+            if metric.doc:
+                lines.append(f"# HELP {metric.name} {metric.doc}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, key, value in metric.samples():
+                lines.append(f"{name}{_format_labels(key)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> Dict[str, object]:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: metric.snapshot() for metric in metrics}
+
+    # ------------- Child processes -----------------------------------------------
+    def drain(self) -> List[tuple]:
+        """
+        Picklable ``(kind, name, doc, buckets, label key, value)`` records of
+        this registry; counters and histograms start again from zero.  The
+        image service sends them with each result and the GUI process
+        merge()s them, so they reach its metrics file and /metrics.
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        records = []
+        for metric in metrics:
+            name = metric.name[len(self.prefix):]
+            buckets = getattr(metric, "buckets", None)
+            for key, value in metric.drain():
+                records.append((metric.kind, name, metric.doc, buckets, key, value))
+        return records
+
+    def merge(self, records) -> None:
+        """Add drain() records from another process: counters/histograms add up, gauges are replaced."""
+        if not self.enabled:
+            return
+        for kind, name, doc, buckets, key, value in records:
+            if kind == "counter":
+                self.counter(name, doc).inc(value, **dict(key))
+            elif kind == "gauge":
+                self.gauge(name, doc).set(value, **dict(key))
+            elif kind == "histogram":
+                self.histogram(name, doc, buckets=buckets).merge(key, *value)
+
+
+# ════════════════════════════════════════════════════════════════════
+# Background threads
+# ════════════════════════════════════════════════════════════════════
+class ResourceSampler:
+    """
+    Every *interval_s*: process RSS, CPU use (percent of one core since the
+    last sample) and Python threads, as gauges.  torch's thread counts are
+    per thread, so the workers publish their own ``torch_threads``
+    (core.cpu_budget.set_torch_threads).
+    """
+
+    def __init__(self, registry: MetricsRegistry, interval_s: float = 5.0):
+        self.registry = registry
+        self.interval_s = interval_s
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="metrics-sampler", daemon=True)
+
+    def start(self) -> "ResourceSampler":
+        self._thread.start()
+        return self
+
+    def sample(self, last: Tuple[float, float]) -> Tuple[float, float]:
+        reg = self.registry
+        now, cpu = time.perf_counter(), time.process_time()
+        if now > last[0]:
+            reg.gauge("process_cpu_percent", "CPU use since the last sample (100 = one core)").set(
+                round(100 * (cpu - last[1]) / (now - last[0]), 1))
+        reg.gauge("process_rss_mb", "Resident set size").set(round(current_rss_mb(), 1))
+        reg.gauge("process_peak_rss_mb", "Peak resident set size").set(round(peak_rss_mb(), 1))
+        reg.gauge("python_threads", "Live Python threads").set(threading.active_count())
+        return now, cpu
+
+    def _run(self) -> None:
+        last = (time.perf_counter(), time.process_time())
+        while not self._stop.wait(self.interval_s):
+            last = self.sample(last)
+
+    def stop(self) -> None:
+        self._stop.set()
+
+
+class MetricsFileWriter:
+    """Desktop mode: appends a registry snapshot to a rotating JSONL file every *interval_s*."""
+
+    def __init__(self, registry: MetricsRegistry, path: str, *, interval_s: float = 30.0,
+                 max_bytes: int = 5 * 1024 * 1024, backups: int = 2):
+        self.registry = registry
+        self.interval_s = interval_s
+        self.sink = RotatingJsonlSink(path, max_bytes=max_bytes, backups=backups)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="metrics-file", daemon=True)
+
+    def start(self) -> "MetricsFileWriter":
+        self._thread.start()
+        return self
+
+    def write(self) -> None:
+        self.sink.write({"ts": time.time(), "pid": os.getpid(), "metrics": self.registry.snapshot()})
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_s):
+            self.write()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self.write()                # last snapshot on exit
+        self.sink.close()
+
+
+# ════════════════════════════════════════════════════════════════════
+# Process-wide registry
+# ════════════════════════════════════════════════════════════════════
+_registry: Optional[MetricsRegistry] = None
+_background: List[object] = []
+_registry_lock = threading.Lock()
+
+
+def get_metrics() -> MetricsRegistry:
+    """Process-wide registry from config ``metrics`` (disabled → no-op metrics)."""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                cfg = load_config().get("metrics") or {}
+                _registry = MetricsRegistry(enabled=cfg.get("enabled", True))
+    return _registry
+
+
+def start_metrics(mode: str = "desktop") -> MetricsRegistry:
+    """
+    Start the resource sampler and, in ``desktop`` mode, the rolling
+    metrics file (server mode exposes /metrics instead).  Idempotent.
+    """
+    registry = get_metrics()
+    with _registry_lock:
+        if _background or not registry.enabled:
+            return registry
+        cfg = load_config().get("metrics") or {}
+        _background.append(ResourceSampler(registry, cfg.get("sample_s", 5)).start())
+        if mode == "desktop" and cfg.get("file"):
+            _background.append(MetricsFileWriter(
+                registry, cfg["file"],
+                interval_s=cfg.get("file_interval_s", 30),
+                max_bytes=int(cfg.get("max_mb", 5) * 1024 * 1024),
+                backups=cfg.get("backups", 2),
+            ).start())
+    return registry
+
+
+def stop_metrics() -> None:
+    with _registry_lock:
+        while _background:
+            _background.pop().stop()
@@ -0,0 +1,292 @@
+import cProfile
+import functools
+import inspect
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Optional
+
+from config.config_loader import load_config
+from core.metrics import get_metrics
+from core.tracing import get_tracer
+
+MODES = ("sample", "cprofile", "torch")
+MAX_STACK_DEPTH = 96
+
+
+# ════════════════════════════════════════════════════════════════════
+# Stack sampler (mode "sample")
+# ════════════════════════════════════════════════════════════════════
+class _StackSampler:
+    """
+    One daemon thread that, every *interval_s*, reads the Python stack of
+    each thread currently inside a capture window (``sys._current_frames``)
+    and counts it as a folded ``root;…;leaf`` line.  Only the sampled
+    threads pay anything, and only the cost of the GIL hand-off, so it can
+    stay on while children use the app.  Time spent inside torch kernels
+    shows up under the Python call that launched them.
+    """
+
+    def __init__(self, interval_s: float = 0.005):
+        self.interval_s = interval_s
+        self._targets: Dict[int, Counter] = {}
+        self._labels: Dict[object, str] = {}     # code object → "file.py:function"
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, ident: int) -> Counter:
+        counts: Counter = Counter()
+        with self._lock:
+            self._targets[ident] = counts
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+                self._thread.start()
+            self._wake.set()
+        return counts
+
+    def remove(self, ident: int) -> Counter:
+        with self._lock:
+            return self._targets.pop(ident, Counter())
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            label = self._labels[code] = f"{os.path.basename(code.co_filename)}:{code.co_name}"
+        return label
+
+    def _fold(self, frame) -> str:
+        labels = []
+        while frame is not None and len(labels) < MAX_STACK_DEPTH:
+            labels.append(self._label(frame.f_code))
+            frame = frame.f_back
+        return ";".join(reversed(labels))
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                if not self._targets:
+                    self._wake.clear()
+            self._wake.wait()
+            frames = sys._current_frames()
+            with self._lock:
+                for ident, counts in self._targets.items():
+                    frame = frames.get(ident)
+                    if frame is not None:
+                        counts[self._fold(frame)] += 1
+            del frames
+            time.sleep(self.interval_s)
+
+
+# ════════════════════════════════════════════════════════════════════
+# Profiler
+# ════════════════════════════════════════════════════════════════════
+class Profiler:
+    """
+    Capture windows around hot paths (a chat turn, an LLM call, an
+    illustration).  Every window is profiled, but a profile is only
+    written to *out_dir* when the window took longer than its threshold
+    (*thresholds_ms* by window name, else ``default``), named after the
+    turn id so it can be matched with logs/trace.jsonl.
+
+    Modes:
+      sample    folded stacks (``.folded``: speedscope, flamegraph.pl); cheap
+      cprofile  deterministic cProfile (``.prof`` + top functions ``.txt``)
+      torch     torch.profiler operator trace (``.json`` for chrome://tracing + ``.txt``)
+
+    cprofile/torch profile one window at a time; a window that opens
+    while another one is being profiled runs unprofiled.  Windows nested
+    on the same thread (doWork → generate_reply) count as the outer one.
+    When disabled, capture() yields immediately.
+    """
+
+    def __init__(self, *, enabled: bool = False, mode: str = "sample", out_dir="logs/profiles",
+                 thresholds_ms: Optional[Dict[str, float]] = None, interval_ms: float = 5.0,
+                 max_files: int = 50):
+        if mode not in MODES:
+            raise ValueError(f"Unknown profiling mode: {mode}")
+        self.enabled = enabled
+        self.mode = mode
+        self.out_dir = Path(out_dir)
+        self.thresholds_ms = {"default": 3000.0, **(thresholds_ms or {})}
+        self.max_files = max_files
+        self.saved = 0
+        self._sampler = _StackSampler(interval_ms / 1000) if mode == "sample" else None
+        self._exclusive = threading.Lock()          # cProfile / torch.profiler: one window at a time
+        self._local = threading.local()
+
+    def threshold_ms(self, name: str) -> float:
+        return self.thresholds_ms.get(name, self.thresholds_ms["default"])
+
+    @contextmanager
+    def capture(self, name: str, turn_id: Optional[str] = None):
+        if not self.enabled or getattr(self._local, "active", False):
+            yield
+            return
+        self._local.active = True
+        try:
+            session = self._start()
+            start = time.perf_counter()
+            try:
+                yield
+            finally:
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                self._finish(session, name, turn_id or get_tracer().current_turn(), elapsed_ms)
+        finally:
+            self._local.active = False
+
+    # ------------- Backends ------------------------------------------------------
+    def _start(self):
+        if self.mode == "sample":
+            return self._sampler.add(threading.get_ident())
+        if not self._exclusive.acquire(blocking=False):
+            return None
+        try:
+            if self.mode == "cprofile":
+                session = cProfile.Profile()
+                session.enable()
+                return session
+            import torch
+            activities = [torch.profiler.ProfilerActivity.CPU]
+            if torch.cuda.is_available():
+                activities.append(torch.profiler.ProfilerActivity.CUDA)
+            session = torch.profiler.profile(activities=activities, record_shapes=True)
+            session.__enter__()
+            return session
+        except Exception:
+            self._exclusive.release()
+            raise
+
+    def _finish(self, session, name: str, turn_id: Optional[str], elapsed_ms: float) -> None:
+        if self.mode == "sample":
+            session = self._sampler.remove(threading.get_ident())
+        elif session is None:
+            return
+        else:
+            try:
+                if self.mode == "cprofile":
+                    session.disable()
+                else:
+                    session.__exit__(None, None, None)
+            finally:
+                self._exclusive.release()
+        if elapsed_ms < self.threshold_ms(name):
+            return
+        try:
+            path = self._save(session, name, turn_id, elapsed_ms)
+        except Exception as e:
+            print(f"[Profile] Could not save {name} profile: {e}")
+            return
+        if path is not None:
+            self.saved += 1
+            get_metrics().counter("profiles_saved_total", "Slow windows written by the profiler").inc(window=name)
+            print(f"[Profile] {name} took {elapsed_ms:.0f} ms (turn {turn_id or '-'}) → {path}")
+
+    def _save(self, session, name: str, turn_id: Optional[str], elapsed_ms: float) -> Optional[Path]:
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        now = time.time()
+        stamp = f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(now))}-{int(now * 1000) % 1000:03d}"
+        base = self.out_dir / f"{stamp}_{turn_id or 'noturn'}_{name}_{elapsed_ms:.0f}ms"
+
+        if self.mode == "sample":
+            if not session:
+                return None
+            path = base.with_suffix(".folded")
+            path.write_text("".join(f"{stack} {count}\n" for stack, count in session.most_common()),
+                            encoding="utf-8")
+        elif self.mode == "cprofile":
+            path = base.with_suffix(".prof")
+            session.dump_stats(str(path))
+            summary = io.StringIO()
+            pstats.Stats(session, stream=summary).sort_stats("cumulative").print_stats(40)
+            base.with_suffix(".txt").write_text(summary.getvalue(), encoding="utf-8")
+        else:
+            path = base.with_suffix(".json")
+            session.export_chrome_trace(str(path))
+            base.with_suffix(".txt").write_text(
+                session.key_averages().table(sort_by="self_cpu_time_total", row_limit=40), encoding="utf-8")
+        self._prune()
+        return path
+
+    def _prune(self) -> None:
+        """Keep the newest *max_files* profiles (companion .txt files go with their profile)."""
+        profiles = sorted((p for p in self.out_dir.iterdir() if p.suffix in (".folded", ".prof", ".json")),
+                          key=lambda p: p.stat().st_mtime)
+        for old in profiles[:max(0, len(profiles) - self.max_files)]:
+            old.unlink(missing_ok=True)
+            old.with_suffix(".txt").unlink(missing_ok=True)
+
+
+def profiled(name: str):
+    """
+    Decorator: run the function inside ``get_profiler().capture(name)``.
+    A generator function is captured while it is iterated (first next()
+    until exhausted or closed), not just while the generator is created;
+    the window also covers the consumer's work between items, which must
+    all run on one thread.
+    """
+    def decorator(fn):
+        if inspect.isgeneratorfunction(fn):
+            @functools.wraps(fn)
+            def generator_wrapper(*args, **kwargs):
+                profiler = get_profiler()
+                if not profiler.enabled:
+                    return (yield from fn(*args, **kwargs))
+                with profiler.capture(name):
+                    return (yield from fn(*args, **kwargs))
+            return generator_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            profiler = get_profiler()
+            if not profiler.enabled:
+                return fn(*args, **kwargs)
+            with profiler.capture(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# ════════════════════════════════════════════════════════════════════
+# Process-wide profiler
+# ════════════════════════════════════════════════════════════════════
+_profiler: Optional[Profiler] = None
+_profiler_lock = threading.Lock()
+
+
+def get_profiler() -> Profiler:
+    """
+    Process-wide profiler from config ``profiling``.  ``STORY_PROFILE=1``
+    forces it on; ``STORY_PROFILE=sample|cprofile|torch`` also picks the mode.
+    """
+    global _profiler
+    if _profiler is None:
+        with _profiler_lock:
+            if _profiler is None:
+                cfg = load_config().get("profiling") or {}
+                env = os.environ.get("STORY_PROFILE", "")
+                thresholds = cfg.get("threshold_ms", 3000)
+                if not isinstance(thresholds, dict):
+                    thresholds = {"default": thresholds}
+                _profiler = Profiler(
+                    enabled=cfg.get("enabled", False) or env == "1" or env in MODES,
+                    mode=env if env in MODES else cfg.get("mode", "sample"),
+                    out_dir=cfg.get("dir", "logs/profiles"),
+                    thresholds_ms=thresholds,
+                    interval_ms=cfg.get("interval_ms", 5),
+                    max_files=cfg.get("max_files", 50),
+                )
+    return _profiler
+
+
+def set_profiler(profiler: Profiler) -> None:
+    """Install *profiler* as the process-wide profiler (headless tools, benchmarks)."""
+    global _profiler
+    with _profiler_lock:
+        _profiler = profiler
@@ -0,0 +1,259 @@
+import re
+import threading
+from collections import OrderedDict, deque
+from typing import Deque, Dict, List, Optional, Tuple, Union
+
+from core.metrics import get_metrics
+
+TAIL_TOKENS = 8          # tokens re-tokenized at the end of a grown piece (merges across the old end)
+INCREMENTAL_MIN_CHARS = 256
+INCREMENTAL_CHECKS = 20  # prompts built incrementally that are always checked before sampling
+
+
+class _Piece:
+    """Token ids of one text piece, with each token's start offset (None without a fast tokenizer)."""
+
+    __slots__ = ("text", "ids", "starts")
+
+    def __init__(self, text: str, ids: List[int], starts: Optional[List[int]]):
+        self.text = text
+        self.ids = ids
+        self.starts = starts
+
+
+# ════════════════════════════════════════════════════════════════════
+# PromptCache
+# ════════════════════════════════════════════════════════════════════
+class PromptCache:
+    """
+    Chat-template rendering and tokenization for one tokenizer, reusing
+    work across calls.
+
+    Template: per message-list shape (the roles in order) the template is
+    rendered once with placeholder contents and kept as literal segments,
+    so rendering is a join.  Shapes whose template does anything but
+    paste the content in (checked with two placeholder sets) are always
+    rendered by ``apply_chat_template``.
+
+    Tokens: the prompt is split at the tokenizer's added tokens
+    (``<|system|>``, ``<|end|>``, …), which the tokenizer never merges
+    across, and each text piece's ids are kept in an LRU: the constant
+    system prompts cost a lookup.  A piece that extends a recent one (the
+    story context grows at the tail) only has its last TAIL_TOKENS and
+    the new text tokenized.  The first INCREMENTAL_CHECKS prompts built
+    that way, and after that every *verify_every*-th prompt, are also
+    tokenized in full (the full ids are what the model gets); on a
+    mismatch the incremental path, then the token cache, is switched off
+    for good.
+
+    With *enabled* False, render()/encode() are plain
+    ``apply_chat_template`` + ``tokenizer(prompt)``.
+    """
+
+    def __init__(self, tokenizer, *, enabled: bool = True, max_pieces: int = 256, verify_every: int = 50):
+        self.tokenizer = tokenizer
+        self.enabled = enabled
+        self.max_pieces = max_pieces
+        self.verify_every = max(1, verify_every)
+        self.incremental = enabled and getattr(tokenizer, "is_fast", False)
+        self.last_cached_tokens = 0         # ids taken from the cache by the last encode()
+        self._templates: Dict[Tuple[str, ...], Optional[List[str]]] = {}
+        self._pieces: "OrderedDict[str, _Piece]" = OrderedDict()
+        self._recent: Deque[_Piece] = deque(maxlen=8)       # long pieces, for incremental matches
+        self._encodes = 0
+        self._extensions_checked = 0
+        self._lock = threading.Lock()
+        self.token_cache = enabled and self._init_specials()
+
+    # ------------- Tokenizer introspection -----------------------------------------
+    def _init_specials(self) -> bool:
+        """Added tokens (regex, strip flags), BOS/EOS wrapping and an anchor token; False if unusable."""
+        tok = self.tokenizer
+        added = getattr(tok, "added_tokens_decoder", None) or {}
+        if not added:
+            return False
+        self._added = {t.content: (i, getattr(t, "lstrip", False), getattr(t, "rstrip", False))
+                       for i, t in added.items()}
+        names = sorted(self._added, key=len, reverse=True)
+        self._split_re = re.compile("(" + "|".join(re.escape(n) for n in names) + ")")
+
+        # Special tokens tokenizer(prompt) adds around the text (e.g. BOS)
+        core = tok("a", add_special_tokens=False)["input_ids"]
+        full = tok("a")["input_ids"]
+        for pos in range(len(full) - len(core) + 1):
+            if full[pos:pos + len(core)] == core:
+                self._prefix_ids, self._suffix_ids = full[:pos], full[pos + len(core):]
+                break
+        else:
+            return False
+
+        # A piece after an added token is tokenized behind one, so it sees the
+        # same context (no "start of text" prefix space) as inside the prompt
+        self._anchor, self._anchor_len = "", 0
+        for name, (_, lstrip, rstrip) in self._added.items():
+            if not lstrip and not rstrip and len(tok(name, add_special_tokens=False)["input_ids"]) == 1:
+                self._anchor, self._anchor_len = name, 1
+                break
+        return True
+
+    # ------------- Template --------------------------------------------------------
+    def _full_render(self, messages) -> str:
+        tok = self.tokenizer
+        if hasattr(tok, "apply_chat_template"):
+            return tok.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
+        parts = [f"<|{m['role']}|>\n{m['content']}<|end|>" for m in messages]
+        parts.append("<|assistant|>\n")
+        return "\n".join(parts)
+
+    def _segments(self, roles: Tuple[str, ...]) -> Optional[List[str]]:
+        """Literal template text around each message's content, or None if not a plain paste."""
+        results = []
+        for mark in ("\x02{}\x03", "\x02#{}#\x03"):
+            placeholders = [mark.format(i) for i in range(len(roles))]
+            rendered = self._full_render([{"role": r, "content": p} for r, p in zip(roles, placeholders)])
+            segments, rest = [], rendered
+            for placeholder in placeholders:
+                head, sep, rest = rest.partition(placeholder)
+                if not sep:
+                    return None
+                segments.append(head)
+            segments.append(rest)
+            results.append(segments)
+        return results[0] if results[0] == results[1] else None
+
+    def render(self, messages) -> str:
+        if not self.enabled:
+            return self._full_render(messages)
+        roles = tuple(m["role"] for m in messages)
+        if roles not in self._templates:
+            self._templates[roles] = self._segments(roles)
+        segments = self._templates[roles]
+        if segments is None:
+            return self._full_render(messages)
+        parts = [segments[0]]
+        for message, segment in zip(messages, segments[1:]):
+            parts.append(message["content"])
+            parts.append(segment)
+        return "".join(parts)
+
+    # ------------- Tokens ----------------------------------------------------------
+    def _split(self, prompt: str) -> List[Union[int, str]]:
+        """Prompt as text pieces and added-token ids, applying the tokens' lstrip/rstrip."""
+        parts: List[Union[int, str]] = []
+        strip_next = False
+        for i, part in enumerate(self._split_re.split(prompt)):
+            if i % 2 == 0:                  # text
+                if strip_next:
+                    part = part.lstrip()
+                    strip_next = False
+                parts.append(part)
+                continue
+            token_id, lstrip, rstrip = self._added[part]
+            if lstrip and parts and isinstance(parts[-1], str):
+                parts[-1] = parts[-1].rstrip()
+            parts.append(token_id)
+            strip_next = rstrip
+        return [p for p in parts if p != ""]
+
+    def _tokenize(self, text: str, anchored: bool) -> _Piece:
+        anchor = self._anchor if anchored else ""
+        enc = self.tokenizer(anchor + text, add_special_tokens=False,
+                             return_offsets_mapping=self.incremental)
+        skip = self._anchor_len if anchor else 0
+        starts = None
+        if self.incremental:
+            starts = [s - len(anchor) for s, _ in enc["offset_mapping"][skip:]]
+        return _Piece(text, list(enc["input_ids"][skip:]), starts)
+
+    def _extend(self, prev: _Piece, text: str) -> Optional[_Piece]:
+        """Tokenize *text* (= prev.text + more) re-using all but the last TAIL_TOKENS of *prev*."""
+        keep = len(prev.ids) - TAIL_TOKENS
+        if keep < 2:
+            return None
+        anchor, cut = prev.starts[keep - 1], prev.starts[keep]
+        if not 0 <= anchor < cut:
+            return None
+        # Start one token early so the kept tail is tokenized mid-text, then drop that token
+        enc = self.tokenizer(text[anchor:], add_special_tokens=False, return_offsets_mapping=True)
+        offsets, rel = enc["offset_mapping"], cut - anchor
+        first = next((j for j, (s, _) in enumerate(offsets) if s >= rel), None)
+        if first is None or offsets[first][0] != rel or (first and offsets[first - 1][1] > rel):
+            return None                     # a token spans the cut: no clean boundary
+        return _Piece(text, prev.ids[:keep] + list(enc["input_ids"][first:]),
+                      prev.starts[:keep] + [s + anchor for s, _ in offsets[first:]])
+
+    def _piece(self, text: str, anchored: bool) -> Tuple[_Piece, int, bool]:
+        """(piece, ids reused, whether the incremental path was used)."""
+        key = f"{int(anchored)}{text}"
+        piece = self._pieces.get(key)
+        if piece is not None:
+            self._pieces.move_to_end(key)
+            return piece, len(piece.ids), False
+
+        reused, extended = 0, False
+        if self.incremental and anchored and len(text) >= INCREMENTAL_MIN_CHARS:
+            prev = max((p for p in self._recent if text.startswith(p.text)), key=lambda p: len(p.text), default=None)
+            if prev is not None:
+                piece = self._extend(prev, text)
+                if piece is not None:
+                    reused, extended = len(prev.ids) - TAIL_TOKENS, True
+            if piece is None:
+                piece = self._tokenize(text, anchored)
+            self._recent.append(piece)
+        else:
+            piece = self._tokenize(text, anchored)
+
+        self._pieces[key] = piece
+        while len(self._pieces) > self.max_pieces:
+            self._pieces.popitem(last=False)
+        return piece, reused, extended
+
+    def encode(self, messages) -> List[int]:
+        """Token ids of ``render(messages)``, as ``tokenizer(prompt)["input_ids"]`` would give them."""
+        prompt = self.render(messages)
+        if not self.token_cache:
+            self.last_cached_tokens = 0
+            return list(self.tokenizer(prompt)["input_ids"])
+
+        metrics = get_metrics()
+        with self._lock:
+            ids = list(self._prefix_ids)
+            cached, extended = 0, False
+            for i, part in enumerate(self._split(prompt)):
+                if isinstance(part, int):
+                    ids.append(part)
+                    continue
+                piece, reused, grew = self._piece(part, anchored=i > 0 and bool(self._anchor))
+                ids.extend(piece.ids)
+                cached += reused
+                extended |= grew
+            ids.extend(self._suffix_ids)
+            self._encodes += 1
+            verify = self._encodes % self.verify_every == 1 or self.verify_every == 1
+            if extended and self._extensions_checked < INCREMENTAL_CHECKS:
+                self._extensions_checked += 1
+                verify = True
+        self.last_cached_tokens = cached
+        metrics.counter("cache_hits_total", "Cache hits").inc(cached, cache="prompt_tokens")
+        metrics.counter("cache_misses_total", "Cache misses").inc(len(ids) - cached, cache="prompt_tokens")
+
+        if verify:
+            full = list(self.tokenizer(prompt)["input_ids"])
+            if full != ids:
+                with self._lock:
+                    self._pieces.clear()
+                    self._recent.clear()
+                    if extended:
+                        self.incremental = False
+                    else:
+                        self.token_cache = False
+                print(f"[PromptCache] Cached ids differ from full tokenization; "
+                      f"{'incremental tokenization' if extended else 'token cache'} disabled.")
+                return full
+        return ids
+
+    def clear(self) -> None:
+        with self._lock:
+            self._templates.clear()
+            self._pieces.clear()
+            self._recent.clear()
@@ -0,0 +1,49 @@
+import os
+import sys
+
+
+# ════════════════════════════════════════════════════════════════════
+# Process memory helpers
+# ════════════════════════════════════════════════════════════════════
+def peak_rss_mb() -> float:
+    """
+    Return the peak resident set size of this process in MiB.
+
+    Uses ``resource`` on POSIX and ``psutil`` (if installed) on Windows.
+    Returns 0.0 when neither is available.
+    """
+    try:
+        import resource
+    except ImportError:
+        resource = None
+
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is KiB on Linux but bytes on macOS
+        if sys.platform == "darwin":
+            return peak / (1024 * 1024)
+        return peak / 1024
+
+    try:
+        import psutil
+    except ImportError:
+        return 0.0
+    info = psutil.Process(os.getpid()).memory_info()
+    return getattr(info, "peak_wset", info.rss) / (1024 * 1024)
+
+
+def current_rss_mb() -> float:
+    """Return the current resident set size of this process in MiB (0.0 if unknown)."""
+    try:
+        import psutil
+        return psutil.Process(os.getpid()).memory_info().rss / (1024 * 1024)
+    except ImportError:
+        pass
+
+    # Linux fallback without psutil
+    try:
+        with open("/proc/self/statm", "r") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        return 0.0
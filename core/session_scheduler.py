@@ -0,0 +1,287 @@
+import asyncio
+import itertools
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, Hashable, List, Optional, Tuple
+
+from core.metrics import get_metrics
+from core.tracing import get_tracer
+
+REJECT = "reject"
+MERGE = "merge"
+
+
+class QueueFull(Exception):
+    """A session's queue is at its depth limit and the policy is ``reject``."""
+
+
+class Superseded(Exception):
+    """A queued job was dropped in favour of a newer one from the same session (``merge``)."""
+
+
+def _percentile(values, q: float) -> Optional[float]:
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round((len(values) - 1) * q)))]
+
+
+# ════════════════════════════════════════════════════════════════════
+# TurnQueue (per-session input queue)
+# ════════════════════════════════════════════════════════════════════
+class TurnQueue:
+    """
+    Bounded FIFO of user inputs waiting for the session's running turn.
+
+    When *max_depth* inputs are already waiting, ``reject`` raises
+    QueueFull and ``merge`` appends the text to the newest waiting input,
+    so a child typing fast gets one combined turn instead of a backlog.
+    A merged item keeps the first input's turn id and queue time.
+    """
+
+    def __init__(self, max_depth: int = 2, policy: str = MERGE):
+        if policy not in (REJECT, MERGE):
+            raise ValueError(f"Unknown overflow policy: {policy}")
+        self.max_depth = max(1, max_depth)
+        self.policy = policy
+        self._items: Deque[list] = deque()
+
+    def put(self, text: str, turn_id: str = "") -> str:
+        """Queue *text*; returns ``"queued"`` or ``"merged"`` (raises QueueFull on reject)."""
+        if len(self._items) < self.max_depth:
+            self._items.append([text, turn_id, time.perf_counter()])
+            return "queued"
+        if self.policy == REJECT:
+            raise QueueFull(f"{len(self._items)} inputs already waiting")
+        self._items[-1][0] = f"{self._items[-1][0]} {text}"
+        return "merged"
+
+    def pop(self) -> Optional[Tuple[str, str, float]]:
+        """Oldest input as ``(text, turn_id, wait_ms)``, or None."""
+        if not self._items:
+            return None
+        text, turn_id, enqueued = self._items.popleft()
+        return text, turn_id, (time.perf_counter() - enqueued) * 1000
+
+    def clear(self) -> None:
+        self._items.clear()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+# ════════════════════════════════════════════════════════════════════
+# SessionScheduler (weighted fair queuing in front of shared engines)
+# ════════════════════════════════════════════════════════════════════
+class _Job:
+    __slots__ = ("session_id", "lane", "fn", "merge_key", "turn_id", "start_tag", "finish_tag",
+                 "enqueued", "seq", "waiters")
+
+    def __init__(self, session_id, lane, fn, merge_key, turn_id, start_tag, finish_tag, seq):
+        self.session_id = session_id
+        self.lane = lane
+        self.fn = fn
+        self.merge_key = merge_key
+        self.turn_id = turn_id
+        self.start_tag = start_tag
+        self.finish_tag = finish_tag
+        self.enqueued = time.perf_counter()
+        self.seq = seq
+        self.waiters: List[asyncio.Future] = []
+
+
+class _Lane:
+    def __init__(self, name: str, slots: int, initializer: Optional[Callable[[], None]] = None):
+        self.name = name
+        self.slots = max(1, slots)
+        self.running = 0
+        self.virtual_time = 0.0
+        self.queues: Dict[str, Deque[_Job]] = {}
+        self.last_finish: Dict[str, float] = {}
+        self.executor = ThreadPoolExecutor(max_workers=self.slots, thread_name_prefix=f"{name}-lane",
+                                           initializer=initializer)
+        self.waits_ms: Deque[float] = deque(maxlen=512)
+        self.completed = 0
+        self.rejected = 0
+        self.merged = 0
+
+    @property
+    def depth(self) -> int:
+        return sum(len(q) for q in self.queues.values())
+
+    def head(self) -> Optional[_Job]:
+        """Queued job with the smallest finish tag (ties: first enqueued)."""
+        heads = [q[0] for q in self.queues.values() if q]
+        return min(heads, key=lambda j: (j.finish_tag, j.seq)) if heads else None
+
+
+class SessionScheduler:
+    """
+    Runs blocking engine calls for many sessions with per-session queues
+    and weighted fair queuing: each job gets a finish tag
+    ``max(V, session's last tag) + cost / weight`` and the lowest tag
+    runs next, so a session that queues ten calls only gets its share
+    while the others keep theirs.
+
+    Two lanes, each with its own worker threads: ``chat`` (*chat_slots*
+    concurrent calls, e.g. feeding core.batching.LLMBatcher) and
+    ``image`` (*image_slots*); *initializers* maps a lane to a function
+    run once in each of its threads (CPU budgets).  Chat has priority: an illustration only
+    starts while no chat call is waiting, unless it has waited
+    *image_max_wait_s* (so pictures are delayed, never starved).
+
+    Each session may have *max_depth* queued jobs per lane.  Beyond that
+    ``reject`` raises QueueFull and ``merge`` drops the session's oldest
+    queued job (its caller gets Superseded).  A job submitted with the
+    *merge_key* of a queued job of the same session replaces it and both
+    callers get the new result.
+
+    Usable as a StorySession runner: ``await scheduler(fn, session_id=..., kind="chat")``.
+    """
+
+    def __init__(self, *, chat_slots: int = 4, image_slots: int = 1, max_depth: int = 2,
+                 policy: str = MERGE, image_max_wait_s: float = 30.0,
+                 initializers: Optional[Dict[str, Callable[[], None]]] = None):
+        if policy not in (REJECT, MERGE):
+            raise ValueError(f"Unknown overflow policy: {policy}")
+        initializers = initializers or {}
+        self.lanes = {
+            "chat": _Lane("chat", chat_slots, initializers.get("chat")),
+            "image": _Lane("image", image_slots, initializers.get("image")),
+        }
+        self.max_depth = max(1, max_depth)
+        self.policy = policy
+        self.image_max_wait_s = image_max_wait_s
+        self.weights: Dict[str, float] = {}
+        self._seq = itertools.count()
+        self._listeners: List[Callable[[str, str, float, int], None]] = []
+
+    # ------------- Sessions ------------------------------------------------------
+    def set_weight(self, session_id: str, weight: float) -> None:
+        self.weights[session_id] = max(0.01, weight)
+
+    def forget(self, session_id: str) -> None:
+        """Drop a closed session's bookkeeping (its queued jobs are superseded)."""
+        self.weights.pop(session_id, None)
+        for lane in self.lanes.values():
+            for job in lane.queues.pop(session_id, ()):
+                self._fail(job, Superseded("session closed"))
+            lane.last_finish.pop(session_id, None)
+
+    def add_listener(self, callback: Callable[[str, str, float, int], None]) -> None:
+        """*callback(lane, session_id, wait_ms, depth)* runs on the loop whenever a job starts."""
+        self._listeners.append(callback)
+
+    # ------------- Submitting ----------------------------------------------------
+    async def __call__(self, fn: Callable[[], Any], *, session_id: Optional[str] = None, kind: str = "chat",
+                       cost: float = 1.0, merge_key: Hashable = None, turn_id: Optional[str] = None) -> Any:
+        lane = self.lanes[kind]
+        session_id = session_id or "-"
+        queue = lane.queues.setdefault(session_id, deque())
+        waiter = asyncio.get_running_loop().create_future()
+
+        if merge_key is not None:
+            for job in queue:
+                if job.merge_key == merge_key:
+                    job.fn = fn
+                    job.waiters.append(waiter)
+                    lane.merged += 1
+                    return await waiter
+
+        if len(queue) >= self.max_depth:
+            if self.policy == REJECT:
+                lane.rejected += 1
+                get_metrics().counter("queue_rejected_total", "Jobs refused by a full session queue").inc(lane=kind)
+                raise QueueFull(f"session {session_id}: {len(queue)} {kind} jobs queued")
+            self._fail(queue.popleft(), Superseded(f"newer {kind} request from session {session_id}"))
+            lane.merged += 1
+
+        start = max(lane.virtual_time, lane.last_finish.get(session_id, 0.0))
+        finish = start + cost / self.weights.get(session_id, 1.0)
+        lane.last_finish[session_id] = finish
+        job = _Job(session_id, lane, fn, merge_key, turn_id, start, finish, next(self._seq))
+        job.waiters.append(waiter)
+        queue.append(job)
+        self._dispatch()
+        return await waiter
+
+    # ------------- Dispatching ---------------------------------------------------
+    def _dispatch(self) -> None:
+        chat, image = self.lanes["chat"], self.lanes["image"]
+        while chat.running < chat.slots and self._start_next(chat):
+            pass
+        while image.running < image.slots:
+            job = image.head()
+            if job is None:
+                break
+            waited = time.perf_counter() - job.enqueued
+            if chat.depth and waited < self.image_max_wait_s:
+                break
+            self._start_next(image)
+
+    def _start_next(self, lane: _Lane) -> bool:
+        job = lane.head()
+        if job is None:
+            return False
+        lane.queues[job.session_id].popleft()
+        lane.virtual_time = max(lane.virtual_time, job.start_tag)   # V = start tag of the job in service
+        lane.running += 1
+
+        wait_ms = (time.perf_counter() - job.enqueued) * 1000
+        lane.waits_ms.append(wait_ms)
+        depth = lane.depth
+        get_tracer().record("queue_wait", wait_ms, job.turn_id, lane=lane.name,
+                            session=job.session_id, depth=depth)
+        metrics = get_metrics()
+        metrics.histogram("queue_wait_seconds", "Time jobs wait in the scheduler").observe(wait_ms / 1000, lane=lane.name)
+        metrics.gauge("queue_depth", "Queued jobs per lane").set(depth, lane=lane.name)
+        for listener in self._listeners:
+            listener(lane.name, job.session_id, wait_ms, depth)
+
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(lane.executor, job.fn)
+        future.add_done_callback(lambda f, job=job: self._finished(job, f))
+        return True
+
+    def _finished(self, job: _Job, future: asyncio.Future) -> None:
+        lane = job.lane
+        lane.running -= 1
+        lane.completed += 1
+        if future.cancelled():
+            self._fail(job, asyncio.CancelledError())
+        elif future.exception() is not None:
+            self._fail(job, future.exception())
+        else:
+            for waiter in job.waiters:
+                if not waiter.done():
+                    waiter.set_result(future.result())
+        self._dispatch()
+
+    @staticmethod
+    def _fail(job: _Job, exc: BaseException) -> None:
+        for waiter in job.waiters:
+            if not waiter.done():
+                waiter.set_exception(exc)
+
+    # ------------- Metrics -------------------------------------------------------
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per lane: queue depth, running jobs, wait p50/p95 (last 512 jobs) and counters."""
+        out = {}
+        for name, lane in self.lanes.items():
+            waits = list(lane.waits_ms)
+            out[name] = {
+                "depth": lane.depth,
+                "max_session_depth": max((len(q) for q in lane.queues.values()), default=0),
+                "running": lane.running,
+                "wait_p50_ms": _percentile(waits, 0.50),
+                "wait_p95_ms": _percentile(waits, 0.95),
+                "completed": lane.completed,
+                "rejected": lane.rejected,
+                "merged": lane.merged,
+            }
+        return out
+
+    def shutdown(self) -> None:
+        for lane in self.lanes.values():
+            lane.executor.shutdown(wait=False)
@@ -0,0 +1,257 @@
+import asyncio
+import json
+import re
+import textwrap
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+import format_helper
+from core.metrics import get_metrics
+from core.tracing import get_tracer
+
+# ════════════════════════════════════════════════════════════════════
+# Prompts
+# ════════════════════════════════════════════════════════════════════
+CLASSIFY_SYSTEM = textwrap.dedent(
+    """
+    You are an assistant in a children's story‑builder app.
+    Decide whether the user's message is a STORY SENTENCE
+    or a QUESTION/CHAT. If it is a story sentence, correct
+    grammar/spelling minimally but keep the child's voice.
+    Respond with EXACTLY ONE JSON object, on a single line, no code block
+    markers, no extra text. 
+    {"kind":"story", "fixed_line":"..."}  OR
+    {"kind":"chat",  "answer":"..."}
+    """
+).strip()
+
+CONTINUE_SYSTEM = textwrap.dedent(
+    """
+    Continue this children's story in 2 lively sentences. Make sure the reply forms a complete sentence and ends with a period.
+    Respond with EXACTLY ONE JSON object, on a single line, no code block
+    markers, no extra text. 
+    {"first": "first sentence", "second": "second sentence"},
+    """
+).strip()
+
+CHAT_FALLBACK = {"kind": "chat", "answer": "I'm sorry, could you rephrase that?"}
+FOLLOW_UP = " What’s your next line?"
+
+
+def classify_messages(user_text: str) -> List[Dict[str, str]]:
+    return [{"role": "system", "content": CLASSIFY_SYSTEM}, {"role": "user", "content": user_text}]
+
+
+def continue_messages(story: List[str]) -> List[Dict[str, str]]:
+    story_context = " ".join(story[-100:])  # truncate for safety
+    return [{"role": "system", "content": CONTINUE_SYSTEM}, {"role": "user", "content": story_context}]
+
+
+def parse_classification(raw_json: str) -> Dict[str, Any]:
+    """First ``{...}`` in the reply; a chat fallback when it is not valid JSON."""
+    with get_tracer().span("json_parse", step="classify", raw=raw_json) as span:
+        try:
+            m = re.search(r"\{.*?\}", raw_json, flags=re.S)
+            data = json.loads(m.group(0)) if m else {}
+            span.set(ok=bool(m), kind=data.get("kind"))
+        except Exception:
+            data = dict(CHAT_FALLBACK)
+            span.set(ok=False)
+            get_metrics().counter("errors_total", "Failures by where they happened").inc(where="json_parse")
+    return data
+
+
+def parse_continuation(raw_next_line: str) -> str:
+    """``first + second`` from the continuation JSON (raises on malformed replies)."""
+    with get_tracer().span("json_parse", step="continue", raw=raw_next_line):
+        json_checked_output = format_helper.get_first_json(raw_next_line)
+        return json_checked_output["first"] + json_checked_output["second"]
+
+
+# ════════════════════════════════════════════════════════════════════
+# Events
+# ════════════════════════════════════════════════════════════════════
+@dataclass
+class StoryEvent:
+    """
+    One event of a turn.  *type* is ``token`` (partial LLM output, *step*
+    says which call), ``story_line``, ``ai_suggestion``, ``chat_answer``
+    or ``error``.
+    """
+
+    type: str
+    text: str
+    turn_id: Optional[str] = None
+    step: Optional[str] = None
+
+    def to_payload(self) -> Dict[str, Any]:
+        """Dict form used by the Qt signals (``type``/``text``/``turn_id``)."""
+        payload = {"type": self.type, "text": self.text, "turn_id": self.turn_id}
+        if self.step is not None:
+            payload["step"] = self.step
+        return payload
+
+
+# ════════════════════════════════════════════════════════════════════
+# Engine runners
+# ════════════════════════════════════════════════════════════════════
+class EngineRunner:
+    """
+    Runs blocking engine calls for any number of sessions on one worker
+    thread, so sessions sharing an engine never call it concurrently.
+    With *max_workers* > 1 calls overlap (for thread-safe engine proxies
+    such as core.batching.LLMBatcher, which batches them).
+    """
+
+    def __init__(self, name: str = "engine", max_workers: int = 1):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+
+    async def __call__(self, fn: Callable[[], Any], **_hints) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False)
+
+
+async def run_inline(fn: Callable[[], Any], **_hints) -> Any:
+    """Runner that calls the engine on the current thread (Qt worker thread)."""
+    return fn()
+
+
+_runners: Dict[int, EngineRunner] = {}
+_runners_lock = threading.Lock()
+
+
+def shared_runner(engine) -> EngineRunner:
+    """The EngineRunner every session on *engine* should use."""
+    with _runners_lock:
+        runner = _runners.get(id(engine))
+        if runner is None:
+            runner = _runners[id(engine)] = EngineRunner(type(engine).__name__)
+        return runner
+
+
+# ════════════════════════════════════════════════════════════════════
+# StorySession
+# ════════════════════════════════════════════════════════════════════
+class StorySession:
+    """
+    Story state and turn logic of one child, with no Qt dependency.
+
+        session = StorySession(engine)
+        async for event in session.submit("the fox was hungry"):
+            ...
+
+    Engine calls go through *runner* (an async ``runner(fn, **hints)``):
+    by default a per-engine EngineRunner, so many sessions can run
+    concurrently on one event loop while sharing one model.  With
+    *stream_tokens* and an engine that has ``stream_reply()``, partial
+    output is yielded as ``token`` events while it is generated.
+    """
+
+    def __init__(self, engine, *, session_id: Optional[str] = None, runner=None,
+                 stream_tokens: bool = False, story: Optional[List[str]] = None):
+        self.engine = engine
+        self.session_id = session_id
+        self.runner = runner or shared_runner(engine)
+        self.stream_tokens = stream_tokens and hasattr(engine, "stream_reply")
+        self.story: List[str] = list(story or [])  # authoritative, fixed sentences
+
+    async def _generate(self, messages, max_new_tokens: int, step: str,
+                        turn_id: Optional[str]) -> AsyncIterator[StoryEvent]:
+        """Yield ``token`` events (when streaming) and finally one event with the full reply."""
+        tracer = get_tracer()
+        metrics = get_metrics()
+        hints = {"session_id": self.session_id, "kind": "chat", "turn_id": turn_id}
+        metrics.counter("llm_calls_total", "LLM calls by step").inc(step=step)
+        t0 = time.perf_counter()
+
+        if not self.stream_tokens:
+            def call():
+                with tracer.turn(turn_id):
+                    return self.engine.generate_reply(messages, max_new_tokens=max_new_tokens)
+            reply = await self.runner(call, **hints)
+            metrics.histogram("llm_call_seconds", "LLM call latency incl. queueing").observe(
+                time.perf_counter() - t0, step=step)
+            yield StoryEvent("reply", reply, turn_id, step)
+            return
+
+        loop = asyncio.get_running_loop()
+        chunks: "asyncio.Queue[Optional[str]]" = asyncio.Queue()
+
+        def call_streaming():
+            parts = []
+            try:
+                with tracer.turn(turn_id):
+                    for chunk in self.engine.stream_reply(messages, max_new_tokens=max_new_tokens):
+                        parts.append(chunk)
+                        loop.call_soon_threadsafe(chunks.put_nowait, chunk)
+            finally:
+                loop.call_soon_threadsafe(chunks.put_nowait, None)
+            return "".join(parts).strip()
+
+        task = asyncio.ensure_future(self.runner(call_streaming, **hints))
+        while True:
+            chunk = await chunks.get()
+            if chunk is None:
+                break
+            yield StoryEvent("token", chunk, turn_id, step)
+        reply = await task
+        metrics.histogram("llm_call_seconds", "LLM call latency incl. queueing").observe(
+            time.perf_counter() - t0, step=step)
+        yield StoryEvent("reply", reply, turn_id, step)
+
+    async def submit(self, user_text: str, *, turn_id: Optional[str] = None) -> AsyncIterator[StoryEvent]:
+        """Run one turn for *user_text* and yield its events in order."""
+        metrics = get_metrics()
+        t0 = time.perf_counter()
+        outcome = "error"
+        try:
+            async for event in self._turn(user_text, turn_id):
+                if event.type in ("ai_suggestion", "chat_answer"):
+                    outcome = "story" if event.type == "ai_suggestion" else "chat"
+                yield event
+
+        except Exception as e:
+            print(f"[StorySession] turn failed: {e!r}")
+            metrics.counter("errors_total", "Failures by where they happened").inc(where="turn")
+            yield StoryEvent("error", str(e), turn_id)
+
+        finally:
+            metrics.counter("turns_total", "Finished turns by outcome").inc(outcome=outcome)
+            metrics.histogram("turn_seconds", "Turn latency").observe(time.perf_counter() - t0)
+
+    async def _turn(self, user_text: str, turn_id: Optional[str]) -> AsyncIterator[StoryEvent]:
+        # 1) Classification & minimal correction
+        raw_json = ""
+        async for event in self._generate(classify_messages(user_text), 128, "classify", turn_id):
+            if event.type == "reply":
+                raw_json = event.text
+            else:
+                yield event
+        data = parse_classification(raw_json)
+
+        # 2) Handle story path
+        if data.get("kind") == "story":
+            fixed_line = data["fixed_line"].strip()
+            self.story.append(fixed_line)
+            yield StoryEvent("story_line", fixed_line, turn_id)
+
+            # 2b) Ask for continuation
+            raw_next_line = ""
+            async for event in self._generate(continue_messages(self.story), 120, "continue", turn_id):
+                if event.type == "reply":
+                    raw_next_line = event.text.strip()
+                else:
+                    yield event
+
+            next_line = parse_continuation(raw_next_line)
+            self.story.append(next_line)
+            yield StoryEvent("ai_suggestion", next_line, turn_id)
+
+        else:
+            answer = data["answer"].strip()
+            yield StoryEvent("chat_answer", answer + FOLLOW_UP, turn_id)
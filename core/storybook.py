@@ -0,0 +1,248 @@
+import io
+import json
+import os
+import secrets
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Union
+
+# ════════════════════════════════════════════════════════════════════
+# On-disk storybook format
+# ════════════════════════════════════════════════════════════════════
+#
+#   STORYBOOK1\n
+#   {"t": "meta", ...}\n
+#   {"t": "segment", "page": 0, "row": 0, "text": "..."}\n
+#   {"t": "latents", "page": 0, "blob": 16843}\n<16843 raw bytes>
+#   ...
+#
+# Every record is one JSON line, optionally followed by a binary blob whose
+# length is given by "blob".  Files are only ever appended to, so autosave
+# after a turn costs O(new records).  Readers index record headers and seek
+# over blobs; blobs are read only on demand.  A torn record at the end
+# (crash during a write) is ignored by readers and cut off by the writer.
+
+MAGIC = b"STORYBOOK1\n"
+SUFFIX = ".story"
+
+
+def new_story_id() -> str:
+    return time.strftime("%Y%m%d-%H%M%S") + "-" + secrets.token_hex(3)
+
+
+class Record(dict):
+    """One record header; ``_offset`` is the file offset of its blob (if any)."""
+
+    @property
+    def kind(self) -> str:
+        return self["t"]
+
+
+def _scan(f) -> Iterator[Record]:
+    """Yield complete records from the current position; stop at a torn tail."""
+    while True:
+        line = f.readline()
+        if not line or not line.endswith(b"\n"):
+            return
+        try:
+            rec = Record(json.loads(line))
+        except ValueError:
+            return
+        nbytes = rec.get("blob", 0)
+        if nbytes:
+            rec["_offset"] = f.tell()
+            if rec["_offset"] + nbytes > _size(f):
+                return
+            f.seek(nbytes, os.SEEK_CUR)
+        rec["_end"] = f.tell()
+        yield rec
+
+
+def _size(f) -> int:
+    return os.fstat(f.fileno()).st_size
+
+
+# ════════════════════════════════════════════════════════════════════
+# StorybookWriter
+# ════════════════════════════════════════════════════════════════════
+class StorybookWriter:
+    """Appends records to one story file; the file is created on first write."""
+
+    def __init__(self, path: Union[str, Path], *, story_id: Optional[str] = None,
+                 title: Optional[str] = None, fsync: bool = False):
+        self.path = Path(path)
+        self.story_id = story_id or self.path.stem
+        self.title = title
+        self.fsync = fsync
+        self._f = None
+
+    def _open(self):
+        if self._f is not None:
+            return self._f
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if self.path.exists() and self.path.stat().st_size >= len(MAGIC):
+            f = open(self.path, "r+b")
+            if f.read(len(MAGIC)) != MAGIC:
+                f.close()
+                raise ValueError(f"Not a storybook file: {self.path}")
+            end = len(MAGIC)
+            for rec in _scan(f):
+                end = rec["_end"]
+            f.truncate(end)     # drop a torn tail, if any
+            f.seek(end)
+            self._f = f
+        else:
+            self._f = open(self.path, "wb")
+            self._f.write(MAGIC)
+            self._write({"t": "meta", "story_id": self.story_id, "title": self.title,
+                         "created": time.time()})
+        return self._f
+
+    def _write(self, header: Dict[str, Any], blob: Optional[bytes] = None) -> None:
+        f = self._f
+        if blob:
+            header["blob"] = len(blob)
+        f.write(json.dumps(header, ensure_ascii=False).encode("utf-8") + b"\n")
+        if blob:
+            f.write(blob)
+
+    def append(self, record_type: str, blob: Optional[bytes] = None, **fields) -> None:
+        self._open()
+        self._write({"t": record_type, **fields}, blob)
+
+    def flush(self) -> None:
+        if self._f is None:
+            return
+        self._f.flush()
+        if self.fsync:
+            os.fsync(self._f.fileno())
+
+    def close(self) -> None:
+        if self._f is not None:
+            self.flush()
+            self._f.close()
+            self._f = None
+
+    # ------------- Typed helpers ----------------------------------------------
+    def add_segment(self, page: int, row: int, text: str) -> None:
+        self.append("segment", page=page, row=row, text=text)
+
+    def add_chat(self, role: str, text: str, kind: Optional[str] = None) -> None:
+        self.append("chat", role=role, text=text, kind=kind)
+
+    def add_seed(self, page: int, seed: int) -> None:
+        self.append("seed", page=page, seed=seed)
+
+    def add_image(self, page: int, path: Optional[str] = None, data: Optional[bytes] = None,
+                  fmt: str = "png") -> None:
+        """Reference an image file by *path*, or embed encoded bytes as a blob."""
+        if data is not None:
+            self.append("image", blob=data, page=page, fmt=fmt)
+        else:
+            self.append("image", page=page, path=path)
+
+    def add_latents(self, page: int, latents) -> None:
+        import torch
+
+        buf = io.BytesIO()
+        torch.save(latents.detach().cpu(), buf)
+        self.append("latents", blob=buf.getvalue(), page=page)
+
+    def set_title(self, title: str) -> None:
+        self.title = title
+        self.append("title", title=title)
+
+
+# ════════════════════════════════════════════════════════════════════
+# Storybook (lazy reader)
+# ════════════════════════════════════════════════════════════════════
+class Storybook:
+    """
+    Read-only view of a story file.  Only record headers are parsed when it
+    is opened; images and latents are read from disk when asked for.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self._records: Optional[List[Record]] = None
+
+    @staticmethod
+    def read_meta(path: Union[str, Path]) -> Dict[str, Any]:
+        """Read only the first (meta) record, for fast library listings."""
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"Not a storybook file: {path}")
+            for rec in _scan(f):
+                return dict(rec)
+        return {}
+
+    @property
+    def records(self) -> List[Record]:
+        if self._records is None:
+            with open(self.path, "rb") as f:
+                if f.read(len(MAGIC)) != MAGIC:
+                    raise ValueError(f"Not a storybook file: {self.path}")
+                self._records = list(_scan(f))
+        return self._records
+
+    def _of_kind(self, kind: str) -> List[Record]:
+        return [r for r in self.records if r.kind == kind]
+
+    @property
+    def meta(self) -> Dict[str, Any]:
+        meta = dict(self._of_kind("meta")[0]) if self._of_kind("meta") else {}
+        titles = self._of_kind("title")
+        if titles:
+            meta["title"] = titles[-1]["title"]
+        return meta
+
+    @property
+    def pages(self) -> List[List[str]]:
+        """Story segments grouped by page (same shape as MainApp.story_pages_list)."""
+        pages: List[List[str]] = []
+        for rec in self._of_kind("segment"):
+            while len(pages) <= rec["page"]:
+                pages.append([])
+            page = pages[rec["page"]]
+            if rec["row"] < len(page):
+                page[rec["row"]] = rec["text"]
+            else:
+                page.append(rec["text"])
+        return pages
+
+    @property
+    def chat(self) -> List[Dict[str, Any]]:
+        return [{"role": r["role"], "text": r["text"], "kind": r.get("kind")}
+                for r in self._of_kind("chat")]
+
+    @property
+    def seeds(self) -> Dict[int, int]:
+        return {r["page"]: r["seed"] for r in self._of_kind("seed")}
+
+    def image_records(self) -> Dict[int, Record]:
+        """Latest image record per page (``path`` reference or blob)."""
+        return {r["page"]: r for r in self._of_kind("image")}
+
+    def read_blob(self, rec: Record) -> bytes:
+        with open(self.path, "rb") as f:
+            f.seek(rec["_offset"])
+            return f.read(rec["blob"])
+
+    def read_image_bytes(self, page: int) -> Optional[bytes]:
+        rec = self.image_records().get(page)
+        if rec is None:
+            return None
+        if rec.get("blob"):
+            return self.read_blob(rec)
+        path = rec.get("path")
+        if path and Path(path).exists():
+            return Path(path).read_bytes()
+        return None
+
+    def latents(self, page: int):
+        recs = [r for r in self._of_kind("latents") if r["page"] == page]
+        if not recs:
+            return None
+        import torch
+        return torch.load(io.BytesIO(self.read_blob(recs[-1])), weights_only=True)
@@ -0,0 +1,279 @@
+import itertools
+import json
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Union
+
+from config.config_loader import load_config
+
+
+# ════════════════════════════════════════════════════════════════════
+# RotatingJsonlSink
+# ════════════════════════════════════════════════════════════════════
+class RotatingJsonlSink:
+    """
+    Appends one JSON object per line to *path* on a background thread and
+    rotates it (trace.jsonl → trace.jsonl.1 → …) once it exceeds
+    *max_bytes*, keeping *backups* old files.
+    """
+
+    def __init__(self, path: Union[str, Path], max_bytes: int = 10 * 1024 * 1024, backups: int = 3):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._queue: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name="trace-sink", daemon=True)
+        self._thread.start()
+
+    def write(self, record: Dict[str, Any]) -> None:
+        self._queue.put(record)
+
+    def close(self) -> None:
+        self._queue.put(None)
+        self._thread.join(timeout=2)
+
+    def _rotate(self, f):
+        f.close()
+        for i in range(self.backups - 1, 0, -1):
+            src = self.path.with_name(f"{self.path.name}.{i}")
+            if src.exists():
+                src.replace(self.path.with_name(f"{self.path.name}.{i + 1}"))
+        if self.backups > 0:
+            self.path.replace(self.path.with_name(f"{self.path.name}.1"))
+        else:
+            self.path.unlink()
+        return open(self.path, "a", encoding="utf-8")
+
+    def _write(self, f, record: Dict[str, Any]):
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        if f.tell() >= self.max_bytes:
+            f = self._rotate(f)
+        return f
+
+    def _run(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        f = open(self.path, "a", encoding="utf-8")
+        try:
+            while True:
+                record = self._queue.get()
+                if record is None:
+                    break
+                f = self._write(f, record)
+                # Drain whatever else is queued before flushing once
+                while True:
+                    try:
+                        record = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if record is None:
+                        return
+                    f = self._write(f, record)
+                f.flush()
+        finally:
+            f.close()
+
+
+class MemorySink:
+    """Keeps records in a list (benchmarks read spans back instead of parsing a file)."""
+
+    def __init__(self):
+        self.records: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def write(self, record: Dict[str, Any]) -> None:
+        with self._lock:
+            self.records.append(record)
+
+    def close(self) -> None:
+        pass
+
+
+# ════════════════════════════════════════════════════════════════════
+# Spans
+# ════════════════════════════════════════════════════════════════════
+class _NullSpan:
+    """Returned when tracing is off: entering, leaving and set() do nothing."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **fields) -> None:
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Span:
+    __slots__ = ("tracer", "name", "turn_id", "fields", "start")
+
+    def __init__(self, tracer: "Tracer", name: str, turn_id: Optional[str], fields: Dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.turn_id = turn_id
+        self.fields = fields
+        self.start = 0.0
+
+    def set(self, **fields) -> None:
+        """Attach extra fields (token counts, flags, …) before the span ends."""
+        self.fields.update(fields)
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.fields["error"] = exc_type.__name__
+        self.tracer.record(self.name, (time.perf_counter() - self.start) * 1000,
+                           turn_id=self.turn_id, **self.fields)
+        return False
+
+
+def timed_step_callback(inner: Optional[Callable] = None):
+    """
+    Wrap a diffusers ``callback_on_step_end`` so the wall time of every
+    denoising step is collected in ``callback.step_ms``.
+    """
+    last = [time.perf_counter()]
+    step_ms: List[float] = []
+
+    def _on_step_end(pipe, step_index, timestep, callback_kwargs):
+        now = time.perf_counter()
+        step_ms.append((now - last[0]) * 1000)
+        if inner is not None:
+            callback_kwargs = inner(pipe, step_index, timestep, callback_kwargs)
+        last[0] = time.perf_counter()     # don't bill a scheduler pause to the next step
+        return callback_kwargs
+
+    _on_step_end.step_ms = step_ms
+    _on_step_end.reset = lambda: last.__setitem__(0, time.perf_counter())
+    return _on_step_end
+
+
+# ════════════════════════════════════════════════════════════════════
+# Tracer
+# ════════════════════════════════════════════════════════════════════
+class Tracer:
+    """
+    Per-turn latency spans.  A turn id is created when the user sends a
+    message and travels with the chat/image jobs; code in between opens
+    spans either with an explicit *turn_id* or under ``with tracer.turn(id)``
+    on the current thread.
+
+    When disabled, span() returns a shared no-op object and record()
+    returns immediately, so instrumented code pays one attribute check.
+    """
+
+    RECENT_TURNS = 16
+
+    def __init__(self, sink=None, enabled: bool = False):  # RotatingJsonlSink | MemorySink
+        self.sink = sink
+        self.enabled = enabled and sink is not None
+        self._ids = itertools.count(1)
+        self._prefix = f"{os.getpid():x}"
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._turns: "OrderedDict[str, Dict[str, float]]" = OrderedDict()
+        self._listeners: List[Callable[[str, Dict[str, float]], None]] = []
+
+    def new_turn_id(self) -> str:
+        return f"{self._prefix}-{next(self._ids)}"
+
+    @contextmanager
+    def turn(self, turn_id: Optional[str]):
+        """Make *turn_id* the default for spans opened on this thread."""
+        prev = getattr(self._local, "turn_id", None)
+        self._local.turn_id = turn_id
+        try:
+            yield
+        finally:
+            self._local.turn_id = prev
+
+    def current_turn(self) -> Optional[str]:
+        return getattr(self._local, "turn_id", None)
+
+    def span(self, name: str, turn_id: Optional[str] = None, **fields):
+        if not self.enabled:
+            return _NULL_SPAN
+        return Span(self, name, turn_id or self.current_turn(), fields)
+
+    def record(self, name: str, duration_ms: float, turn_id: Optional[str] = None, **fields) -> None:
+        """Record a span measured elsewhere (e.g. prefill/decode split from one generate call)."""
+        if not self.enabled:
+            return
+        turn_id = turn_id or self.current_turn()
+        record = {"ts": time.time(), "turn": turn_id, "span": name, "ms": round(duration_ms, 3), **fields}
+        self.sink.write(record)
+        if turn_id is None:
+            return
+
+        with self._lock:
+            breakdown = self._turns.setdefault(turn_id, {})
+            self._turns.move_to_end(turn_id)
+            if fields.get("elapsed"):
+                # Time since the turn started (e.g. reply_visible): keep the latest
+                breakdown[name] = duration_ms
+            else:
+                # The same span can occur several times per turn (two LLM calls) – add them up
+                breakdown[name] = breakdown.get(name, 0.0) + duration_ms
+            if "tokens_per_s" in fields:
+                breakdown["tokens_per_s"] = fields["tokens_per_s"]
+            while len(self._turns) > self.RECENT_TURNS:
+                self._turns.popitem(last=False)
+            snapshot = dict(breakdown)
+            listeners = list(self._listeners)
+        for listener in listeners:
+            listener(turn_id, snapshot)
+
+    def turn_breakdown(self, turn_id: str) -> Dict[str, float]:
+        with self._lock:
+            return dict(self._turns.get(turn_id, {}))
+
+    def add_listener(self, callback: Callable[[str, Dict[str, float]], None]) -> None:
+        """*callback(turn_id, breakdown)* runs on the recording thread after every span."""
+        with self._lock:
+            self._listeners.append(callback)
+
+    def close(self) -> None:
+        if self.sink is not None:
+            self.sink.close()
+
+
+_tracer: Optional[Tracer] = None
+_tracer_lock = threading.Lock()
+
+
+def get_tracer() -> Tracer:
+    """Process-wide tracer from config ``tracing`` (``STORY_TRACE=1`` forces it on)."""
+    global _tracer
+    with _tracer_lock:
+        if _tracer is None:
+            cfg = load_config().get("tracing") or {}
+            enabled = cfg.get("enabled", False) or os.environ.get("STORY_TRACE") == "1"
+            sink = None
+            if enabled:
+                sink = RotatingJsonlSink(
+                    cfg.get("path", "logs/trace.jsonl"),
+                    max_bytes=int(cfg.get("max_mb", 10) * 1024 * 1024),
+                    backups=cfg.get("backups", 3),
+                )
+            _tracer = Tracer(sink, enabled)
+        return _tracer
+
+
+def set_tracer(tracer: Tracer) -> None:
+    """Install *tracer* as the process-wide tracer (headless tools, benchmarks)."""
+    global _tracer
+    with _tracer_lock:
+        _tracer = tracer
@@ -0,0 +1,153 @@
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from config.config_loader import load_config
+from core.metrics import get_metrics
+from core.story_session import classify_messages, continue_messages
+from core.tracing import get_tracer
+
+# Dummy turn: same message shapes as a real StorySession turn
+WARMUP_INPUT = "The little fox found a shiny key under a tree."
+WARMUP_STORY = [
+    "Once upon a time, a little fox lived at the edge of a quiet forest.",
+    "One morning, the fox found a shiny key under a tree.",
+]
+WARMUP_IMAGE_PROMPT = "A little fox holding a shiny key in a sunny forest children's picture book"
+
+DEFAULTS = {
+    "enabled": False,
+    "llm": True,
+    "image": True,
+    "llm_tokens": 16,
+    "image_steps": 2,
+    "compile": False,
+    "compile_mode": "default",
+    "compile_cache_dir": "cache/torch_compile",
+}
+
+
+def load_warmup_config() -> dict:
+    """Config ``warmup`` with defaults filled in."""
+    return {**DEFAULTS, **(load_config().get("warmup") or {})}
+
+
+# ════════════════════════════════════════════════════════════════════
+# torch.compile
+# ════════════════════════════════════════════════════════════════════
+def enable_compile_cache(cache_dir: str) -> None:
+    """
+    Keep Inductor's FX graph / kernel caches (and Triton's) under
+    *cache_dir*, so the next launch loads compiled kernels instead of
+    recompiling.  Call before the first compiled call.
+    """
+    path = Path(cache_dir).resolve()
+    path.mkdir(parents=True, exist_ok=True)
+    os.environ.setdefault("TORCHINDUCTOR_CACHE_DIR", str(path / "inductor"))
+    os.environ.setdefault("TORCHINDUCTOR_FX_GRAPH_CACHE", "1")
+    os.environ.setdefault("TRITON_CACHE_DIR", str(path / "triton"))
+    if "torch" in sys.modules:
+        import torch._inductor.config as inductor_config
+        inductor_config.fx_graph_cache = True
+
+
+def compile_engine(engine, cfg: Optional[dict] = None) -> bool:
+    """
+    ``engine.compile(mode)`` when ``warmup.compile`` is on and the engine
+    supports it (Phi3MiniEngine, StableV15Engine).  Graphs are built
+    lazily, so the cost lands on the warm-up calls, not here.
+    """
+    cfg = cfg or load_warmup_config()
+    if engine is None or not cfg["compile"] or not hasattr(engine, "compile"):
+        return False
+    enable_compile_cache(cfg["compile_cache_dir"])
+    try:
+        engine.compile(cfg["compile_mode"])
+    except Exception as e:
+        print(f"[Warmup] torch.compile skipped for {type(engine).__name__}: {e}")
+        return False
+    print(f"[Warmup] {type(engine).__name__} compiled (mode={cfg['compile_mode']})")
+    return True
+
+
+# ════════════════════════════════════════════════════════════════════
+# Warm-up runs
+# ════════════════════════════════════════════════════════════════════
+def _report(kind: str, runs_ms: List[float]) -> Dict[str, Optional[float]]:
+    """
+    Log the first (cold) run, and the second (warm) one if there was one,
+    as spans, gauges and one line.  With a single pass the warm figure to
+    compare against is the first real turn (trace, benchmark "first turn").
+    """
+    cold = runs_ms[0] if runs_ms else None
+    warm = runs_ms[1] if len(runs_ms) > 1 else None
+    tracer = get_tracer()
+    gauge = get_metrics().gauge("warmup_seconds", "Warm-up run time (run=cold: first call after load)")
+    for run, ms in (("cold", cold), ("warm", warm)):
+        if ms is not None:
+            tracer.record("warmup", ms, engine=kind, run=run)
+            gauge.set(ms / 1000, engine=kind, run=run)
+    if cold is not None:
+        line = f"[Warmup] {kind}: cold {cold:.0f} ms"
+        if warm:
+            line += f", warm {warm:.0f} ms ({cold / warm:.1f}x)"
+        print(line)
+    return {"cold_ms": cold, "warm_ms": warm}
+
+
+def warm_up_llm(engine, cfg: Optional[dict] = None, runs: int = 1) -> Dict[str, Optional[float]]:
+    """
+    Run a dummy turn (classify + continue, ``warmup.llm_tokens`` new
+    tokens each) *runs* times; the first run pays tokenizer, allocator and
+    compile costs that would otherwise hit the child's first turn.  One
+    run is enough for that; more only measure the warm speed.
+    """
+    cfg = cfg or load_warmup_config()
+    tokens = cfg["llm_tokens"]
+    runs_ms = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        engine.generate_reply(classify_messages(WARMUP_INPUT), max_new_tokens=tokens)
+        engine.generate_reply(continue_messages(WARMUP_STORY), max_new_tokens=tokens)
+        runs_ms.append((time.perf_counter() - t0) * 1000)
+    return _report("llm", runs_ms)
+
+
+def warm_up_image(engine, cfg: Optional[dict] = None, runs: int = 1, **kwargs) -> Dict[str, Optional[float]]:
+    """
+    Render a dummy illustration at full size with ``warmup.image_steps``
+    steps, *runs* times (*kwargs*: e.g. the CpuScheduler step callback).
+    """
+    cfg = cfg or load_warmup_config()
+    runs_ms = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        engine.generate_image_with_latents(WARMUP_IMAGE_PROMPT, seed=0,
+                                           num_inference_steps=cfg["image_steps"], **kwargs)
+        runs_ms.append((time.perf_counter() - t0) * 1000)
+    return _report("image", runs_ms)
+
+
+def prepare_engine(engine, kind: str, *, via=None, **kwargs) -> Optional[Dict[str, Optional[float]]]:
+    """
+    Compile *engine* (if configured) and warm it up (``kind``: llm | image)
+    on the calling thread, calling it through *via* when given (the
+    server's LLMBatcher).  Returns the cold/warm timings, or None when
+    warm-up is off.  Failures are logged, never raised: a failed warm-up
+    only means the first real turn is slow.
+    """
+    cfg = load_warmup_config()
+    if engine is None or not cfg["enabled"] or not cfg[kind]:
+        return None
+    compile_engine(engine, cfg)
+    target = via or engine
+    try:
+        if kind == "llm":
+            return warm_up_llm(target, cfg)
+        return warm_up_image(target, cfg, **kwargs)
+    except Exception as e:
+        print(f"[Warmup] {kind} warm-up failed: {e}")
+        get_metrics().counter("errors_total", "Failures by where they happened").inc(where="warmup")
+        return None
@@ -0,0 +1,62 @@
+# ── stdlib
+from typing import Dict, List
+
+# ── Qt
+from PySide6.QtCore import QObject, QThread, Signal, Slot
+
+from core.export import export_book
+from image_gen_engine import wait_for_pending_saves
+
+
+# ════════════════════════════════════════════════════════════════════
+# ExportWorker (runs in background thread)
+# ════════════════════════════════════════════════════════════════════
+class ExportWorker(QObject):
+    """Streams a storybook to PDF/EPUB off the GUI thread."""
+
+    progress = Signal(int, int)   # pages done, total pages
+    finished = Signal(dict)       # {"type": "exported", "path": str} or {"type": "error", "error": str}
+
+    @Slot(dict)
+    def doWork(self, job: dict):
+        """*job* keys: pages, page_images, out_path, title, image_fmt (optional)."""
+        try:
+            # Illustrations are written to disk asynchronously; make sure the
+            # ones already handed off have landed before reading them back.
+            wait_for_pending_saves()
+            path = export_book(
+                job["pages"],
+                job["page_images"],
+                job["out_path"],
+                title=job.get("title", ""),
+                image_fmt=job.get("image_fmt", "jpeg"),
+                progress=self.progress.emit,
+            )
+            self.finished.emit({"type": "exported", "path": str(path)})
+        except Exception as e:
+            print(f"[ExportWorker] Error exporting storybook: {e}")
+            self.finished.emit({"type": "error", "error": str(e)})
+
+
+# ════════════════════════════════════════════════════════════════════
+# ExportController (thread wrapper)
+# ════════════════════════════════════════════════════════════════════
+class ExportController(QObject):
+    operate = Signal(dict)  # accepts an export job dict (see ExportWorker.doWork)
+
+    def __init__(self, progress_callback, result_callback):
+        super().__init__()
+        self.workerThread = QThread()
+        self.worker = ExportWorker()
+        self.worker.moveToThread(self.workerThread)
+
+        self.workerThread.finished.connect(self.worker.deleteLater)
+        self.operate.connect(self.worker.doWork)
+        self.worker.progress.connect(progress_callback)
+        self.worker.finished.connect(result_callback)
+
+        self.workerThread.start()
+
+    def __del__(self):
+        self.workerThread.quit()
+        self.workerThread.wait()
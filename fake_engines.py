@@ -0,0 +1,268 @@
+# fake_engines.py
+"""
+Deterministic stand-ins for Phi3MiniEngine and StableV15Engine.
+
+They load no weights and need no network, but keep the real engines'
+method signatures, return types and timing shape (prefill latency, token
+rate, per-step diffusion time), so the GUI, the schedulers and the
+benchmarks can run end to end.  Select them with ``llm.engine: fake`` /
+``image.engine: fake``; knobs live in the ``fake`` section of config.yaml.
+"""
+import hashlib
+import json
+import random
+import time
+from itertools import cycle
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+from core.metrics import get_metrics
+from core.tracing import get_tracer
+
+
+def _stable_seed(*parts) -> int:
+    """Seed that is identical across runs and processes (unlike hash())."""
+    digest = hashlib.sha256("\x1f".join(map(str, parts)).encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big")
+
+
+# ════════════════════════════════════════════════════════════════════
+# FakeLLMEngine
+# ════════════════════════════════════════════════════════════════════
+class FakeLLMEngine:
+    """
+    Same interface as Phi3MiniEngine.  Replies come from *script* (a list of
+    strings/objects, or a JSON/JSONL file, replayed in order and cycled) or,
+    without a script, from simple rules that answer the classify and
+    continue prompts used by ChatWorker.
+
+    Each call sleeps *latency_ms* (prefill) plus tokens / *tokens_per_s*
+    (decode) and records the same trace spans as the real engine.
+    *malformed_rate* makes that fraction of rule-based replies invalid JSON
+    (chosen deterministically from the input) to exercise error paths.
+    """
+
+    def __init__(self, script: Union[None, str, List] = None, *, latency_ms: float = 50.0,
+                 tokens_per_s: float = 40.0, malformed_rate: float = 0.0):
+        self.latency_ms = latency_ms
+        self.tokens_per_s = tokens_per_s
+        self.malformed_rate = malformed_rate
+        self._script = cycle(self._load_script(script)) if script else None
+
+        # Compatibility attributes (same as ChatGPTEngine)
+        self.tokenizer = None
+        self.model = None
+        self.EOS_ID = None
+
+    @staticmethod
+    def _load_script(script) -> List[str]:
+        if isinstance(script, (str, Path)):
+            text = Path(script).read_text(encoding="utf-8")
+            try:
+                items = json.loads(text)
+            except ValueError:
+                items = [json.loads(line) for line in text.splitlines() if line.strip()]
+        else:
+            items = list(script)
+        return [item if isinstance(item, str) else json.dumps(item, ensure_ascii=False) for item in items]
+
+    def build_prompt(self, messages) -> str:
+        parts = [f"<|{m['role']}|>\n{m['content']}<|end|>" for m in messages]
+        parts.append("<|assistant|>\n")
+        return "\n".join(parts)
+
+    def _rule_reply(self, messages) -> str:
+        system, user = messages[0]["content"], messages[-1]["content"].strip()
+        rng = random.Random(_stable_seed(system, user))
+        if rng.random() < self.malformed_rate:
+            return '{"kind": "story", "fixed_line": '     # truncated JSON
+
+        if "STORY SENTENCE" in system:
+            if user.endswith("?"):
+                return json.dumps({"kind": "chat", "answer": "What a great question! Let's imagine together."})
+            line = user[:1].upper() + user[1:]
+            if not line.endswith((".", "!", "?")):
+                line += "."
+            return json.dumps({"kind": "story", "fixed_line": line})
+
+        first = rng.choice(["Suddenly, a gentle wind began to blow.", "Then a tiny bird landed nearby.",
+                            "Just then, the sky turned pink and gold."])
+        second = rng.choice([" Everyone laughed and held hands.", " It was the start of a big adventure.",
+                             " They decided to follow it together."])
+        return json.dumps({"first": first, "second": second})
+
+    def generate_reply(self, messages, *, max_new_tokens: int = 128) -> str:
+        tracer = get_tracer()
+        with tracer.span("tokenize") as span:
+            prompt = self.build_prompt(messages)
+            span.set(prompt_tokens=len(prompt) // 4)
+
+        reply = next(self._script) if self._script is not None else self._rule_reply(messages)
+        tokens = max(1, min(max_new_tokens, len(reply) // 4))   # ~4 chars per token
+
+        time.sleep(self.latency_ms / 1000)
+        tracer.record("prefill", self.latency_ms, prompt_tokens=len(prompt) // 4)
+        decode_s = tokens / self.tokens_per_s if self.tokens_per_s > 0 else 0.0
+        time.sleep(decode_s)
+        tracer.record("decode", decode_s * 1000, tokens=tokens,
+                      tokens_per_s=round(tokens / decode_s, 2) if decode_s > 0 else None)
+        get_metrics().counter("llm_tokens_total", "Generated tokens").inc(tokens)
+
+        # Honour the token budget like generate() would: cut the text short
+        return reply[:max_new_tokens * 4].strip()
+
+    def generate_batch(self, batch_messages, *, max_new_tokens: int = 128, on_text=None) -> List[str]:
+        """
+        Batched generate like Phi3MiniEngine.generate_batch(): one prefill,
+        then one decode step per token of the longest reply (rows share steps).
+        """
+        tracer = get_tracer()
+        replies = []
+        for messages in batch_messages:
+            reply = next(self._script) if self._script is not None else self._rule_reply(messages)
+            replies.append(reply[:max_new_tokens * 4].strip())
+
+        time.sleep(self.latency_ms / 1000)
+        tracer.record("prefill", self.latency_ms, batch=len(replies))
+        t0 = time.perf_counter()
+        steps = max((len(r) + 3) // 4 for r in replies)
+        for step in range(steps):
+            if self.tokens_per_s > 0:
+                time.sleep(1 / self.tokens_per_s)
+            if on_text is not None:
+                for row, reply in enumerate(replies):
+                    if step * 4 < len(reply):
+                        on_text(row, reply[step * 4:step * 4 + 4])
+        decode_s = time.perf_counter() - t0
+        tokens = sum((len(r) + 3) // 4 for r in replies)
+        get_metrics().counter("llm_tokens_total", "Generated tokens").inc(tokens)
+        tracer.record("decode", decode_s * 1000, tokens=tokens, batch=len(replies),
+                      tokens_per_s=round(tokens / decode_s, 2) if decode_s > 0 else None)
+        return replies
+
+    def stream_reply(self, messages, *, max_new_tokens: int = 128) -> Iterator[str]:
+        """Like generate_reply(), but yields ~4-character "tokens" at *tokens_per_s*."""
+        with get_tracer().span("tokenize") as span:
+            prompt = self.build_prompt(messages)
+            span.set(prompt_tokens=len(prompt) // 4)
+
+        reply = next(self._script) if self._script is not None else self._rule_reply(messages)
+        reply = reply[:max_new_tokens * 4].strip()
+        time.sleep(self.latency_ms / 1000)
+        get_metrics().counter("llm_tokens_total", "Generated tokens").inc((len(reply) + 3) // 4)
+        for i in range(0, len(reply), 4):
+            if self.tokens_per_s > 0:
+                time.sleep(1 / self.tokens_per_s)
+            yield reply[i:i + 4]
+
+
+# ════════════════════════════════════════════════════════════════════
+# FakeImageEngine
+# ════════════════════════════════════════════════════════════════════
+class FakeImageEngine:
+    """
+    Same interface as StableV15Engine.  Draws a procedural picture (sky
+    gradient, sun, hills) seeded from prompt + seed after running
+    ``num_inference_steps`` "denoising steps" of *step_ms* each, calling
+    ``callback_on_step_end`` between steps like a diffusers pipeline.
+    With *init_latents* only ``int(steps * strength)`` steps run.
+    Latents are a small random tensor when torch is installed, else None.
+    """
+
+    def __init__(self, *, step_ms: float = 50.0, size: int = 512, **_ignored):
+        self.step_ms = step_ms
+        self.size = size
+        self.model_id = "fake"
+        self.device = "cpu"
+        self.dtype = None
+        self.memory_options: Dict = {}
+
+    # ------------- Engine API parity --------------------------------------------
+    def unload_unet(self) -> None:
+        pass
+
+    def load_unet(self) -> None:
+        pass
+
+    def encode_prompt(self, text: str):
+        return None
+
+    def clear_embed_cache(self) -> None:
+        pass
+
+    def generate_image(self, prompt: str, **kwargs):
+        image, _ = self.generate_image_with_latents(prompt, **kwargs)
+        return image
+
+    def generate_image_with_latents(
+        self,
+        prompt: str,
+        *,
+        negative_prompt: Optional[str] = None,
+        num_inference_steps: int = 30,
+        guidance_scale: float = 7.5,
+        height: Optional[int] = None,
+        width: Optional[int] = None,
+        seed: Optional[int] = None,
+        prompt_embeds=None,
+        negative_prompt_embeds=None,
+        init_latents=None,
+        strength: float = 0.6,
+        **kwargs,
+    ) -> Tuple[object, object]:
+        height = height or self.size
+        width = width or self.size
+        steps = num_inference_steps
+        if init_latents is not None:
+            steps = max(1, int(num_inference_steps * strength))
+
+        callback = kwargs.get("callback_on_step_end")
+        callback_kwargs: Dict = {}
+        for i in range(steps):
+            time.sleep(self.step_ms / 1000)
+            if callback is not None:
+                callback_kwargs = callback(self, i, num_inference_steps - i, callback_kwargs) or {}
+
+        seed_value = _stable_seed(prompt, seed)
+        return self._draw(seed_value, width, height), self._latents(seed_value, width, height)
+
+    def decode_latents(self, latents, generator=None):
+        seed_value = int(abs(float(latents.flatten()[0])) * 1e6) if latents is not None else 0
+        return self._draw(seed_value, self.size, self.size)
+
+    @staticmethod
+    def save_image(img, path: Union[str, Path]) -> None:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        img.save(path)
+
+    # ------------- Procedural picture -------------------------------------------
+    @staticmethod
+    def _draw(seed_value: int, width: int, height: int):
+        from PIL import Image, ImageDraw
+
+        rng = random.Random(seed_value)
+        top = tuple(rng.randrange(80, 200) for _ in range(3))
+        bottom = tuple(min(255, c + 55) for c in top)
+        img = Image.new("RGB", (width, height))
+        draw = ImageDraw.Draw(img)
+        for y in range(height):
+            t = y / max(1, height - 1)
+            draw.line([(0, y), (width, y)], fill=tuple(int(a + (b - a) * t) for a, b in zip(top, bottom)))
+
+        r = rng.randrange(height // 12, height // 6)
+        cx, cy = rng.randrange(r, width - r), rng.randrange(r, height // 2)
+        draw.ellipse([cx - r, cy - r, cx + r, cy + r], fill=(255, 221, 87))
+        for _ in range(3):
+            hx, hr = rng.randrange(width), rng.randrange(width // 4, width // 2)
+            green = (rng.randrange(40, 90), rng.randrange(140, 200), rng.randrange(40, 90))
+            draw.ellipse([hx - hr, height - hr // 2, hx + hr, height + hr], fill=green)
+        return img
+
+    @staticmethod
+    def _latents(seed_value: int, width: int, height: int):
+        try:
+            import torch
+        except ImportError:
+            return None
+        generator = torch.Generator().manual_seed(seed_value % (2 ** 63))
+        return torch.randn((1, 4, height // 8, width // 8), generator=generator)
@@ -1,18 +1,90 @@
 # ── stdlib
-import sys, re, json, textwrap, random, string, collections
+import sys, re, json, textwrap, random, string, collections, time
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, List, Optional
 
 # ── Qt
 from PySide6.QtCore import Qt, QThread, QObject, Signal, Slot, QTimer
+from PySide6.QtGui import QImage
 from PySide6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QSplitter, QListWidget,
     QTextEdit, QLineEdit, QPushButton, QVBoxLayout, QHBoxLayout, QLabel,
 )
 
 import format_helper
+from core.cpu_budget import apply_cpu_budget, load_cpu_budget
+from core.cpu_scheduler import get_cpu_scheduler
+from core.library import make_thumbnail
+from core.metrics import get_metrics
+from core.tracing import get_tracer, timed_step_callback
+from core.warmup import prepare_engine
 
 
+# ════════════════════════════════════════════════════════════════════
+# Image handoff helpers (called on the worker thread)
+# ════════════════════════════════════════════════════════════════════
+_save_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="image-save")
+
+
+def save_rgb_async(rgb: bytes, size, path: str) -> Future:
+    """Encode raw RGB pixels to *path* on a background thread."""
+    def _save():
+        from PIL import Image
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        Image.frombytes("RGB", tuple(size), rgb).save(path)
+        return path
+    return _save_executor.submit(_save)
+
+
+def wait_for_pending_saves() -> None:
+    """Block until every save queued so far has been written (FIFO executor)."""
+    _save_executor.submit(lambda: None).result()
+
+
+def rgb_to_qimage(rgb: bytes, size, target_size=None, dpr: float = 1.0) -> QImage:
+    """
+    Wrap raw RGB pixels as a QImage without copying, then pre‑scale it to
+    *target_size* (logical px, aspect ratio kept) for the given device
+    pixel ratio.  QImage is safe to use off the GUI thread; the caller
+    must keep *rgb* alive as long as an unscaled result is in use.
+    """
+    w, h = size
+    qimage = QImage(rgb, w, h, 3 * w, QImage.Format.Format_RGB888)
+    if not target_size:
+        return qimage
+    tw, th = target_size
+    scaled = qimage.scaled(
+        max(1, int(tw * dpr)), max(1, int(th * dpr)),
+        Qt.AspectRatioMode.KeepAspectRatio,
+        Qt.TransformationMode.SmoothTransformation,
+    )
+    scaled.setDevicePixelRatio(dpr)
+    return scaled
+
+
+def build_image_payload(job: dict, rgb: bytes, size, latents) -> dict:
+    """
+    Result payload for a finished job: a display‑ready QImage plus the raw
+    pixels.  If the job names a *save_path*, the PNG is written in the
+    background (*saved*: its Future); the UI thread never encodes or decodes.
+    """
+    save_path = job.get("save_path")
+    saved = save_rgb_async(rgb, size, save_path) if save_path else None
+    return {
+        "type": "image_generated",
+        "qimage": rgb_to_qimage(rgb, size, job.get("target_size"), job.get("dpr", 1.0)),
+        "rgb": rgb,  # keeps the QImage buffer alive when it was not rescaled
+        "size": tuple(size),
+        "latents": latents,
+        "prompt": job["prompt"],
+        "page_idx": job.get("page_idx"),
+        "turn_id": job.get("turn_id"),
+        "save_path": save_path,
+        "saved": saved,
+        "thumb": make_thumbnail(rgb, size),  # small JPEG for the story library
+    }
+
 
 # ════════════════════════════════════════════════════════════════════
 # ImageGenWorker (runs in background thread)
@@ -20,26 +92,74 @@ import format_helper
 class ImageGenWorker(QObject):
     """Handles image generation in a background thread."""
 
-    resultReady = Signal(dict)  # keys: type, image (PIL.Image), prompt (str)
+    resultReady = Signal(dict)  # see build_image_payload()
 
-    def __init__(self, engine):  # engine: StableV15Engine
+    def __init__(self, engine, budget: Optional[dict] = None):  # engine: StableV15Engine
         super().__init__()
         self.engine = engine
+        self.budget = budget or {}
+
+    @Slot()
+    def start(self) -> None:
+        """Runs on the worker thread once it starts: apply the diffusion CPU budget."""
+        apply_cpu_budget(self.budget.get("threads", 0), self.budget.get("cores"), workload="diffusion")
 
-    @Slot(str)
-    def doWork(self, prompt: str):
+    @Slot()
+    def warmUp(self) -> None:
+        """Dummy illustration right after load (config ``warmup``); yields to chat like real jobs."""
+        scheduler = get_cpu_scheduler()
+        extra = {}
+        if scheduler is not None:
+            extra["callback_on_step_end"] = scheduler.diffusion_step_callback()
+        prepare_engine(self.engine, "image", **extra)
+
+    @Slot(dict)
+    def doWork(self, job: dict):
+        """
+        *job* keys: prompt (str), page_idx (int), seed (int | None),
+        init_latents (Tensor | None) and strength (float) for latent reuse,
+        target_size ((w, h) of the label) / dpr for pre‑scaling, save_path.
+        """
+        prompt = job["prompt"]
+        tracer = get_tracer()
+        metrics = get_metrics()
+        t0 = time.perf_counter()
         try:
-            image = self.engine.generate_image(prompt)
-            self.resultReady.emit({
-                "type": "image_generated",
-                "image": image,
-                "prompt": prompt
-            })
+            extra = {}
+            scheduler = get_cpu_scheduler()
+            if scheduler is not None:
+                extra["callback_on_step_end"] = scheduler.diffusion_step_callback()
+            if tracer.enabled:
+                extra["callback_on_step_end"] = timed_step_callback(extra.get("callback_on_step_end"))
+            with tracer.span("diffusion", job.get("turn_id"), page_idx=job.get("page_idx")) as span:
+                step_cb = extra.get("callback_on_step_end")
+                if tracer.enabled:
+                    step_cb.reset()
+                image, latents = self.engine.generate_image_with_latents(
+                    prompt,
+                    seed=job.get("seed"),
+                    init_latents=job.get("init_latents"),
+                    strength=job.get("strength", 0.6),
+                    **extra,
+                )
+                if tracer.enabled and step_cb.step_ms:
+                    steps = step_cb.step_ms
+                    span.set(steps=len(steps), step_ms_mean=round(sum(steps) / len(steps), 2),
+                             step_ms_max=round(max(steps), 2))
+            with tracer.span("image_handoff", job.get("turn_id")):
+                rgb = image.convert("RGB").tobytes()
+                payload = build_image_payload(job, rgb, image.size, latents)
+            metrics.counter("images_total", "Illustrations by status").inc(status="ok")
+            metrics.histogram("image_seconds", "Illustration latency").observe(time.perf_counter() - t0)
+            self.resultReady.emit(payload)
         except Exception as e:
             print(f"[ImageGenWorker] Error generating image: {e}")
+            metrics.counter("images_total", "Illustrations by status").inc(status="error")
+            metrics.counter("errors_total", "Failures by where they happened").inc(where="image")
             self.resultReady.emit({
                 "type": "error",
-                "error": str(e)
+                "error": str(e),
+                "page_idx": job.get("page_idx"),
             })
 
 
@@ -47,20 +167,37 @@ class ImageGenWorker(QObject):
 # ImageGenController (thread wrapper)
 # ════════════════════════════════════════════════════════════════════
 class ImageGenController(QObject):
-    operate = Signal(str)  # accepts the prompt string
+    operate = Signal(dict)  # accepts a job dict (see ImageGenWorker.doWork)
+    warm = Signal()
 
-    def __init__(self, result_callback, engine):  # engine: StableV15Engine
+    def __init__(self, result_callback, engine=None, use_process: bool = False):  # engine: StableV15Engine
+        """
+        With *use_process* the engine lives in a separate service process
+        (see image_gen_process) and *engine* is ignored.
+        """
         super().__init__()
+        budget = load_cpu_budget("diffusion")
         self.workerThread = QThread()
-        self.worker = ImageGenWorker(engine)
+        if use_process:
+            from image_gen_process import ImageGenProcessWorker
+            self.worker = ImageGenProcessWorker(budget)
+            self.workerThread.finished.connect(self.worker.shutdown, Qt.ConnectionType.DirectConnection)
+        else:
+            self.worker = ImageGenWorker(engine, budget)
+            self.warm.connect(self.worker.warmUp)   # the service process warms itself up
         self.worker.moveToThread(self.workerThread)
 
+        self.workerThread.started.connect(self.worker.start)
         self.workerThread.finished.connect(self.worker.deleteLater)
         self.operate.connect(self.worker.doWork)
         self.worker.resultReady.connect(result_callback)
 
         self.workerThread.start()
 
+    def warm_up(self) -> None:
+        """Queue a warm-up illustration ahead of the first real job."""
+        self.warm.emit()
+
     def __del__(self):
         self.workerThread.quit()
         self.workerThread.wait()
@@ -0,0 +1,195 @@
+# ── stdlib
+import multiprocessing as mp
+import queue
+import sys
+import time
+from multiprocessing import shared_memory
+from typing import Optional
+
+# ── Qt
+from PySide6.QtCore import QObject, Signal, Slot
+
+from core.cpu_scheduler import get_cpu_scheduler
+from core.metrics import get_metrics
+from core.tracing import get_tracer
+from image_gen_engine import build_image_payload
+
+
+# ════════════════════════════════════════════════════════════════════
+# Image service (runs in a separate process)
+# ════════════════════════════════════════════════════════════════════
+def _service_main(job_q, result_q, budget: dict, chat_idle=None, step_settings: Optional[dict] = None) -> None:
+    """
+    Child process entry point: owns the diffusion engine and serves jobs
+    from *job_q* until it receives ``None``.
+
+    *chat_idle* / *step_settings* come from the GUI process's CpuScheduler
+    so diffusion yields to chat turns across the process boundary.
+
+    Pixels are returned through a SharedMemory block (RGB, row-major); only
+    its name, the image size and the small latent tensor go through the
+    result queue.  Every result also carries the metrics recorded here
+    since the last one (MetricsRegistry.drain), for the GUI process.
+    """
+    from core.cpu_budget import apply_cpu_budget
+    apply_cpu_budget(budget.get("threads", 0), budget.get("cores"), workload="diffusion")
+
+    from core.llm_factory import get_image_engine
+    engine = get_image_engine()
+    extra = {}
+    if chat_idle is not None:
+        from core.cpu_scheduler import make_diffusion_step_callback
+        extra["callback_on_step_end"] = make_diffusion_step_callback(chat_idle, **step_settings)
+    result_q.put({"type": "ready"})
+
+    # Jobs sent meanwhile wait in job_q
+    from core.warmup import prepare_engine
+    prepare_engine(engine, "image", **extra)
+
+    while True:
+        job = job_q.get()
+        if job is None:
+            break
+
+        try:
+            image, latents = engine.generate_image_with_latents(
+                job["prompt"],
+                seed=job.get("seed"),
+                init_latents=job.get("init_latents"),
+                strength=job.get("strength", 0.6),
+                **extra,
+            )
+            data = image.convert("RGB").tobytes()
+            shm = shared_memory.SharedMemory(create=True, size=len(data))
+            shm.buf[:len(data)] = data
+            # The parent unlinks the block once it has copied it out; keep
+            # this process's resource tracker from unlinking it a second time.
+            if sys.platform != "win32":
+                from multiprocessing import resource_tracker
+                resource_tracker.unregister(shm._name, "shared_memory")
+            result_q.put({
+                "type": "image_generated",
+                "shm": shm.name,
+                "nbytes": len(data),
+                "size": image.size,
+                "latents": latents,
+                "prompt": job["prompt"],
+                "page_idx": job.get("page_idx"),
+                "metrics": get_metrics().drain(),
+            })
+            shm.close()
+        except Exception as e:
+            result_q.put({
+                "type": "error",
+                "error": str(e),
+                "page_idx": job.get("page_idx"),
+                "metrics": get_metrics().drain(),
+            })
+
+
+def _rgb_from_shm(name: str, nbytes: int) -> bytes:
+    """Copy RGB pixels out of shared memory block *name* and free the block."""
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        with shm.buf[:nbytes] as view:
+            rgb = bytes(view)
+    finally:
+        shm.close()
+        shm.unlink()
+    return rgb
+
+
+# ════════════════════════════════════════════════════════════════════
+# ImageGenProcessWorker (Qt side, runs in a background thread)
+# ════════════════════════════════════════════════════════════════════
+class ImageGenProcessWorker(QObject):
+    """
+    Drop-in replacement for ImageGenWorker that forwards jobs to the image
+    service process.  A crashed service is reported as an ``error`` payload
+    and restarted on the next job; the GUI process keeps running.
+    """
+
+    resultReady = Signal(dict)  # same payloads as ImageGenWorker
+
+    POLL_SECONDS = 0.5
+
+    def __init__(self, budget: dict):
+        super().__init__()
+        self._ctx = mp.get_context("spawn")
+        self._budget = budget
+        self._proc = None
+        self._job_q = None
+        self._result_q = None
+
+    def _ensure_service(self) -> None:
+        if self._proc is not None and self._proc.is_alive():
+            return
+        self._job_q = self._ctx.Queue()
+        self._result_q = self._ctx.Queue()
+        scheduler = get_cpu_scheduler()
+        args = (self._job_q, self._result_q, self._budget)
+        if scheduler is not None:
+            args += (scheduler.chat_idle, scheduler.diffusion_settings())
+        self._proc = self._ctx.Process(
+            target=_service_main,
+            args=args,
+            name="image-gen-service",
+            daemon=True,
+        )
+        self._proc.start()
+        self._wait_result()  # "ready" (model loaded)
+
+    def _wait_result(self) -> dict:
+        while True:
+            try:
+                payload = self._result_q.get(timeout=self.POLL_SECONDS)
+                get_metrics().merge(payload.pop("metrics", ()))
+                return payload
+            except queue.Empty:
+                if not self._proc.is_alive():
+                    raise RuntimeError(
+                        f"image service exited unexpectedly (exit code {self._proc.exitcode})"
+                    )
+
+    @Slot()
+    def start(self) -> None:
+        """Start the service early so the model loads while the user types."""
+        try:
+            self._ensure_service()
+        except Exception as e:
+            print(f"[ImageGenProcessWorker] Could not start image service: {e}")
+
+    @Slot(dict)
+    def doWork(self, job: dict):
+        tracer = get_tracer()
+        metrics = get_metrics()
+        t0 = time.perf_counter()
+        try:
+            self._ensure_service()
+            # Per-step timings stay in the service process; here the whole round trip is one span
+            with tracer.span("diffusion", job.get("turn_id"), page_idx=job.get("page_idx"), process=True):
+                self._job_q.put(job)
+                payload = self._wait_result()
+        except Exception as e:
+            print(f"[ImageGenProcessWorker] Error generating image: {e}")
+            payload = {"type": "error", "error": str(e), "page_idx": job.get("page_idx")}
+
+        if payload["type"] == "image_generated":
+            with tracer.span("image_handoff", job.get("turn_id")):
+                rgb = _rgb_from_shm(payload["shm"], payload["nbytes"])
+                payload = build_image_payload(job, rgb, payload["size"], payload["latents"])
+            metrics.counter("images_total", "Illustrations by status").inc(status="ok")
+            metrics.histogram("image_seconds", "Illustration latency").observe(time.perf_counter() - t0)
+        else:
+            metrics.counter("images_total", "Illustrations by status").inc(status="error")
+            metrics.counter("errors_total", "Failures by where they happened").inc(where="image")
+        self.resultReady.emit(payload)
+
+    @Slot()
+    def shutdown(self) -> None:
+        if self._proc is not None and self._proc.is_alive():
+            self._job_q.put(None)
+            self._proc.join(timeout=5)
+            if self._proc.is_alive():
+                self._proc.terminate()
+        self._proc = None
@@ -0,0 +1,133 @@
+# ── stdlib
+from collections import OrderedDict
+from typing import Any, Dict, List
+
+# ── Qt
+from PySide6.QtCore import QAbstractListModel, QModelIndex, QSize, Qt, QTimer, Signal
+from PySide6.QtGui import QPixmap
+from PySide6.QtWidgets import QDialog, QLineEdit, QListView, QVBoxLayout
+
+from core.library import StoryLibrary
+
+
+# ════════════════════════════════════════════════════════════════════
+# LibraryListModel (rows fetched from SQLite page by page)
+# ════════════════════════════════════════════════════════════════════
+class LibraryListModel(QAbstractListModel):
+    """
+    Lazily fetched list of library rows.  Only FETCH_SIZE rows are queried
+    at a time as the view scrolls, and thumbnails are decoded from their
+    small JPEG blobs on first paint and kept in a bounded LRU.
+    """
+
+    FETCH_SIZE = 100
+    THUMB_CACHE = 300
+    PathRole = Qt.ItemDataRole.UserRole + 1
+
+    def __init__(self, library: StoryLibrary, parent=None):
+        super().__init__(parent)
+        self.library = library
+        self.query = ""
+        self._rows: List[Dict[str, Any]] = []
+        self._total = 0
+        self._thumbs: "OrderedDict[str, QPixmap]" = OrderedDict()
+        self.set_query("")
+
+    def set_query(self, query: str) -> None:
+        self.beginResetModel()
+        self.query = query
+        self._total = self.library.count(query)
+        self._rows = self.library.list(query, 0, self.FETCH_SIZE)
+        self.endResetModel()
+
+    # ------------- QAbstractListModel ------------------------------------------
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._rows)
+
+    def canFetchMore(self, parent=QModelIndex()) -> bool:
+        return not parent.isValid() and len(self._rows) < self._total
+
+    def fetchMore(self, parent=QModelIndex()) -> None:
+        more = self.library.list(self.query, len(self._rows), self.FETCH_SIZE)
+        if not more:
+            self._total = len(self._rows)
+            return
+        first = len(self._rows)
+        self.beginInsertRows(QModelIndex(), first, first + len(more) - 1)
+        self._rows.extend(more)
+        self.endInsertRows()
+
+    def data(self, index: QModelIndex, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        row = self._rows[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            title = row["title"] or row["snippet"] or row["story_id"]
+            return f"{title}\n{row['page_count']} pages"
+        if role == Qt.ItemDataRole.DecorationRole:
+            return self._thumbnail(row)
+        if role == self.PathRole:
+            return row["path"]
+        return None
+
+    def _thumbnail(self, row: Dict[str, Any]):
+        key = row["story_id"]
+        pixmap = self._thumbs.get(key)
+        if pixmap is not None:
+            self._thumbs.move_to_end(key)
+            return pixmap
+        if not row.get("thumb"):
+            return None
+        pixmap = QPixmap()
+        pixmap.loadFromData(row["thumb"], "JPEG")
+        self._thumbs[key] = pixmap
+        if len(self._thumbs) > self.THUMB_CACHE:
+            self._thumbs.popitem(last=False)
+        return pixmap
+
+
+# ════════════════════════════════════════════════════════════════════
+# LibraryDialog
+# ════════════════════════════════════════════════════════════════════
+class LibraryDialog(QDialog):
+    """Searchable list of saved storybooks.  Emits storyChosen(path) on double click."""
+
+    storyChosen = Signal(str)
+
+    SEARCH_DELAY_MS = 150
+
+    def __init__(self, library: StoryLibrary, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("📚 Story Library")
+        self.resize(520, 640)
+
+        self.searchEdit = QLineEdit(self)
+        self.searchEdit.setPlaceholderText("🔍 Search stories...")
+        self.searchEdit.setClearButtonEnabled(True)
+
+        self.model = LibraryListModel(library, self)
+        self.listView = QListView(self)
+        self.listView.setModel(self.model)
+        self.listView.setIconSize(QSize(96, 96))
+        self.listView.setUniformItemSizes(True)      # rows all have the same height
+        self.listView.setLayoutMode(QListView.LayoutMode.Batched)
+        self.listView.setBatchSize(self.model.FETCH_SIZE)
+
+        layout = QVBoxLayout(self)
+        layout.addWidget(self.searchEdit)
+        layout.addWidget(self.listView)
+
+        # Debounce typing so a query runs once per pause, not per key press
+        self._searchTimer = QTimer(self)
+        self._searchTimer.setSingleShot(True)
+        self._searchTimer.setInterval(self.SEARCH_DELAY_MS)
+        self._searchTimer.timeout.connect(lambda: self.model.set_query(self.searchEdit.text()))
+        self.searchEdit.textChanged.connect(self._searchTimer.start)
+
+        self.listView.doubleClicked.connect(self._on_double_clicked)
+
+    def _on_double_clicked(self, index: QModelIndex) -> None:
+        path = index.data(LibraryListModel.PathRole)
+        if path:
+            self.storyChosen.emit(path)
+            self.accept()
@@ -0,0 +1,190 @@
+# load_test.py
+"""
+Load test for server.py: N simulated children, each with its own session
+and WebSocket, typing the lines of a benchmark corpus session with a
+pause between turns.
+
+Reports time to first token, turn latency (p50/p95), busy rejections,
+failed turns, illustrations received and the server's queue waits.
+With --spammers, that many children send all their inputs at once;
+latencies are measured on the others, to check fair scheduling.
+
+    python server.py --stub &
+    python load_test.py --children 20
+    python load_test.py --children 12 --spammers 2
+    python load_test.py --url http://classroom-pc:8765 --children 30 --think-ms 3000
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import aiohttp
+
+from benchmark import DEFAULT_CORPUS, load_corpus, percentile
+
+
+# ════════════════════════════════════════════════════════════════════
+# One simulated child
+# ════════════════════════════════════════════════════════════════════
+async def child(http: aiohttp.ClientSession, url: str, inputs: List[str], *,
+                think_ms: float, image_wait_s: float, rng: random.Random, spam: bool = False) -> Dict:
+    stats = {"ttft_ms": [], "turn_ms": [], "busy": 0, "merged": 0, "errors": 0, "images": 0,
+             "images_skipped": 0, "rejected": False, "spam": spam}
+    async with http.post(f"{url}/sessions", json={}) as resp:
+        if resp.status == 503:
+            stats["rejected"] = True
+            return stats
+        resp.raise_for_status()
+        session_id = (await resp.json())["session_id"]
+
+    async with http.ws_connect(f"{url}/sessions/{session_id}/ws") as ws:
+        if spam:
+            await _spam(ws, inputs, stats)
+        for text in ([] if spam else inputs):
+            await asyncio.sleep(rng.uniform(0.5, 1.5) * think_ms / 1000)
+            t0 = time.perf_counter()
+            first_token = None
+            await ws.send_json({"type": "submit", "text": text})
+            while True:
+                msg = await ws.receive_json()
+                kind = msg["type"]
+                if kind == "token" and first_token is None:
+                    first_token = time.perf_counter()
+                elif kind == "busy":
+                    stats["busy"] += 1
+                    break
+                elif kind == "error":
+                    stats["errors"] += 1
+                elif kind == "image_ready":
+                    stats["images"] += 1
+                elif kind == "image_skipped":
+                    stats["images_skipped"] += 1
+                elif kind == "turn_done":
+                    stats["turn_ms"].append((time.perf_counter() - t0) * 1000)
+                    if first_token is not None:
+                        stats["ttft_ms"].append((first_token - t0) * 1000)
+                    break
+
+        # Let outstanding illustrations arrive before hanging up
+        async with http.get(f"{url}/sessions/{session_id}") as resp:
+            pages = (await resp.json())["pages"]
+        expected_images = sum(1 for page in pages if len(page) >= 2) - stats["images_skipped"]
+        deadline = time.perf_counter() + image_wait_s
+        while stats["images"] < expected_images and time.perf_counter() < deadline:
+            try:
+                msg = await ws.receive_json(timeout=max(0.1, deadline - time.perf_counter()))
+            except asyncio.TimeoutError:
+                break
+            if msg["type"] == "image_ready":
+                stats["images"] += 1
+
+    await http.delete(f"{url}/sessions/{session_id}")
+    return stats
+
+
+async def _spam(ws, inputs: List[str], stats: Dict) -> None:
+    """Send every input at once, then read until each one finished, merged or was refused."""
+    for text in inputs:
+        await ws.send_json({"type": "submit", "text": text})
+    outstanding = len(inputs)
+    while outstanding > 0:
+        msg = await ws.receive_json()
+        kind = msg["type"]
+        if kind in ("busy", "merged", "turn_done"):
+            outstanding -= 1
+            stats["busy" if kind == "busy" else "merged"] += kind != "turn_done"
+        elif kind == "error":
+            stats["errors"] += 1
+        elif kind == "image_ready":
+            stats["images"] += 1
+        elif kind == "image_skipped":
+            stats["images_skipped"] += 1
+
+
+# ════════════════════════════════════════════════════════════════════
+# main
+# ════════════════════════════════════════════════════════════════════
+async def run(args) -> Dict:
+    sessions = load_corpus(args.corpus)
+    rng = random.Random(args.seed)
+    async with aiohttp.ClientSession() as http:
+        t0 = time.perf_counter()
+        results = await asyncio.gather(*(
+            child(http, args.url.rstrip("/"), sessions[i % len(sessions)]["inputs"][:args.turns or None],
+                  think_ms=args.think_ms, image_wait_s=args.image_wait_s, rng=random.Random(rng.random()),
+                  spam=i < args.spammers)
+            for i in range(args.children)
+        ))
+        wall_s = time.perf_counter() - t0
+        async with http.get(f"{args.url.rstrip('/')}/health") as resp:
+            health = await resp.json()
+
+    # Latency of the children who wait for each answer (spammers are the noise)
+    ttft = [ms for r in results for ms in r["ttft_ms"]]
+    turn_ms = [ms for r in results for ms in r["turn_ms"]]
+    return {
+        "children": args.children,
+        "spammers": args.spammers,
+        "rejected_sessions": sum(r["rejected"] for r in results),
+        "turns": len(turn_ms),
+        "busy": sum(r["busy"] for r in results),
+        "merged": sum(r["merged"] for r in results),
+        "errors": sum(r["errors"] for r in results),
+        "ttft_p50_ms": percentile(ttft, 0.50),
+        "ttft_p95_ms": percentile(ttft, 0.95),
+        "turn_p50_ms": percentile(turn_ms, 0.50),
+        "turn_p95_ms": percentile(turn_ms, 0.95),
+        "images": sum(r["images"] for r in results),
+        "images_skipped": sum(r["images_skipped"] for r in results),
+        "mean_llm_batch": health["llm"]["mean_batch"],
+        "queues": health["queues"],
+        "wall_s": wall_s,
+    }
+
+
+def print_report(report: Dict) -> None:
+    def fmt(v, spec):
+        return "-" if v is None else format(v, spec)
+
+    print()
+    print(f"children / spammers  {report['children']} / {report['spammers']} "
+          f"({report['rejected_sessions']} sessions refused)")
+    print(f"turns / busy / merged / error  "
+          f"{report['turns']} / {report['busy']} / {report['merged']} / {report['errors']}")
+    print(f"first token p50/p95  {fmt(report['ttft_p50_ms'], '.1f')} / {fmt(report['ttft_p95_ms'], '.1f')} ms")
+    print(f"turn p50/p95         {fmt(report['turn_p50_ms'], '.1f')} / {fmt(report['turn_p95_ms'], '.1f')} ms")
+    print(f"images / skipped     {report['images']} / {report['images_skipped']}")
+    print(f"mean LLM batch       {report['mean_llm_batch']}")
+    for lane, q in report["queues"].items():
+        print(f"{lane + ' queue wait':<21}p50 {fmt(q['wait_p50_ms'], '.1f')} / p95 {fmt(q['wait_p95_ms'], '.1f')} ms "
+              f"({q['completed']} jobs, {q['merged']} merged, {q['rejected']} rejected)")
+    print(f"wall time            {report['wall_s']:.1f} s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8765")
+    parser.add_argument("--children", type=int, default=10, help="concurrent simulated children")
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS, help="inputs to type (benchmark corpus format)")
+    parser.add_argument("--turns", type=int, default=0, help="inputs per child (0 = whole corpus session)")
+    parser.add_argument("--spammers", type=int, default=0,
+                        help="how many of the children send all their inputs at once")
+    parser.add_argument("--think-ms", type=float, default=1000, help="mean pause between a child's turns")
+    parser.add_argument("--image-wait-s", type=float, default=30, help="wait this long for pending illustrations")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write the report to this file")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    print_report(report)
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,26 +1,31 @@
 # ── stdlib
-import sys, re, json, textwrap, random, string, collections
+import sys, re, json, textwrap, random, string, collections, threading, time
 from pathlib import Path
-from typing import Dict, List
-
-from PySide6.QtWidgets import QApplication, QMainWindow, QMessageBox, QListWidgetItem
+from typing import Dict, List, Optional
+
+from PySide6.QtWidgets import (
+    QApplication, QMainWindow, QMessageBox, QListWidgetItem, QFileDialog, QProgressDialog,
+)
+from transcript_panel import ChatBubbleDelegate, TranscriptModel
+from story_panel import StoryPageCache
+from asset_loader import get_asset_loader, shutdown_asset_loader
+from core.metrics import start_metrics, stop_metrics
+from core.session_scheduler import QueueFull
+from core.tracing import get_tracer
 from PySide6.QtCore import Qt
-from PySide6.QtGui import QPixmap
+from PySide6.QtGui import QImage, QPixmap
 
 
 from main_ui_colorful import Ui_StoryMakerMainWindow
-# ── Transformers / Torch
-import torch
-from transformers import AutoTokenizer, AutoModelForCausalLM
-
-
-
-from phi3_mini_engine import Phi3MiniEngine
+# 엔진(torch/transformers/diffusers)은 core.llm_factory 가 설정에 따라 필요할 때만 import
 from chat_engine import *
 import format_helper
+from config.config_loader import load_config
+from core.storybook import SUFFIX as STORY_SUFFIX, Storybook, StorybookWriter, new_story_id
+from core.library import StoryLibrary
 
-from stable_engine import StableV15Engine
 from image_gen_engine import *
+from export_engine import ExportController
 
 
 
@@ -32,6 +37,12 @@ class MainApp(QMainWindow):
         super().__init__()
         self.ui = Ui_StoryMakerMainWindow()
         self.ui.setupUi(self)
+
+        # 채팅 기록 (가상화된 모델 + 델리게이트, 오래된 메시지는 디스크로)
+        ui_cfg = load_config().get("ui", {})
+        self.transcript = TranscriptModel(ui_cfg.get("transcript_in_memory", 1000), self)
+        self.ui.chatList.setModel(self.transcript)
+        self.ui.chatList.setItemDelegate(ChatBubbleDelegate(ui_cfg.get("transcript_max_lines", 3), self.ui.chatList))
         
         # 현재 페이지 (임시)
         self.current_page_idx = 0
@@ -40,6 +51,38 @@ class MainApp(QMainWindow):
         
         self.story_pages_list = [] # double list. each list inside include [user input, ai response, user input, ai response]
 
+        # 스토리 창: 페이지별 모델 캐시 (변경된 행만 갱신, 페이지 이동 시 재생성 없음)
+        self.page_models = StoryPageCache(self.ui.storyPlaceholderText, self.ui.storyPlaceholderFont, self)
+        self.update_story_display()
+
+        # 스토리북 파일 (append-only, 매 턴마다 변경분만 자동 저장)
+        storage_cfg = load_config().get("storage", {})
+        self.story_id = new_story_id()
+        self.storybook = StorybookWriter(
+            Path(storage_cfg.get("stories_dir", "stories")) / f"{self.story_id}{STORY_SUFFIX}",
+            story_id=self.story_id,
+        )
+        self._loaded_book: Optional[Storybook] = None  # 라이브러리에서 연 스토리 (latent 지연 로드용)
+        self._has_cover = False
+
+        # 턴 지연 시간 추적 (config tracing; 꺼져 있으면 no-op)
+        self.tracer = get_tracer()
+        start_metrics("desktop")   # 리소스 샘플러 + logs/metrics.jsonl (config metrics)
+        self._turn_started: Dict[str, float] = {}   # {turn_id: 전송 시각}
+        self.trace_overlay = None
+        if self.tracer.enabled and (load_config().get("tracing") or {}).get("overlay", False):
+            from trace_overlay import TraceOverlay
+            self.trace_overlay = TraceOverlay(self.tracer, self.ui.centralwidget)
+
+        # 내보내기 (첫 사용 시 워커 스레드 생성)
+        self.export_controller = None
+        self.export_progress = None
+
+        # 스토리 라이브러리 인덱스 (SQLite FTS5 + 썸네일)
+        self.stories_dir = Path(storage_cfg.get("stories_dir", "stories"))
+        self.library = StoryLibrary(self.stories_dir / "library.sqlite3")
+        threading.Thread(target=self.library.scan_dir, args=(self.stories_dir,), daemon=True).start()
+
         self.connect_signals()
         
         # initial state
@@ -49,16 +92,50 @@ class MainApp(QMainWindow):
         from core.llm_factory import get_llm_engine
         self.llm_engine = get_llm_engine()
         self.story_parts: List[str] = []
-        self.chat_controller = ChatController(self._on_chat_reply, self.llm_engine)
+        self.chat_controller = ChatController(self._on_chat_reply, self.llm_engine, self._on_chat_failed)
 
         # For image generation
-        self.image_gen_engine = StableV15Engine()
-        self.image_gen_controller = ImageGenController(
-            self._on_image_gen_ready, 
-            self.image_gen_engine)
+        # out_of_process: 별도 프로세스에서 Stable Diffusion 실행 (GUI 프로세스에는 모델 없음)
+        image_cfg = load_config().get("image", {})
+        if image_cfg.get("out_of_process", False):
+            self.image_gen_engine = None
+            self.image_gen_controller = ImageGenController(
+                self._on_image_gen_ready, use_process=True)
+        else:
+            from core.llm_factory import get_image_engine
+            self.image_gen_engine = get_image_engine()
+            self.image_gen_controller = ImageGenController(
+                self._on_image_gen_ready,
+                self.image_gen_engine)
+
+        # 워밍업 (config warmup): 모델 로드 직후 백그라운드에서 더미 턴/삽화 → 첫 턴이 느리지 않게
+        self.chat_controller.warm_up()
+        self.image_gen_controller.warm_up()
 
         # 각 페이지별 생성된 이미지 저장
         self.page_images: Dict[int, str] = {}  # {page_index: image_path}
+        # 아직 PNG 저장 중인 이미지: 저장이 끝날 때까지 메모리의 QImage로 표시
+        self._unsaved_images: Dict[str, dict] = {}  # {image_path: payload}
+        self._shown_image_path: Optional[str] = None   # 로딩 중/표시 중인 저장된 삽화
+        # 각 페이지 이미지의 latent (다음 페이지 img2img 시작점으로 재사용)
+        self.page_latents: Dict[int, "torch.Tensor"] = {}  # {page_index: latents}
+        self.reuse_latents: bool = image_cfg.get("reuse_latents", False)
+        self.reuse_strength: float = image_cfg.get("reuse_strength", 0.6)
+
+        # 낭독 (TTS) - 별도 스레드에서 문장 단위로 읽고, 읽는 문장을 스토리 창에 하이라이트
+        tts_cfg = load_config().get("tts", {})
+        self.speech_service = None
+        self._narration_rows: Dict[int, tuple] = {}  # {utterance_id: (page_idx, row)}
+        if tts_cfg.get("enabled", False):
+            from tts.speech import SpeechService
+            from tts.audio_cache import NarrationCache
+            self.speech_service = SpeechService(
+                rate=tts_cfg.get("rate", 160),
+                voice=tts_cfg.get("voice"),
+                cache=NarrationCache(tts_cfg.get("cache_dir", "cache/tts")),
+            )
+            self.speech_service.sentenceStarted.connect(self._on_narration_sentence)
+            self.speech_service.utteranceFinished.connect(self._on_narration_finished)
 
 
     def connect_signals(self):
@@ -66,6 +143,10 @@ class MainApp(QMainWindow):
 
         self.ui.btnContinueStory.clicked.connect(self._on_chat_send)
         self.ui.btnSaveStory.clicked.connect(self.save_story)
+        self.ui.btnLibrary.clicked.connect(self.open_library)
+        self.ui.btnExport.clicked.connect(self.export_story)
+        # 스토리 창 더블클릭 → 현재 페이지 낭독 (미리 렌더된 오디오가 있으면 바로 재생)
+        self.ui.chatList_2.doubleClicked.connect(lambda _index: self.read_page(self.current_page_idx))
         
         # 페이지 네비게이션
         self.ui.label_page_prev.mousePressEvent = self.previous_page
@@ -73,70 +154,92 @@ class MainApp(QMainWindow):
     
     def _on_image_gen_ready(self, payload: dict):
         if payload["type"] == "image_generated":
-            image = payload["image"]
             prompt = payload["prompt"]
 
-            # Optional: Save or display
-            page_idx = self.current_page_idx
-            save_path = f"images/page_{page_idx + 1}.png"
-            StableV15Engine.save_image(image, save_path)
+            # 요청한 페이지 기준으로 저장 (생성 중 페이지가 넘어갈 수 있음)
+            # PNG 저장은 워커 쪽 백그라운드 스레드에서 진행됨
+            page_idx = payload["page_idx"]
+            save_path = payload["save_path"]
             self.page_images[page_idx] = save_path
-
-            print(f"[Image] Saved to {save_path} from prompt: {prompt}")
-
-            # Optional: show in UI (e.g., QLabel pixmap)
-            # self.ui.imageLabel.setPixmap(QPixmap(save_path))
+            self._unsaved_images = {p: d for p, d in self._unsaved_images.items() if not d["saved"].done()}
+            if payload.get("saved") is not None:
+                self._unsaved_images[save_path] = payload
+            self.storybook.add_image(page_idx, path=save_path)
+            if payload["latents"] is not None:      # 가짜 엔진은 torch 없이 None
+                self.page_latents[page_idx] = payload["latents"]
+                self.storybook.add_latents(page_idx, payload["latents"])
+            self.storybook.flush()
+            if not self._has_cover:
+                self.library.set_thumbnail(self.story_id, payload["thumb"])
+                self._has_cover = True
+
+            print(f"[Image] Saving to {save_path} from prompt: {prompt}")
+
+            with self.tracer.span("image_ui_update", payload.get("turn_id")):
+                self._display_qimage_on_label(payload["qimage"])
 
         elif payload["type"] == "error":
             QMessageBox.critical(self, "Image Error", f"Failed to generate image:\n{payload['error']}")
 
 
-        
-        self._display_image_on_label(save_path)
-
-
     def _on_chat_send(self) -> None:
         user_input = self.ui.textEdit_childStory.toPlainText().strip()
         
         if not user_input:
             QMessageBox.warning(self, "입력 오류", "스토리를 입력해주세요!")
             return
+
+        turn_id = self.tracer.new_turn_id()
+        try:
+            status = self.chat_controller.submit(user_input, turn_id)
+        except QueueFull:
+            QMessageBox.information(self, "잠깐만요", "이야기를 만드는 중이에요. 조금만 기다려 주세요!")
+            return
             
-        item = QListWidgetItem(f"사용자: {user_input}")
-        item.setTextAlignment(Qt.AlignmentFlag.AlignLeft)
-        # 줄바꿈을 위한 플래그 설정
-        item.setFlags(item.flags() | Qt.ItemFlag.ItemIsEnabled)
-        self.ui.chatList.addItem(item)
-
-        print(f"user_input: {user_input}")
-        print(type(user_input))
+        self.transcript.append("user", user_input)
         
         self.ui.textEdit_childStory.clear()
 
-        self.chat_controller.operate.emit(user_input)
+        self.storybook.add_chat("user", user_input)
+        if self.tracer.enabled and status != "merged":   # 합쳐진 입력은 앞 턴의 id로 측정
+            self._turn_started[turn_id] = time.perf_counter()
 
 
     def _on_chat_reply(self, payload: Dict[str, str]) -> None:
+        turn_id = payload.get("turn_id") or None
+        with self.tracer.span("ui_update", turn_id, kind=payload["type"]):
+            self._apply_chat_reply(payload)
+
+        # 전송 → 화면 표시까지 (end-to-end)
+        started = self._turn_started.get(turn_id)
+        if started is not None:
+            self.tracer.record("reply_visible", (time.perf_counter() - started) * 1000, turn_id,
+                               kind=payload["type"], elapsed=True)
+            if payload["type"] != "story_line":    # 턴의 마지막 응답
+                del self._turn_started[turn_id]
+
+    def _on_chat_failed(self, payload: Dict[str, str]) -> None:
+        """턴 실패 (예: 이어쓰기 JSON 파싱 오류): 아이에게 다시 말해 달라고 안내."""
+        self._turn_started.pop(payload.get("turn_id") or None, None)
+        self.transcript.append("ai", "Oops, I got a little mixed up. Could you say that again?", "chat_answer")
+        self.ui.chatList.scrollToBottom()
+
+    def _apply_chat_reply(self, payload: Dict[str, str]) -> None:
         kind = payload["type"]
         text = payload["text"]
+        self.storybook.add_chat("ai", text, kind)
 
         if kind == "story_line":
-            item = QListWidgetItem(f"AI (fixed): {text}")
-            item.setFlags(item.flags() | Qt.ItemFlag.ItemIsEnabled)
-            self.ui.chatList.addItem(item)
+            self.transcript.append("ai", text, kind)
             self._append_to_story(text + " ")
 
         elif kind == "ai_suggestion":
-            item = QListWidgetItem(f"AI: {text}")
-            item.setFlags(item.flags() | Qt.ItemFlag.ItemIsEnabled)
-            self.ui.chatList.addItem(item)
+            self.transcript.append("ai", text, kind)
             self._append_to_story(text + " ")
+            self._narrate_last_segment(text)
 
         elif kind == "chat_answer":
-            item = QListWidgetItem(f"AI: {text}")
-            item.setFlags(item.flags() | Qt.ItemFlag.ItemIsEnabled)
-            self.ui.chatList.addItem(item)
-            # self.chat_list.addItem()
+            self.transcript.append("ai", text, kind)
         
         self.current_page_idx = len(self.story_pages_list) - 1
         self.update_page_display()
@@ -151,51 +254,123 @@ class MainApp(QMainWindow):
             prompt_for_image = segments[select_idx]
             prompt_for_image = format_helper.first_sentence(prompt_for_image)
             prompt_for_image += " children's picture book"
-            print(prompt_for_image)
-            self.image_gen_controller.operate.emit(prompt_for_image)
+            self._request_page_image(self.current_page_idx, prompt_for_image, payload.get("turn_id"))
+
+        self.storybook.flush()  # autosave (append-only → 이번 턴 변경분만 기록)
+        self._index_current_page()
+
+    def _request_page_image(self, page_idx: int, prompt: str, turn_id: Optional[str] = None) -> None:
+        """페이지 삽화 생성 요청. 이전 페이지 latent가 있으면 img2img로 이어서 생성."""
+        label = self.ui.label_generatedImage
+        seed = random.randrange(2**31)
+        self.storybook.add_seed(page_idx, seed)
+        job = {
+            "prompt": prompt,
+            "page_idx": page_idx,
+            "seed": seed,
+            "save_path": f"images/{self.story_id}/page_{page_idx + 1}.png",
+            # 워커가 라벨 크기에 맞춰 미리 스케일링
+            "target_size": (label.width(), label.height()),
+            "dpr": label.devicePixelRatioF(),
+            "turn_id": turn_id,
+        }
+        prev_latents = self.page_latents.get(page_idx - 1)
+        if prev_latents is None and self.reuse_latents and self._loaded_book is not None:
+            prev_latents = self._loaded_book.latents(page_idx - 1)
+        if self.reuse_latents and prev_latents is not None:
+            job["init_latents"] = prev_latents
+            job["strength"] = self.reuse_strength
+        self.image_gen_controller.operate.emit(job)
 
         
 
+    def _display_qimage_on_label(self, qimage: QImage) -> None:
+        """워커에서 미리 스케일된 QImage를 표시 (디스크/코덱 작업 없음)."""
+        self._shown_image_path = None
+        self._display_pixmap_on_label(QPixmap.fromImage(qimage))
+
+    def _display_pixmap_on_label(self, pixmap: QPixmap) -> None:
+        label = self.ui.label_generatedImage
+        target = label.size() * label.devicePixelRatioF()
+        # 생성 중 라벨 크기가 바뀐 경우에만 다시 스케일
+        if pixmap.width() > target.width() or pixmap.height() > target.height():
+            pixmap = pixmap.scaled(
+                target,
+                Qt.AspectRatioMode.KeepAspectRatio,
+                Qt.TransformationMode.SmoothTransformation,
+            )
+            pixmap.setDevicePixelRatio(label.devicePixelRatioF())
+        label.setPixmap(pixmap)
+        label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+
     def _display_image_on_label(self, image_path: str) -> None:
-        try:
-            if Path(image_path).exists():
-                pixmap = QPixmap(image_path)
-
-                if not pixmap.isNull():
-                    # label 크기에 맞게 이미지 스케일링 (비율 유지)
-                    scaled_pixmap = pixmap.scaled(
-                        self.ui.label_generatedImage.size(),
-                        Qt.AspectRatioMode.KeepAspectRatio,
-                        Qt.TransformationMode.SmoothTransformation
-                    )
-                    
-                    self.ui.label_generatedImage.setPixmap(scaled_pixmap)
-                    self.ui.label_generatedImage.setAlignment(Qt.AlignmentFlag.AlignCenter)
-                    print(f"이미지 표시 완료: {image_path}")
-                else:
-                    print(f"이미지 로드 실패: {image_path}")
-                    self._show_placeholder_text()
-            else:
-                print(f"이미지 파일이 존재하지 않음: {image_path}")
-                # 더미 이미지의 경우 기본 배경 이미지나 플레이스홀더 표시
-                self._show_placeholder_image()
-                
-        except Exception as e:
-            print(f"이미지 표시 중 오류 발생: {e}")
+        """저장된 삽화 표시. 디코드/스케일은 AssetLoader 워커 스레드에서 (UI 스레드에서 코덱 작업 없음)."""
+        unsaved = self._unsaved_images.get(image_path)
+        if unsaved is not None:
+            if not unsaved["saved"].done():
+                self._display_qimage_on_label(unsaved["qimage"])
+                return
+            del self._unsaved_images[image_path]
+        if not Path(image_path).exists():
+            print(f"이미지 파일이 존재하지 않음: {image_path}")
+            # 더미 이미지의 경우 기본 배경 이미지나 플레이스홀더 표시
             self._show_placeholder_text()
+            return
+
+        # 준비될 때까지 플레이스홀더 (디코드 실패 시에도 그대로 남음)
+        self._show_placeholder_text()
+        self._shown_image_path = image_path
+        label = self.ui.label_generatedImage
+
+        def _on_loaded(pixmap: QPixmap) -> None:
+            if self._shown_image_path == image_path:    # 그 사이 다른 이미지가 표시되지 않았을 때만
+                self._display_pixmap_on_label(pixmap)
+
+        get_asset_loader().request(image_path, label.size(), label.devicePixelRatioF(), _on_loaded, mode="fit")
     
     def _show_placeholder_text(self) -> None:
         """플레이스홀더 텍스트를 표시합니다."""
+        self._shown_image_path = None
         self.ui.label_generatedImage.clear()
         self.ui.label_generatedImage.setText("🎨 Generated image will appear here")
         self.ui.label_generatedImage.setAlignment(Qt.AlignmentFlag.AlignCenter)
 
 
+    # ------------- Narration -------------------------------------------------
+    def _narrate_last_segment(self, text: str) -> None:
+        if self.speech_service is None:
+            return
+        page_idx = len(self.story_pages_list) - 1
+        row = len(self.story_pages_list[page_idx]) - 1
+        uid = self.speech_service.speak(text)
+        if uid:
+            self._narration_rows[uid] = (page_idx, row)
+
+    def read_page(self, page_idx: int) -> None:
+        """페이지 전체 낭독. 완성된 페이지는 캐시된 오디오 파일로 즉시 재생됨."""
+        if self.speech_service is None or not (0 <= page_idx < len(self.story_pages_list)):
+            return
+        self.speech_service.stop()
+        self.speech_service.speak(self._page_text(page_idx))
+
+    def _page_text(self, page_idx: int) -> str:
+        return " ".join(seg.strip() for seg in self.story_pages_list[page_idx])
+
+    def _on_narration_sentence(self, uid: int, sentence_idx: int, sentence: str) -> None:
+        """읽고 있는 문단을 스토리 창에서 선택 표시 (read-along)."""
+        page_idx, row = self._narration_rows.get(uid, (None, None))
+        model = self.ui.chatList_2.model()
+        if page_idx == self.current_page_idx and model is not None and row < model.rowCount():
+            self.ui.chatList_2.setCurrentIndex(model.index(row))
+
+    def _on_narration_finished(self, uid: int, completed: bool) -> None:
+        self._narration_rows.pop(uid, None)
+        self.ui.chatList_2.clearSelection()
+
     # ------------- Helpers ---------------------------------------------------
     def _append_to_story(self, segment: str) -> None:
         self.story_parts.append(segment)
         self._add_to_story_pages_list(segment)
-        print(f"self.story_pages_list: {self.story_pages_list}")
     
     def _add_to_story_pages_list(self, segment: str, num_page_segment: int = 4) -> None:
         """
@@ -209,6 +384,7 @@ class MainApp(QMainWindow):
         # If no pages exist yet, create the first one with this segment.
         if not self.story_pages_list:
             self.story_pages_list.append([segment])
+            self.storybook.add_segment(0, 0, segment)
             return
 
         # Work with the last (current) page.
@@ -221,9 +397,15 @@ class MainApp(QMainWindow):
         if len(current_page) == num_page_segment:
             # Current page is full → start a new page.
             self.story_pages_list.append([segment])
+            self.storybook.add_segment(last_index + 1, 0, segment)
         else:
             # There is room → append to current page.
             current_page.append(segment)
+            self.storybook.add_segment(last_index, len(current_page) - 1, segment)
+
+        # Page just filled up → pre-render its narration in the background.
+        if len(current_page) == num_page_segment and self.speech_service is not None:
+            self.speech_service.render(self._page_text(last_index))
 
     
     
@@ -239,19 +421,13 @@ class MainApp(QMainWindow):
             QMessageBox.warning(self, "입력 오류", "스토리를 입력해주세요!")
             return
             
-        item = QListWidgetItem(f"사용자: {user_input}")
-        item.setTextAlignment(Qt.AlignmentFlag.AlignLeft)
-        item.setFlags(item.flags() | Qt.ItemFlag.ItemIsEnabled)
-        self.ui.chatList.addItem(item)
+        self.transcript.append("user", user_input)
         
         # AI 응답 (실제로는 AI 모델 호출 예정)
         # 아래 48th line을 주석 해제하고 49th line을 주석처리 하시면 됩니다.
         # ai_response = ask_ai(user_input)
         ai_response = f"AI가 '{user_input}'을 바탕으로 스토리를 계속 만들어갑니다..."
-        ai_item = QListWidgetItem(f"AI: {ai_response}")
-        ai_item.setTextAlignment(Qt.AlignmentFlag.AlignRight)
-        ai_item.setFlags(ai_item.flags() | Qt.ItemFlag.ItemIsEnabled)
-        self.ui.chatList.addItem(ai_item)
+        self.transcript.append("ai", ai_response)
         
         self.story_pages[self.current_page - 1] += f" {user_input}"
         self.update_story_display()
@@ -260,10 +436,121 @@ class MainApp(QMainWindow):
         
     def save_story(self):
         """스토리북 저장 버튼 클릭 시 실행"""
-        QMessageBox.information(self, "저장 완료", "스토리북이 성공적으로 저장되었습니다!")
+        if not self.story_pages_list:
+            QMessageBox.warning(self, "저장 오류", "저장할 스토리가 없습니다!")
+            return
+        # 내용은 매 턴 자동 저장됨 → 제목만 기록하고 디스크로 flush
+        if self.storybook.title is None:
+            self.storybook.set_title(format_helper.first_sentence(self.story_pages_list[0][0]))
+        self.storybook.flush()
+        self.library.upsert_story(self.story_id, self.storybook.path, title=self.storybook.title)
+        QMessageBox.information(self, "저장 완료", f"스토리북이 성공적으로 저장되었습니다!\n{self.storybook.path}")
+
+    def closeEvent(self, event):
+        self.storybook.close()
+        self.library.close()
+        shutdown_asset_loader()
+        stop_metrics()
+        super().closeEvent(event)
+
+    # ------------- Export ----------------------------------------------------
+    def export_story(self) -> None:
+        """완성된 스토리를 PDF/EPUB로 내보내기 (백그라운드, 페이지 단위 스트리밍)."""
+        if not self.story_pages_list:
+            QMessageBox.warning(self, "내보내기 오류", "내보낼 스토리가 없습니다!")
+            return
+        out_path, _ = QFileDialog.getSaveFileName(
+            self, "Export Storybook", f"{self.story_id}.pdf", "PDF (*.pdf);;EPUB (*.epub)")
+        if not out_path:
+            return
+
+        if self.export_controller is None:
+            self.export_controller = ExportController(self._on_export_progress, self._on_export_done)
+        self.export_progress = QProgressDialog("📄 Exporting storybook...", None, 0, len(self.story_pages_list), self)
+        self.export_progress.setWindowModality(Qt.WindowModality.WindowModal)
+        self.export_progress.setMinimumDuration(0)
+        self.export_progress.setValue(0)
+
+        self.export_controller.operate.emit({
+            "pages": [list(page) for page in self.story_pages_list],
+            "page_images": dict(self.page_images),
+            "out_path": out_path,
+            "title": self.storybook.title or format_helper.first_sentence(self.story_pages_list[0][0]),
+        })
+
+    def _on_export_progress(self, done: int, total: int) -> None:
+        if self.export_progress is not None:
+            self.export_progress.setMaximum(total)
+            self.export_progress.setValue(done)
+
+    def _on_export_done(self, payload: dict) -> None:
+        if self.export_progress is not None:
+            self.export_progress.close()
+            self.export_progress = None
+        if payload["type"] == "exported":
+            QMessageBox.information(self, "내보내기 완료", f"스토리북을 내보냈습니다!\n{payload['path']}")
+        else:
+            QMessageBox.critical(self, "내보내기 오류", f"Failed to export storybook:\n{payload['error']}")
+
+    # ------------- Library ---------------------------------------------------
+    def _index_current_page(self) -> None:
+        """현재 페이지 텍스트만 라이브러리 인덱스에 갱신 (턴마다 O(1 page))."""
+        if not self.story_pages_list:
+            return
+        page_idx = len(self.story_pages_list) - 1
+        self.library.upsert_story(
+            self.story_id, self.storybook.path,
+            page_count=len(self.story_pages_list),
+            snippet=self.story_pages_list[0][0].strip(),
+        )
+        self.library.update_page(self.story_id, page_idx, self._page_text(page_idx))
+
+    def open_library(self) -> None:
+        from library_panel import LibraryDialog
+
+        dialog = LibraryDialog(self.library, self)
+        dialog.storyChosen.connect(self.load_story)
+        dialog.exec()
+
+    def load_story(self, path: str) -> None:
+        """저장된 스토리북을 열어 이어서 작성. 블롭(latent 등)은 필요할 때만 읽음."""
+        try:
+            book = Storybook(path)
+            meta = book.meta
+            pages = book.pages
+        except (OSError, ValueError) as e:
+            QMessageBox.critical(self, "열기 오류", f"스토리북을 열 수 없습니다:\n{e}")
+            return
+
+        self.storybook.close()
+        self.story_id = meta.get("story_id") or Path(path).stem
+        self.storybook = StorybookWriter(path, story_id=self.story_id, title=meta.get("title"))
+        self._loaded_book = book
+
+        self.story_pages_list = pages
+        self.story_parts = [seg for page in pages for seg in page]
+        self.chat_controller.worker.story = [seg.strip() for seg in self.story_parts]
+        self.page_images = {p: r["path"] for p, r in book.image_records().items() if r.get("path")}
+        self.page_latents = {}
+        self._has_cover = bool(self.page_images)
+
+        self.transcript.clear()
+        self.page_models.clear()
+        self.transcript.extend(book.chat)
+        self.ui.chatList.scrollToBottom()
+
+        self.current_page_idx = max(0, len(pages) - 1)
+        self.update_page_display()
+        self.update_story_display(self.current_page_idx)
+        if self.current_page_idx in self.page_images:
+            self._display_image_on_label(self.page_images[self.current_page_idx])
+        else:
+            self._show_placeholder_text()
         
     def previous_page(self, event):
         """이전 페이지로 이동"""
+        if self.speech_service is not None:
+            self.speech_service.stop()
         if self.current_page_idx > 0:
             self.current_page_idx -= 1
             self.update_page_display()
@@ -271,6 +558,8 @@ class MainApp(QMainWindow):
             
     def next_page(self, event):
         """다음 페이지로 이동"""
+        if self.speech_service is not None:
+            self.speech_service.stop()
         if self.current_page_idx < self.total_pages - 1:
             self.current_page_idx += 1
             self.update_page_display()
@@ -278,61 +567,13 @@ class MainApp(QMainWindow):
             
     def update_page_display(self):
         """페이지 표시 업데이트"""
-        self.ui.label_page.setText(f"{self.current_page_idx+1}/{self.total_pages}")
-    
-        if self.current_page_idx == 0:
-            self.ui.label_page_prev.setStyleSheet("""
-                QLabel {
-                    color: #666666;
-                    background: rgba(255, 255, 255, 0.05);
-                    border-radius: 20px;
-                    padding: 10px 15px;
-                    min-width: 40px;
-                    min-height: 40px;
-                }
-            """)
-        else:
-            self.ui.label_page_prev.setStyleSheet("""
-                QLabel {
-                    color: #ffffff;
-                    background: rgba(255, 255, 255, 0.1);
-                    border-radius: 20px;
-                    padding: 10px 15px;
-                    min-width: 40px;
-                    min-height: 40px;
-                }
-                QLabel:hover {
-                    background: rgba(255, 255, 255, 0.2);
-                    color: #ffd54f;
-                }
-            """)
-            
-        if self.current_page_idx == (self.total_pages - 1):
-            self.ui.label_page_next.setStyleSheet("""
-                QLabel {
-                    color: #666666;
-                    background: rgba(255, 255, 255, 0.05);
-                    border-radius: 20px;
-                    padding: 10px 15px;
-                    min-width: 40px;
-                    min-height: 40px;
-                }
-            """)
-        else:
-            self.ui.label_page_next.setStyleSheet("""
-                QLabel {
-                    color: #ffffff;
-                    background: rgba(255, 255, 255, 0.1);
-                    border-radius: 20px;
-                    padding: 10px 15px;
-                    min-width: 40px;
-                    min-height: 40px;
-                }
-                QLabel:hover {
-                    background: rgba(255, 255, 255, 0.2);
-                    color: #ffd54f;
-                }
-            """)
+        page_text = f"{self.current_page_idx+1}/{self.total_pages}"
+        if self.ui.label_page.text() != page_text:
+            self.ui.label_page.setText(page_text)
+
+        # 스타일시트는 UI 생성 시 한 번만 설정됨 → 여기서는 상태 프로퍼티만 바꿈
+        self.ui.setNavEnabled(self.ui.label_page_prev, self.current_page_idx != 0)
+        self.ui.setNavEnabled(self.ui.label_page_next, self.current_page_idx != (self.total_pages - 1))
             
     # def update_story_display(self):
     #     """현재 페이지의 스토리 표시 업데이트"""
@@ -358,20 +599,18 @@ class MainApp(QMainWindow):
         if page_idx is None:
 
             page_idx = len(self.story_pages_list) - 1
-            
-        self.ui.chatList_2.clear()
 
-        
-        
+        segments = []
         if page_idx >= 0 and page_idx < len(self.story_pages_list):
-            list_segment = self.story_pages_list[page_idx]
-            if len(list_segment) > 0:
-                for seg in list_segment:                   # already at most 4
-                    item = QListWidgetItem(seg)
-                    item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
-                    # 줄바꿈 추가
-                    item.setFlags(item.flags() | Qt.ItemFlag.ItemIsEnabled)
-                    self.ui.chatList_2.addItem(item)
+            segments = self.story_pages_list[page_idx]      # already at most 4
+
+        # 캐시된 페이지 모델에 변경분만 반영하고, 다른 페이지면 모델만 교체
+        model = self.page_models.model(page_idx, segments)
+        if self.ui.chatList_2.model() is not model:
+            old_selection = self.ui.chatList_2.selectionModel()
+            self.ui.chatList_2.setModel(model)
+            if old_selection is not None:
+                old_selection.deleteLater()
         
 
 if __name__ == "__main__":
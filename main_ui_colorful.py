@@ -1,22 +1,73 @@
 # -*- coding: utf-8 -*-
+import os
 
 from PySide6.QtCore import (QCoreApplication, QMetaObject, Qt)
 from PySide6.QtGui import (QBrush, QColor, QCursor, QFont, QPalette, QPixmap)
 from PySide6.QtWidgets import (QApplication, QFrame, QHBoxLayout, QLabel,
-    QListWidget, QListWidgetItem, QMainWindow, QPushButton,
+    QListView, QListWidget, QListWidgetItem, QMainWindow, QPushButton,
     QSizePolicy, QTextEdit, QVBoxLayout, QWidget)
 
+from asset_loader import BackgroundWidget
+
 class Ui_StoryMakerMainWindow(object):
+    _dpi_ratio = None   # 화면 DPI 배율 (처음 한 번만 계산)
+    _fonts = {}         # (base_size, bold, italic) -> QFont
+
     def _get_relative_font_size(self, base_size):
         """DPI에 따른 상대적 폰트 크기 계산"""
         from PySide6.QtWidgets import QApplication
-        # 시스템 DPI 스케일링 팩터 가져오기
-        app = QApplication.instance()
-        if app:
+        # 시스템 DPI 스케일링 팩터 가져오기 (캐시)
+        if Ui_StoryMakerMainWindow._dpi_ratio is None:
+            app = QApplication.instance()
+            if not app:
+                return base_size
             screen = app.primaryScreen()
-            dpi_ratio = screen.logicalDotsPerInch() / 96.0  # 96 DPI가 기본
-            return max(8, int(base_size * min(dpi_ratio, 1.5)))  # 최대 1.5배까지만 확대
-        return base_size
+            Ui_StoryMakerMainWindow._dpi_ratio = screen.logicalDotsPerInch() / 96.0  # 96 DPI가 기본
+        return max(8, int(base_size * min(Ui_StoryMakerMainWindow._dpi_ratio, 1.5)))  # 최대 1.5배까지만 확대
+
+    def _font(self, base_size, bold=False, italic=False):
+        """DPI 배율이 적용된 Pretendard 폰트 (같은 조합은 한 번만 생성)"""
+        key = (base_size, bold, italic)
+        font = Ui_StoryMakerMainWindow._fonts.get(key)
+        if font is None:
+            font = QFont()
+            font.setFamilies([u"Pretendard"])
+            font.setPointSize(self._get_relative_font_size(base_size))
+            font.setBold(bold)
+            font.setItalic(italic)
+            Ui_StoryMakerMainWindow._fonts[key] = font
+        return QFont(font)
+
+    # 페이지 이동 버튼: 스타일시트는 한 번만 설정하고, 상태는 동적 프로퍼티(navEnabled)로 전환
+    NAV_STYLE = """
+        QLabel {
+            color: #ffffff;
+            background: rgba(255, 255, 255, 0.1);
+            border-radius: 20px;
+            padding: 10px 15px;
+            min-width: 40px;
+            min-height: 40px;
+        }
+        QLabel[navEnabled="true"]:hover {
+            background: rgba(255, 255, 255, 0.2);
+            color: #ffd54f;
+        }
+        QLabel[navEnabled="false"] {
+            color: #666666;
+            background: rgba(255, 255, 255, 0.05);
+        }
+    """
+
+    @staticmethod
+    def setNavEnabled(label, enabled):
+        """navEnabled 프로퍼티가 바뀔 때만 해당 위젯을 다시 polish (CSS 재파싱 없음)"""
+        if label.property("navEnabled") == enabled:
+            return
+        label.setProperty("navEnabled", enabled)
+        style = label.style()
+        style.unpolish(label)
+        style.polish(label)
+        label.update()
     
     def setupUi(self, StoryMakerMainWindow):
         if not StoryMakerMainWindow.objectName():
@@ -33,22 +84,12 @@ class Ui_StoryMakerMainWindow(object):
         palette.setBrush(QPalette.ColorGroup.Disabled, QPalette.ColorRole.Window, brush)
         StoryMakerMainWindow.setPalette(palette)
         
-        self.centralwidget = QWidget(StoryMakerMainWindow)
+        # 배경 이미지는 첫 화면 표시 후 백그라운드 스레드에서 디코딩/스케일 (asset_loader)
+        # 그 전까지는 단색(#55afef)으로 그림
+        self.centralwidget = BackgroundWidget(StoryMakerMainWindow, QColor(85, 175, 240))
         self.centralwidget.setObjectName(u"centralwidget")
-        try:
-            background_pixmap = QPixmap('assets/image/background.png')
-            if not background_pixmap.isNull():
-                # 배경색 설정
-                palette = QPalette()
-                brush = QBrush(background_pixmap)
-                brush.setStyle(Qt.BrushStyle.TexturePattern)
-                palette.setBrush(QPalette.ColorRole.Window, brush)
-                self.centralwidget.setPalette(palette)
-                self.centralwidget.setAutoFillBackground(True)
-            else:
-                self.centralwidget.setStyleSheet("background-color: #55afef;")
-        except:
-            self.centralwidget.setStyleSheet("background-color: #55afef;")
+        if os.path.exists('assets/image/background.png'):
+            self.centralwidget.setBackgroundImage('assets/image/background.png')
         
         self.mainLayout = QHBoxLayout(self.centralwidget)
         self.mainLayout.setContentsMargins(20, 20, 20, 20)
@@ -77,10 +118,7 @@ class Ui_StoryMakerMainWindow(object):
         
         self.label_title = QLabel(self.leftFrame)
         self.label_title.setObjectName(u"label_title")
-        font_title = QFont()
-        font_title.setFamilies([u"Pretendard"])
-        font_title.setPointSize(self._get_relative_font_size(22))
-        font_title.setBold(True)
+        font_title = self._font(22, bold=True)
         self.label_title.setFont(font_title)
         self.label_title.setStyleSheet("""
             QLabel {
@@ -98,15 +136,16 @@ class Ui_StoryMakerMainWindow(object):
         self.leftLayout.addWidget(self.label_title)
         
         # 채팅
-        self.chatList = QListWidget(self.leftFrame)
+        # 채팅 기록은 모델/델리게이트로 그림 (transcript_panel.TranscriptModel)
+        self.chatList = QListView(self.leftFrame)
         self.chatList.setObjectName(u"chatList")
-        self.chatList.setWordWrap(True)  # 줄바꿈 활성화
-        font_chat = QFont()
-        font_chat.setFamilies([u"Pretendard"])
-        font_chat.setPointSize(self._get_relative_font_size(14))  # 폰트 크기 증가
+        self.chatList.setUniformItemSizes(True)  # 모든 행 높이 동일 → 스크롤 O(1)
+        self.chatList.setVerticalScrollMode(QListView.ScrollMode.ScrollPerPixel)
+        self.chatList.setMouseTracking(True)      # hover 표시
+        font_chat = self._font(14)  # 폰트 크기 증가
         self.chatList.setFont(font_chat)
         self.chatList.setStyleSheet("""
-            QListWidget {
+            QListView {
                 background: rgba(255, 255, 255, 0.8);
                 border: 1px solid rgba(255, 255, 255, 0.3);
                 border-radius: 12px;
@@ -114,22 +153,6 @@ class Ui_StoryMakerMainWindow(object):
                 color: #333333;
                 font-size: 14px;
             }
-            QListWidget::item {
-                padding: 12px 15px;
-                margin: 4px 0px;
-                border-radius: 8px;
-                background: rgba(90, 119, 236, 0.1);
-                border: 1px solid rgba(90, 119, 236, 0.2);
-                line-height: 1.4;
-            }
-            QListWidget::item:hover {
-                background: rgba(90, 119, 236, 0.2);
-                border-color: rgba(90, 119, 236, 0.4);
-            }
-            QListWidget::item:selected {
-                background: rgba(90, 119, 236, 0.3);
-                border-color: rgba(90, 119, 236, 0.5);
-            }
         """)
         self.chatList.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Expanding)
         self.leftLayout.addWidget(self.chatList)
@@ -138,9 +161,7 @@ class Ui_StoryMakerMainWindow(object):
         self.textEdit_childStory.setObjectName(u"textEdit_childStory")
         self.textEdit_childStory.setMaximumHeight(120)  # 높이 증가
         self.textEdit_childStory.setLineWrapMode(QTextEdit.LineWrapMode.WidgetWidth)  # 줄바꿈 설정
-        font_input = QFont()
-        font_input.setFamilies([u"Pretendard"])
-        font_input.setPointSize(self._get_relative_font_size(14))  # 폰트 크기 증가
+        font_input = self._font(14)  # 폰트 크기 증가
         self.textEdit_childStory.setFont(font_input)
         self.textEdit_childStory.setStyleSheet("""
             QTextEdit {
@@ -162,10 +183,7 @@ class Ui_StoryMakerMainWindow(object):
         
         self.btnContinueStory = QPushButton(self.leftFrame)
         self.btnContinueStory.setObjectName(u"btnContinueStory")
-        font_btn = QFont()
-        font_btn.setFamilies([u"Pretendard"])
-        font_btn.setPointSize(self._get_relative_font_size(16))
-        font_btn.setBold(True)
+        font_btn = self._font(16, bold=True)
         self.btnContinueStory.setFont(font_btn)
         self.btnContinueStory.setMinimumHeight(50)
         self.btnContinueStory.setStyleSheet("""
@@ -217,27 +235,10 @@ class Ui_StoryMakerMainWindow(object):
         
         self.label_page_prev = QLabel(self.rightFrame)
         self.label_page_prev.setObjectName(u"label_page_prev")
-        font_nav = QFont()
-        font_nav.setFamilies([u"Pretendard"])
-        font_nav.setPointSize(self._get_relative_font_size(18))
-        font_nav.setBold(True)
+        font_nav = self._font(18, bold=True)
         self.label_page_prev.setFont(font_nav)
-        self.label_page_prev.setStyleSheet("""
-            QLabel {
-                color: #ffffff;
-                background: rgba(255, 255, 255, 0.2);
-                border: 1px solid rgba(255, 255, 255, 0.3);
-                border-radius: 12px;
-                padding: 4px 16px;
-                max-height: 35px;
-                min-height: 35px;
-                font-weight: bold;
-            }
-            QLabel:hover {
-                background: rgba(255, 255, 255, 0.3);
-                border-color: rgba(255, 255, 255, 0.5);
-            }
-        """)
+        self.label_page_prev.setProperty("navEnabled", True)
+        self.label_page_prev.setStyleSheet(self.NAV_STYLE)
         self.label_page_prev.setAlignment(Qt.AlignmentFlag.AlignCenter)
         self.label_page_prev.setCursor(QCursor(Qt.CursorShape.PointingHandCursor))
         self.label_page_prev.setText("‹")
@@ -245,10 +246,7 @@ class Ui_StoryMakerMainWindow(object):
         
         self.label_page = QLabel(self.rightFrame)
         self.label_page.setObjectName(u"label_page")
-        font_page = QFont()
-        font_page.setFamilies([u"Pretendard"])
-        font_page.setPointSize(self._get_relative_font_size(16))
-        font_page.setBold(True)
+        font_page = self._font(16, bold=True)
         self.label_page.setFont(font_page)
         self.label_page.setStyleSheet("""
             QLabel {
@@ -269,22 +267,8 @@ class Ui_StoryMakerMainWindow(object):
         self.label_page_next = QLabel(self.rightFrame)
         self.label_page_next.setObjectName(u"label_page_next")
         self.label_page_next.setFont(font_nav)
-        self.label_page_next.setStyleSheet("""
-            QLabel {
-                color: #ffffff;
-                background: rgba(255, 255, 255, 0.2);
-                border: 1px solid rgba(255, 255, 255, 0.3);
-                border-radius: 12px;
-                padding: 4px 16px;
-                max-height: 35px;
-                min-height: 35px;
-                font-weight: bold;
-            }
-            QLabel:hover {
-                background: rgba(255, 255, 255, 0.3);
-                border-color: rgba(255, 255, 255, 0.5);
-            }
-        """)
+        self.label_page_next.setProperty("navEnabled", True)
+        self.label_page_next.setStyleSheet(self.NAV_STYLE)
         self.label_page_next.setAlignment(Qt.AlignmentFlag.AlignCenter)
         self.label_page_next.setCursor(QCursor(Qt.CursorShape.PointingHandCursor))
         self.label_page_next.setText("›")
@@ -297,10 +281,7 @@ class Ui_StoryMakerMainWindow(object):
         self.label_generatedImage.setMinimumSize(350, 260)
         self.label_generatedImage.setMaximumHeight(320)
         self.label_generatedImage.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed)
-        font_img = QFont()
-        font_img.setFamilies([u"Pretendard"])
-        font_img.setPointSize(self._get_relative_font_size(18))
-        font_img.setBold(True)
+        font_img = self._font(18, bold=True)
         self.label_generatedImage.setFont(font_img)
         self.label_generatedImage.setStyleSheet("""
             QLabel {
@@ -318,16 +299,15 @@ class Ui_StoryMakerMainWindow(object):
         self.label_generatedImage.setText("🎨 Generated image will appear here")
         self.rightLayout.addWidget(self.label_generatedImage)
         
-        self.chatList_2 = QListWidget(self.rightFrame)
+        # 스토리 페이지는 페이지별 모델로 표시 (story_panel.StoryPageCache)
+        self.chatList_2 = QListView(self.rightFrame)
         self.chatList_2.setObjectName(u"chatList_2")
         self.chatList_2.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Expanding)
         self.chatList_2.setWordWrap(True)  
-        font_story_list = QFont()
-        font_story_list.setFamilies([u"Pretendard"])
-        font_story_list.setPointSize(self._get_relative_font_size(16))  # 폰트 크기 증가
+        font_story_list = self._font(16)  # 폰트 크기 증가
         self.chatList_2.setFont(font_story_list)
         self.chatList_2.setStyleSheet("""
-            QListWidget {
+            QListView {
                 background: qlineargradient(x1:0, y1:0, x2:0, y2:1,
                     stop:0 rgba(255, 255, 255, 0.15),
                     stop:1 rgba(255, 255, 255, 0.05));
@@ -338,7 +318,7 @@ class Ui_StoryMakerMainWindow(object):
                 font-size: 16px;
                 font-weight: 500;
             }
-            QListWidget::item {
+            QListView::item {
                 padding: 18px 25px;
                 margin: 6px 0px;
                 border-radius: 10px;
@@ -346,33 +326,23 @@ class Ui_StoryMakerMainWindow(object):
                 border: 1px solid rgba(255, 255, 255, 0.2);
                 line-height: 1.5;
             }
-            QListWidget::item:hover {
+            QListView::item:hover {
                 background: rgba(255, 255, 255, 0.2);
                 border-color: rgba(255, 255, 255, 0.4);
             }
         """)
         
-        font_story = QFont()
-        font_story.setFamilies([u"Pretendard"])
-        font_story.setPointSize(self._get_relative_font_size(18))
-        font_story.setBold(True)
-        font_story.setItalic(True)
-        item = QListWidgetItem(self.chatList_2)
-        item.setText("🌟 Once upon a time...")
-        item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
-        item.setFont(font_story)
-        item.setForeground(QBrush(QColor(255, 255, 255, 255)))
-        item.setFlags(item.flags() | Qt.ItemFlag.ItemIsEnabled)
+        # 빈 페이지에 표시되는 문구 (story_panel.StoryPageModel placeholder)
+        font_story = self._font(18, bold=True, italic=True)
+        self.storyPlaceholderFont = font_story
+        self.storyPlaceholderText = "🌟 Once upon a time..."
         
         self.rightLayout.addWidget(self.chatList_2)
         
         self.btnSaveStory = QPushButton(self.rightFrame)
         self.btnSaveStory.setObjectName(u"btnSaveStory")
         self.btnSaveStory.setMinimumHeight(60)
-        font_save = QFont()
-        font_save.setFamilies([u"Pretendard"])
-        font_save.setPointSize(self._get_relative_font_size(18))
-        font_save.setBold(True)
+        font_save = self._font(18, bold=True)
         self.btnSaveStory.setFont(font_save)
         self.btnSaveStory.setCursor(QCursor(Qt.CursorShape.PointingHandCursor))
         self.btnSaveStory.setStyleSheet("""
@@ -400,7 +370,42 @@ class Ui_StoryMakerMainWindow(object):
             }
         """)
         self.btnSaveStory.setText("💾 Save Storybook")
-        self.rightLayout.addWidget(self.btnSaveStory)
+
+        self.btnLibrary = QPushButton(self.rightFrame)
+        self.btnLibrary.setObjectName(u"btnLibrary")
+        self.btnLibrary.setMinimumHeight(60)
+        self.btnLibrary.setFont(font_save)
+        self.btnLibrary.setCursor(QCursor(Qt.CursorShape.PointingHandCursor))
+        self.btnLibrary.setStyleSheet("""
+            QPushButton {
+                background: rgba(255, 255, 255, 0.2);
+                color: white;
+                font-weight: bold;
+                border: 2px solid rgba(255, 255, 255, 0.3);
+                border-radius: 16px;
+                padding: 15px 20px;
+            }
+            QPushButton:hover {
+                background: rgba(255, 255, 255, 0.3);
+                border-color: rgba(255, 255, 255, 0.5);
+            }
+        """)
+        self.btnLibrary.setText("📚 Library")
+
+        self.btnExport = QPushButton(self.rightFrame)
+        self.btnExport.setObjectName(u"btnExport")
+        self.btnExport.setMinimumHeight(60)
+        self.btnExport.setFont(font_save)
+        self.btnExport.setCursor(QCursor(Qt.CursorShape.PointingHandCursor))
+        self.btnExport.setStyleSheet(self.btnLibrary.styleSheet())
+        self.btnExport.setText("📄 Export")
+
+        self.bottomLayout = QHBoxLayout()
+        self.bottomLayout.setSpacing(15)
+        self.bottomLayout.addWidget(self.btnLibrary, 1)
+        self.bottomLayout.addWidget(self.btnExport, 1)
+        self.bottomLayout.addWidget(self.btnSaveStory, 2)
+        self.rightLayout.addLayout(self.bottomLayout)
         
         self.mainLayout.addWidget(self.rightFrame)
         
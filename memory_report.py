@@ -0,0 +1,82 @@
+# memory_report.py
+"""
+Peak RSS / latency report for each StableV15Engine memory mode.
+
+Every mode runs in its own subprocess so that peak RSS is not polluted by
+the previous mode.
+
+    python memory_report.py                      # all modes
+    python memory_report.py --modes default low --images 3 --steps 20
+"""
+import argparse
+import json
+import subprocess
+import sys
+import time
+
+PROMPT = "A brave prince rides a white horse through a magic forest. children's picture book"
+
+
+def run_child(mode: str, images: int, steps: int) -> None:
+    from stable_engine import StableV15Engine
+    from core.resource_usage import peak_rss_mb
+
+    t0 = time.perf_counter()
+    engine = StableV15Engine(memory_mode=mode)
+    load_s = time.perf_counter() - t0
+    load_rss = peak_rss_mb()
+
+    latencies = []
+    for i in range(images):
+        t0 = time.perf_counter()
+        engine.generate_image(PROMPT, num_inference_steps=steps, seed=i)
+        latencies.append(time.perf_counter() - t0)
+
+    print(json.dumps({
+        "mode": mode,
+        "dtype": str(engine.dtype).replace("torch.", ""),
+        "load_s": load_s,
+        "load_peak_rss_mb": load_rss,
+        "first_image_s": latencies[0] if latencies else None,
+        "mean_image_s": sum(latencies) / len(latencies) if latencies else None,
+        "peak_rss_mb": peak_rss_mb(),
+    }))
+
+
+def main() -> None:
+    from stable_engine import MEMORY_MODES
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", nargs="+", default=list(MEMORY_MODES))
+    parser.add_argument("--images", type=int, default=2)
+    parser.add_argument("--steps", type=int, default=20)
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.images, args.steps)
+        return
+
+    rows = []
+    for mode in args.modes:
+        print(f"[memory_report] running mode '{mode}' ...", flush=True)
+        proc = subprocess.run(
+            [sys.executable, __file__, "--child", mode,
+             "--images", str(args.images), "--steps", str(args.steps)],
+            capture_output=True, text=True,
+        )
+        lines = [l for l in proc.stdout.splitlines() if l.startswith("{")]
+        if proc.returncode != 0 or not lines:
+            print(f"[memory_report] mode '{mode}' failed:\n{proc.stderr[-2000:]}")
+            continue
+        rows.append(json.loads(lines[-1]))
+
+    print()
+    print(f"{'mode':<10} {'dtype':<9} {'load s':>8} {'1st img s':>10} {'mean img s':>11} {'peak RSS MB':>12}")
+    for r in rows:
+        print(f"{r['mode']:<10} {r['dtype']:<9} {r['load_s']:>8.1f} "
+              f"{r['first_image_s']:>10.1f} {r['mean_image_s']:>11.1f} {r['peak_rss_mb']:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
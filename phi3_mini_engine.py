@@ -1,13 +1,78 @@
+# ── stdlib
+import threading
+import time
+from typing import List
+
 # ── Transformers / Torch
 import torch
 from transformers import AutoTokenizer, AutoModelForCausalLM
+from transformers.generation.streamers import BaseStreamer, TextIteratorStreamer
+
+from core.metrics import get_metrics
+from core.prompt_cache import PromptCache
+from core.profiling import profiled
+from core.tracing import get_tracer
+
+
+class _GenerationTimer(BaseStreamer):
+    """
+    Streamer that only takes timestamps: generate() first puts the prompt
+    ids, then each new token, so the first token marks the end of prefill.
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.first_token = None
+        self.end_time = None
+        self.new_tokens = 0
+        self._prompt_seen = False
+
+    def put(self, value):
+        if not self._prompt_seen:
+            self._prompt_seen = True
+            return
+        if self.first_token is None:
+            self.first_token = time.perf_counter()
+        self.new_tokens += value.numel()
+
+    def end(self):
+        self.end_time = time.perf_counter()
+
+
+class _BatchTextStreamer(_GenerationTimer):
+    """
+    Timing streamer for a batched generate(): also decodes each row's new
+    tokens and passes the new text to *on_text(row, piece)*.
+    """
+
+    def __init__(self, tokenizer, rows: int, on_text=None):
+        super().__init__()
+        self.tokenizer = tokenizer
+        self.on_text = on_text
+        self.ids = [[] for _ in range(rows)]
+        self.sent = [0] * rows
+
+    def put(self, value):
+        prompt = not self._prompt_seen
+        super().put(value)
+        if prompt or self.on_text is None:
+            return
+        for row, token in enumerate(value.reshape(len(self.ids), -1)[:, -1].tolist()):
+            self.ids[row].append(token)
+            text = self.tokenizer.decode(self.ids[row], skip_special_tokens=True)
+            if text.endswith("\ufffd"):      # incomplete multi-byte character
+                continue
+            if len(text) > self.sent[row]:
+                self.on_text(row, text[self.sent[row]:])
+                self.sent[row] = len(text)
 
 
 # ── LLM Engine (new) ────────────────────────────────────────────────
 class Phi3MiniEngine:
     """Owns the tokenizer/model and exposes generate_reply()."""
 
-    def __init__(self, model_name: str = "microsoft/Phi-3-mini-128k-instruct"):
+    def __init__(self, model_name: str = "microsoft/Phi-3-mini-128k-instruct", *,
+                 prompt_cache: bool = True, prompt_cache_verify: int = 50):
         from transformers import AutoTokenizer, AutoModelForCausalLM
         import torch
 
@@ -20,30 +85,140 @@ class Phi3MiniEngine:
 
         # expose eos once
         self.EOS_ID = self.tokenizer.eos_token_id or self.tokenizer.convert_tokens_to_ids("<|end|>")
+        # Memoized chat template + cached token ids of constant / grown prompt pieces
+        self.prompts = PromptCache(self.tokenizer, enabled=prompt_cache, verify_every=prompt_cache_verify)
+
+    def compile(self, mode: str = "default") -> None:
+        """torch.compile the model forward; graphs are built on the first calls (core.warmup)."""
+        self.model.forward = torch.compile(self.model.forward, mode=mode, dynamic=True)
 
     def build_prompt(self, messages):
-        if hasattr(self.tokenizer, "apply_chat_template"):
-            return self.tokenizer.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
-        parts = [f"<|{m['role']}|>\n{m['content']}<|end|>" for m in messages]
-        parts.append("<|assistant|>\n")
-        return "\n".join(parts)
+        return self.prompts.render(messages)
+
+    def _encode(self, messages):
+        with get_tracer().span("tokenize") as span:
+            ids = self.prompts.encode(messages)
+            enc = {
+                "input_ids": torch.tensor([ids], device=self.model.device),
+                "attention_mask": torch.ones(1, len(ids), dtype=torch.long, device=self.model.device),
+            }
+            span.set(prompt_tokens=len(ids), cached_tokens=self.prompts.last_cached_tokens)
+        return enc
 
+    @profiled("llm_generate")
     @torch.inference_mode()
     def generate_reply(self, messages, *, max_new_tokens: int = 128):
-        prompt = self.build_prompt(messages)
-        enc = self.tokenizer(prompt, return_tensors="pt")
-        enc = {k: v.to(self.model.device) for k, v in enc.items()}
+        tracer = get_tracer()
+        enc = self._encode(messages)
 
+        # Timing streamer only when tracing (generate() is untouched otherwise)
+        timer = _GenerationTimer() if tracer.enabled else None
         out_ids = self.model.generate(
             **enc,
             max_new_tokens=max_new_tokens,
             do_sample=False,
             eos_token_id=self.EOS_ID,
             pad_token_id=self.tokenizer.pad_token_id or self.EOS_ID,
+            streamer=timer,
         )
+        if timer is not None and timer.first_token is not None:
+            end = timer.end_time or time.perf_counter()
+            decode_s = end - timer.first_token
+            tracer.record("prefill", (timer.first_token - timer.start) * 1000,
+                          prompt_tokens=int(enc["input_ids"].shape[1]))
+            tracer.record("decode", decode_s * 1000, tokens=timer.new_tokens,
+                          tokens_per_s=round(timer.new_tokens / decode_s, 2) if decode_s > 0 else None)
         gen = out_ids[0][enc["input_ids"].shape[1]:]
-        reply = self.tokenizer.decode(gen, skip_special_tokens=True)
+        get_metrics().counter("llm_tokens_total", "Generated tokens").inc(len(gen))
+        return self._clean_reply(self.tokenizer.decode(gen, skip_special_tokens=True))
+
+    @staticmethod
+    def _clean_reply(reply: str) -> str:
         for tag in ("<|assistant|>", "<|end|>"):
             if tag in reply:
                 reply = reply.split(tag)[0]
         return reply.strip()
+
+    @profiled("llm_batch")
+    @torch.inference_mode()
+    def generate_batch(self, batch_messages, *, max_new_tokens: int = 128, on_text=None):
+        """
+        One left-padded generate() call for several conversations (server
+        batching).  *on_text(row, piece)* receives each row's text as it is
+        decoded.  Returns one reply per conversation.
+        """
+        tracer = get_tracer()
+        with tracer.span("tokenize", batch=len(batch_messages)) as span:
+            if self.tokenizer.pad_token is None:
+                self.tokenizer.pad_token = self.tokenizer.eos_token
+            rows = [self.prompts.encode(m) for m in batch_messages]
+            width = max(len(ids) for ids in rows)
+            pad = self.tokenizer.pad_token_id
+            # Left padding: every row's prompt ends where generation starts
+            enc = {
+                "input_ids": torch.tensor([[pad] * (width - len(ids)) + ids for ids in rows],
+                                          device=self.model.device),
+                "attention_mask": torch.tensor([[0] * (width - len(ids)) + [1] * len(ids) for ids in rows],
+                                               device=self.model.device),
+            }
+            span.set(prompt_tokens=int(enc["attention_mask"].sum()))
+
+        streamer = _BatchTextStreamer(self.tokenizer, len(rows), on_text)
+        out_ids = self.model.generate(
+            **enc,
+            max_new_tokens=max_new_tokens,
+            do_sample=False,
+            eos_token_id=self.EOS_ID,
+            pad_token_id=self.tokenizer.pad_token_id or self.EOS_ID,
+            streamer=streamer,
+        )
+        if streamer.first_token is not None:
+            end = streamer.end_time or time.perf_counter()
+            decode_s = end - streamer.first_token
+            tracer.record("prefill", (streamer.first_token - streamer.start) * 1000,
+                          prompt_tokens=int(enc["attention_mask"].sum()), batch=len(rows))
+            tracer.record("decode", decode_s * 1000, tokens=streamer.new_tokens, batch=len(rows),
+                          tokens_per_s=round(streamer.new_tokens / decode_s, 2) if decode_s > 0 else None)
+        gen = out_ids[:, enc["input_ids"].shape[1]:]
+        get_metrics().counter("llm_tokens_total", "Generated tokens").inc(int((gen != self.tokenizer.pad_token_id).sum()))
+        return [self._clean_reply(text) for text in self.tokenizer.batch_decode(gen, skip_special_tokens=True)]
+
+    @profiled("llm_stream")
+    def stream_reply(self, messages, *, max_new_tokens: int = 128):
+        """Same generation as generate_reply(), yielding decoded text pieces as they arrive."""
+        enc = self._encode(messages)
+        streamer = TextIteratorStreamer(self.tokenizer, skip_prompt=True, skip_special_tokens=True)
+        failure: List[BaseException] = []
+
+        @torch.inference_mode()
+        def _run():
+            try:
+                out_ids = self.model.generate(
+                    **enc,
+                    max_new_tokens=max_new_tokens,
+                    do_sample=False,
+                    eos_token_id=self.EOS_ID,
+                    pad_token_id=self.tokenizer.pad_token_id or self.EOS_ID,
+                    streamer=streamer,
+                )
+            except BaseException as e:
+                # Unblock the consumer; the error is re-raised there after join()
+                failure.append(e)
+                streamer.end()
+                return
+            get_metrics().counter("llm_tokens_total", "Generated tokens").inc(
+                out_ids.shape[1] - enc["input_ids"].shape[1])
+
+        thread = threading.Thread(target=_run, name="phi3-stream", daemon=True)
+        thread.start()
+        try:
+            for piece in streamer:
+                for tag in ("<|assistant|>", "<|end|>"):
+                    if tag in piece:
+                        piece = piece.split(tag)[0]
+                if piece:
+                    yield piece
+        finally:
+            thread.join()
+        if failure:
+            raise failure[0]
@@ -0,0 +1,523 @@
+# server.py
+"""
+Classroom server: one machine loads the models, tablets connect as clients.
+
+    python server.py                 # engines from config.yaml (llm / image)
+    python server.py --stub          # fake engines, no weights (try it out / load tests)
+
+HTTP
+    GET    /health                   session, queue (depth / wait p50, p95) and batch stats
+    GET    /metrics                  Prometheus text format (core.metrics)
+    POST   /sessions                 {"story": [...]}? → {"session_id": ...}   (503 when full)
+    GET    /sessions/{id}            story, pages, illustration URLs and seeds
+    DELETE /sessions/{id}
+    POST   /sessions/{id}/turns      {"text": ...} → {"events": [...]}          (no streaming)
+    GET    /images/{name}            finished illustrations (PNG)
+
+WebSocket  GET /sessions/{id}/ws
+    client → {"type": "submit", "text": ...}
+    server → StoryEvent payloads (token, story_line, ai_suggestion,
+             chat_answer, error), then turn_done; queued / merged when
+             the input waits behind the running turn, busy when the
+             session's queue is full; image_progress / image_ready /
+             image_skipped / image_error for page illustrations.
+
+All sessions share one LLM (requests are batched by core.batching.LLMBatcher)
+and one image engine, behind core.session_scheduler.SessionScheduler (fair
+per-session queues, chat before illustrations).  Settings: ``server`` and
+``queue`` in config.yaml.
+"""
+import argparse
+import asyncio
+import random
+import secrets
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+from aiohttp import WSMsgType, web
+
+import format_helper
+from config.config_loader import load_config
+from core.batching import LLMBatcher
+from core.cpu_budget import apply_cpu_budget, load_cpu_budget
+from core.cpu_scheduler import get_cpu_scheduler
+from core.metrics import get_metrics, start_metrics, stop_metrics
+from core.session_scheduler import MERGE, QueueFull, SessionScheduler, Superseded, TurnQueue
+from core.story_session import StoryEvent, StorySession
+from core.tracing import get_tracer
+from core.warmup import prepare_engine
+
+NUM_PAGE_SEGMENT = 4      # same paging as MainApp: 4 segments per page
+ILLUSTRATE_AT = 2         # illustrate a page once it has its 2nd segment
+
+
+# ════════════════════════════════════════════════════════════════════
+# ImageService (one shared diffusion engine)
+# ════════════════════════════════════════════════════════════════════
+class ImageService:
+    """
+    Renders page illustrations on the scheduler's ``image`` lane (one at
+    a time, after waiting chat calls).  A session's newer illustration
+    supersedes its older queued one rather than piling up behind it.
+    """
+
+    def __init__(self, engine, images_dir: Path, scheduler: SessionScheduler, *, steps: int = 20):
+        self.engine = engine
+        self.images_dir = images_dir
+        self.scheduler = scheduler
+        self.steps = steps
+        self.images_dir.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def apply_budget() -> None:
+        """Image-lane thread initializer: the diffusion CPU budget."""
+        budget = load_cpu_budget("diffusion")
+        apply_cpu_budget(budget["threads"], budget["cores"], workload="diffusion")
+
+    async def generate(self, prompt: str, name: str, *, session_id: str, seed: int,
+                       turn_id: Optional[str], on_step=None) -> str:
+        """
+        Render *prompt* to ``images_dir/name``; *on_step(done, total)* runs on
+        the loop.  Raises Superseded / QueueFull when the job was dropped.
+        """
+        loop = asyncio.get_running_loop()
+        steps = self.steps
+
+        def _progress(pipe, step_index, timestep, callback_kwargs):
+            if on_step is not None:
+                loop.call_soon_threadsafe(on_step, step_index + 1, steps)
+            return callback_kwargs
+
+        def _render():
+            callback = _progress
+            scheduler = get_cpu_scheduler()
+            if scheduler is not None:
+                pause = scheduler.diffusion_step_callback()
+
+                def callback(pipe, step_index, timestep, callback_kwargs):
+                    return _progress(pipe, step_index, timestep, pause(pipe, step_index, timestep, callback_kwargs))
+
+            with get_tracer().span("diffusion", turn_id, steps=steps):
+                image, _ = self.engine.generate_image_with_latents(
+                    prompt, seed=seed, num_inference_steps=steps, callback_on_step_end=callback)
+            path = self.images_dir / name
+            self.engine.save_image(image, path)
+            return path.name
+
+        metrics = get_metrics()
+        t0 = time.perf_counter()
+        try:
+            name = await self.scheduler(_render, session_id=session_id, kind="image",
+                                        merge_key=name, turn_id=turn_id)
+        except (QueueFull, Superseded):
+            metrics.counter("images_total", "Illustrations by status").inc(status="skipped")
+            raise
+        except Exception:
+            metrics.counter("images_total", "Illustrations by status").inc(status="error")
+            metrics.counter("errors_total", "Failures by where they happened").inc(where="image")
+            raise
+        metrics.counter("images_total", "Illustrations by status").inc(status="ok")
+        metrics.histogram("image_seconds", "Illustration latency").observe(time.perf_counter() - t0)
+        return name
+
+    async def warm_up(self):
+        """Dummy illustration on the image lane (config ``warmup``); returns cold/warm timings."""
+        def _run():
+            scheduler = get_cpu_scheduler()
+            extra = {}
+            if scheduler is not None:
+                extra["callback_on_step_end"] = scheduler.diffusion_step_callback()
+            return prepare_engine(self.engine, "image", **extra)
+
+        return await self.scheduler(_run, session_id="warmup", kind="image")
+
+
+# ════════════════════════════════════════════════════════════════════
+# ClassroomSession
+# ════════════════════════════════════════════════════════════════════
+class ClassroomSession:
+    """A StorySession plus its pages, illustrations and connected sockets."""
+
+    def __init__(self, session_id: str, story: StorySession, inputs: TurnQueue):
+        self.session_id = session_id
+        self.story = story
+        self.inputs = inputs                     # inputs typed while a turn runs
+        self.pages: List[List[str]] = []
+        self.images: Dict[int, str] = {}         # page_idx → image name
+        self.seeds: Dict[int, int] = {}          # page_idx → illustration seed
+        self.sockets: Set[web.WebSocketResponse] = set()
+        self.busy = False                        # one turn at a time per child
+        self.last_active = time.monotonic()
+
+    def add_segment(self, text: str) -> Optional[int]:
+        """Append to the current page; returns the page index when it should be illustrated."""
+        if not self.pages or len(self.pages[-1]) == NUM_PAGE_SEGMENT:
+            self.pages.append([])
+        self.pages[-1].append(text)
+        if len(self.pages[-1]) == ILLUSTRATE_AT:
+            return len(self.pages) - 1
+        return None
+
+    async def broadcast(self, payload: dict) -> None:
+        for ws in list(self.sockets):
+            try:
+                await ws.send_json(payload)
+            except (ConnectionError, RuntimeError):
+                self.sockets.discard(ws)
+
+    def to_json(self) -> dict:
+        return {
+            "session_id": self.session_id,
+            "story": self.story.story,
+            "pages": self.pages,
+            "images": {str(k): f"/images/{v}" for k, v in self.images.items()},
+            "seeds": {str(k): v for k, v in self.seeds.items()},
+        }
+
+
+# ════════════════════════════════════════════════════════════════════
+# StoryServer
+# ════════════════════════════════════════════════════════════════════
+class StoryServer:
+    """
+    Session registry in front of a SessionScheduler.  At most
+    *max_sessions* sessions; each runs one turn at a time and queues up
+    to ``queue.depth`` more inputs (overflow: merge into the last one or
+    answer ``busy``).  Engine calls from all sessions are fair-queued,
+    chat before illustrations.
+    """
+
+    def __init__(self, llm, image_engine, cfg: dict, queue_cfg: Optional[dict] = None):
+        self.cfg = cfg
+        self.queue_cfg = queue_cfg or {}
+        self.llm = LLMBatcher(llm, max_batch=cfg.get("batch_size", 4),
+                              window_ms=cfg.get("batch_window_ms", 20))
+        self.max_sessions = cfg.get("max_sessions", 30)
+        # chat_slots concurrent LLM calls, so they can meet in one batch
+        self.scheduler = SessionScheduler(
+            chat_slots=cfg.get("chat_slots", 4),
+            max_depth=self.queue_cfg.get("depth", 2),
+            policy=self.queue_cfg.get("overflow", MERGE),
+            image_max_wait_s=self.queue_cfg.get("image_max_wait_s", 30),
+            initializers={"image": ImageService.apply_budget},
+        )
+        self.images = None
+        if image_engine is not None:
+            self.images = ImageService(image_engine, Path(cfg.get("images_dir", "cache/server_images")),
+                                       self.scheduler, steps=cfg.get("image_steps", 20))
+        self.sessions: Dict[str, ClassroomSession] = {}
+        self.rejected_turns = 0
+        self.warmup: Dict[str, Optional[dict]] = {}     # engine → cold/warm warm-up timings
+        self._tasks: Set[asyncio.Task] = set()
+
+    # ------------- Sessions -----------------------------------------------------
+    def create_session(self, story: Optional[List[str]] = None) -> Optional[ClassroomSession]:
+        if len(self.sessions) >= self.max_sessions:
+            return None
+        session_id = secrets.token_urlsafe(8)
+        session = ClassroomSession(
+            session_id,
+            StorySession(self.llm, session_id=session_id, runner=self.scheduler, stream_tokens=True, story=story),
+            TurnQueue(self.queue_cfg.get("depth", 2), self.queue_cfg.get("overflow", MERGE)),
+        )
+        self.sessions[session_id] = session
+        return session
+
+    def close_session(self, session_id: str) -> None:
+        session = self.sessions.pop(session_id, None)
+        if session is not None:
+            session.inputs.clear()
+            self.scheduler.forget(session_id)
+
+    def expire_idle(self, ttl_s: float) -> None:
+        now = time.monotonic()
+        for session_id, session in list(self.sessions.items()):
+            if not session.sockets and not session.busy and now - session.last_active > ttl_s:
+                self.close_session(session_id)
+
+    async def warm_up(self) -> None:
+        """
+        Compile and warm up the engines (config ``warmup``) as scheduler
+        jobs, the LLM through the batcher, so they never run an engine
+        call concurrently with a session's.
+        """
+        jobs = [self.scheduler(lambda: prepare_engine(self.llm.engine, "llm", via=self.llm),
+                               session_id="warmup", kind="chat")]
+        if self.images is not None:
+            jobs.append(self.images.warm_up())
+        results = await asyncio.gather(*jobs, return_exceptions=True)
+        for kind, result in zip(("llm", "image"), results):
+            self.warmup[kind] = None if isinstance(result, BaseException) else result
+
+    # ------------- Turns --------------------------------------------------------
+    async def submit(self, session: ClassroomSession, text: str, emit) -> None:
+        """WebSocket input: start a turn, or queue/merge it behind the running one."""
+        turn_id = get_tracer().new_turn_id()
+        if not session.busy:
+            await self.run_turn(session, text, emit, turn_id)
+            await self._drain(session, emit)
+            return
+        try:
+            status = session.inputs.put(text, turn_id)
+        except QueueFull:
+            self.rejected_turns += 1
+            await emit({"type": "busy", "turn_id": turn_id, "reason": "queue_full"})
+            return
+        await emit({"type": status, "turn_id": turn_id, "depth": len(session.inputs)})
+
+    async def _drain(self, session: ClassroomSession, emit) -> None:
+        while not session.busy:
+            item = session.inputs.pop()
+            if item is None:
+                return
+            text, turn_id, wait_ms = item
+            get_tracer().record("queue_wait", wait_ms, turn_id, lane="input", session=session.session_id)
+            get_metrics().histogram("queue_wait_seconds", "Time jobs wait in the scheduler").observe(
+                wait_ms / 1000, lane="input")
+            await self.run_turn(session, text, emit, turn_id)
+
+    async def run_turn(self, session: ClassroomSession, text: str, emit, turn_id: Optional[str] = None) -> None:
+        """Run one turn now, passing every payload to ``await emit(payload)``."""
+        tracer = get_tracer()
+        turn_id = turn_id or tracer.new_turn_id()
+        if session.busy:
+            self.rejected_turns += 1
+            await emit({"type": "busy", "turn_id": turn_id, "reason": "session"})
+            return
+
+        session.busy = True
+        session.last_active = time.monotonic()
+        try:
+            with tracer.span("turn", turn_id, session=session.session_id):
+                async for event in session.story.submit(text, turn_id=turn_id):
+                    await emit(event.to_payload())
+                    if event.type in ("story_line", "ai_suggestion"):
+                        page_idx = session.add_segment(event.text)
+                        if page_idx is not None:
+                            self._illustrate(session, page_idx, turn_id)
+        finally:
+            session.busy = False
+            session.last_active = time.monotonic()
+        await emit({"type": "turn_done", "turn_id": turn_id})
+
+    def _illustrate(self, session: ClassroomSession, page_idx: int, turn_id: str) -> None:
+        if self.images is None:
+            return
+        prompt = format_helper.first_sentence(session.pages[page_idx][ILLUSTRATE_AT - 1])
+        prompt += " children's picture book"
+        # Fresh noise per illustration (as the desktop app does): a fixed seed per page
+        # index would give every tablet's page N the same composition
+        seed = session.seeds[page_idx] = random.randrange(2**31)
+        self._spawn(self._render_page(session, page_idx, prompt, seed, turn_id))
+
+    async def _render_page(self, session: ClassroomSession, page_idx: int, prompt: str, seed: int,
+                           turn_id: str) -> None:
+        def on_step(done, total):
+            self._spawn(session.broadcast(
+                {"type": "image_progress", "page_idx": page_idx, "step": done, "steps": total}))
+
+        try:
+            name = await self.images.generate(prompt, f"{session.session_id}-{page_idx}.png",
+                                              session_id=session.session_id, seed=seed,
+                                              turn_id=turn_id, on_step=on_step)
+        except (QueueFull, Superseded):
+            await session.broadcast({"type": "image_skipped", "page_idx": page_idx})
+            return
+        except Exception as e:
+            print(f"[server] illustration failed: {e!r}")
+            await session.broadcast({"type": "image_error", "page_idx": page_idx, "error": str(e)})
+            return
+        session.images[page_idx] = name
+        await session.broadcast({"type": "image_ready", "page_idx": page_idx, "url": f"/images/{name}"})
+
+    def _spawn(self, coro) -> None:
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def stats(self) -> dict:
+        return {
+            "sessions": len(self.sessions),
+            "max_sessions": self.max_sessions,
+            "busy_sessions": sum(s.busy for s in self.sessions.values()),
+            "queued_inputs": sum(len(s.inputs) for s in self.sessions.values()),
+            "rejected_turns": self.rejected_turns,
+            "queues": self.scheduler.stats(),
+            "llm": self.llm.stats(),
+            "warmup": self.warmup,
+        }
+
+    def close(self) -> None:
+        self.llm.close()
+        self.scheduler.shutdown()
+
+
+# ════════════════════════════════════════════════════════════════════
+# HTTP / WebSocket handlers
+# ════════════════════════════════════════════════════════════════════
+routes = web.RouteTableDef()
+
+
+def _server(request: web.Request) -> StoryServer:
+    return request.app["story_server"]
+
+
+def _session(request: web.Request) -> ClassroomSession:
+    session = _server(request).sessions.get(request.match_info["session_id"])
+    if session is None:
+        raise web.HTTPNotFound(reason="unknown session")
+    return session
+
+
+@routes.get("/health")
+async def health(request: web.Request) -> web.Response:
+    return web.json_response(_server(request).stats())
+
+
+@routes.get("/metrics")
+async def metrics(request: web.Request) -> web.Response:
+    """Prometheus scrape endpoint."""
+    server = _server(request)
+    registry = get_metrics()
+    registry.gauge("sessions", "Open sessions").set(len(server.sessions))
+    registry.gauge("busy_sessions", "Sessions running a turn").set(sum(s.busy for s in server.sessions.values()))
+    registry.gauge("queued_inputs", "Inputs waiting behind a running turn").set(
+        sum(len(s.inputs) for s in server.sessions.values()))
+    for lane, stats in server.scheduler.stats().items():
+        registry.gauge("queue_depth", "Queued jobs per lane").set(stats["depth"], lane=lane)
+    return web.Response(text=registry.render_prometheus(), content_type="text/plain", charset="utf-8")
+
+
+@routes.post("/sessions")
+async def create_session(request: web.Request) -> web.Response:
+    body = await request.json() if request.can_read_body else {}
+    session = _server(request).create_session(body.get("story"))
+    if session is None:
+        raise web.HTTPServiceUnavailable(reason="classroom is full")
+    return web.json_response({"session_id": session.session_id}, status=201)
+
+
+@routes.get("/sessions/{session_id}")
+async def get_session(request: web.Request) -> web.Response:
+    return web.json_response(_session(request).to_json())
+
+
+@routes.delete("/sessions/{session_id}")
+async def delete_session(request: web.Request) -> web.Response:
+    session = _session(request)
+    for ws in list(session.sockets):
+        await ws.close()
+    _server(request).close_session(session.session_id)
+    return web.json_response({"deleted": session.session_id})
+
+
+@routes.post("/sessions/{session_id}/turns")
+async def post_turn(request: web.Request) -> web.Response:
+    session = _session(request)
+    text = ((await request.json()).get("text") or "").strip()
+    if not text:
+        raise web.HTTPBadRequest(reason="text is required")
+    events: List[dict] = []
+
+    async def collect(payload):
+        if payload["type"] != "token":
+            events.append(payload)
+
+    await _server(request).run_turn(session, text, collect)
+    status = 429 if events and events[0]["type"] == "busy" else 200
+    return web.json_response({"events": events}, status=status)
+
+
+@routes.get("/sessions/{session_id}/ws")
+async def session_ws(request: web.Request) -> web.WebSocketResponse:
+    session = _session(request)
+    server = _server(request)
+    ws = web.WebSocketResponse(heartbeat=30)
+    await ws.prepare(request)
+    session.sockets.add(ws)
+    try:
+        async for msg in ws:
+            if msg.type != WSMsgType.TEXT:
+                continue
+            try:
+                data = msg.json()
+            except ValueError:
+                await ws.send_json(StoryEvent("error", "invalid JSON").to_payload())
+                continue
+            if data.get("type") == "submit" and (data.get("text") or "").strip():
+                # Turns run as tasks so the socket keeps reading (later inputs are queued);
+                # events go to every tablet attached to the session
+                server._spawn(server.submit(session, data["text"].strip(), session.broadcast))
+    finally:
+        session.sockets.discard(ws)
+        session.last_active = time.monotonic()
+    return ws
+
+
+async def _expire_sessions(app: web.Application) -> None:
+    server: StoryServer = app["story_server"]
+    ttl_s = server.cfg.get("session_ttl_min", 60) * 60
+    while True:
+        await asyncio.sleep(60)
+        server.expire_idle(ttl_s)
+
+
+async def _on_startup(app: web.Application) -> None:
+    app["expire_task"] = asyncio.ensure_future(_expire_sessions(app))
+    app["warmup_task"] = asyncio.ensure_future(app["story_server"].warm_up())
+
+
+async def _on_cleanup(app: web.Application) -> None:
+    app["expire_task"].cancel()
+    app["warmup_task"].cancel()
+    app["story_server"].close()
+    stop_metrics()
+
+
+def build_app(server: StoryServer) -> web.Application:
+    app = web.Application()
+    app["story_server"] = server
+    app.add_routes(routes)
+    if server.images is not None:
+        app.router.add_static("/images/", server.images.images_dir)
+    app.on_startup.append(_on_startup)
+    app.on_cleanup.append(_on_cleanup)
+    return app
+
+
+# ════════════════════════════════════════════════════════════════════
+# main
+# ════════════════════════════════════════════════════════════════════
+def main() -> None:
+    cfg = load_config().get("server") or {}
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=cfg.get("host", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=cfg.get("port", 8765))
+    parser.add_argument("--stub", action="store_true",
+                        help="use fake_engines with fast settings (no weights, no network)")
+    parser.add_argument("--no-images", action="store_true", help="don't illustrate pages")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    if args.stub:
+        # Fake engines don't use torch thread pools; nothing to schedule
+        from core.cpu_scheduler import disable_cpu_scheduler
+        from fake_engines import FakeImageEngine, FakeLLMEngine
+        disable_cpu_scheduler()
+        llm = FakeLLMEngine(latency_ms=20, tokens_per_s=200)
+        image_engine = None if args.no_images else FakeImageEngine(step_ms=10, size=256)
+    else:
+        from core.llm_factory import get_image_engine, get_llm_engine
+        llm = get_llm_engine()
+        image_engine = None if args.no_images else get_image_engine()
+    print(f"[server] engines ready in {time.perf_counter() - t0:.1f} s")
+
+    start_metrics("server")
+    server = StoryServer(llm, image_engine, cfg, load_config().get("queue"))
+    web.run_app(build_app(server), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
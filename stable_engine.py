@@ -1,13 +1,95 @@
 # ── Diffusers / Torch
+import gc
+import threading
+from collections import OrderedDict
 import torch
-from diffusers import StableDiffusionPipeline
+from diffusers import StableDiffusionImg2ImgPipeline, StableDiffusionPipeline, UNet2DConditionModel
 from pathlib import Path
-from typing import Optional, Union
+from typing import Dict, Optional, Tuple, Union
+
+from core.metrics import get_metrics
+from core.profiling import profiled
+
+
+# ════════════════════════════════════════════════════════════════════
+# Memory modes
+# ════════════════════════════════════════════════════════════════════
+# Each preset is a set of switches; individual switches can still be
+# overridden from config/config.yaml (image.memory).
+MEMORY_MODES: Dict[str, Dict[str, bool]] = {
+    "default": {},
+    "balanced": {
+        "attention_slicing": True,
+        "vae_slicing": True,
+    },
+    "low": {
+        "attention_slicing": True,
+        "vae_slicing": True,
+        "vae_tiling": True,
+        "cpu_bf16": True,
+    },
+    "minimal": {
+        "attention_slicing": True,
+        "vae_slicing": True,
+        "vae_tiling": True,
+        "cpu_bf16": True,
+        "sequential_cpu_offload": True,
+        "unload_unet": True,
+    },
+}
+
+_MEMORY_SWITCHES = (
+    "attention_slicing",
+    "vae_slicing",
+    "vae_tiling",
+    "cpu_bf16",
+    "sequential_cpu_offload",
+    "unload_unet",
+)
+
+
+def resolve_memory_options(mode: str = "default", overrides: Optional[dict] = None) -> Dict[str, bool]:
+    """Merge a named memory *mode* with explicit per-switch *overrides*."""
+    if mode not in MEMORY_MODES:
+        raise ValueError(f"Unknown memory mode: {mode} (expected one of {list(MEMORY_MODES)})")
+
+    options = {name: False for name in _MEMORY_SWITCHES}
+    options.update(MEMORY_MODES[mode])
+    for name, value in (overrides or {}).items():
+        if name not in options:
+            raise ValueError(f"Unknown memory option: {name}")
+        options[name] = bool(value)
+    return options
+
+
+def _cpu_supports_bf16() -> bool:
+    """
+    True if the CPU computes bf16 in hardware (x86 AVX512-BF16 / AMX-BF16,
+    ARM BF16).  A test matmul is no use here: torch emulates bf16 on any
+    CPU, and emulated bf16 is slower than fp32.
+    """
+    cpu = getattr(torch._C, "_cpu", None)
+    for probe in ("_is_avx512_bf16_supported", "_is_amx_tile_supported"):
+        if cpu is not None and hasattr(cpu, probe) and getattr(cpu, probe)():
+            return True
+    try:
+        with open("/proc/cpuinfo", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith(("flags", "Features")):
+                    flags = set(line.split(":", 1)[1].split())
+                    return bool(flags & {"avx512_bf16", "amx_bf16", "bf16"})
+    except OSError:
+        pass
+    return False
 
 
 class StableV15Engine:
     """
-    Wraps the Stable Diffusion v1‑5 pipeline and exposes generate_image().
+    Wraps the Stable Diffusion v1‑5 pipeline and exposes generate_image().
+
+    *memory_mode* selects one of MEMORY_MODES; *memory_options* overrides
+    single switches of that preset.  Text-encoder outputs are kept in an LRU
+    of *embed_cache_size* entries keyed by prompt text (0 disables it).
     """
 
     def __init__(
@@ -15,16 +97,140 @@ class StableV15Engine:
         model_id: str = "sd-legacy/stable-diffusion-v1-5",
         device: Optional[str] = None,
         dtype: Optional[torch.dtype] = None,
+        memory_mode: str = "default",
+        memory_options: Optional[dict] = None,
+        embed_cache_size: int = 64,
     ):
+        self.memory_options = resolve_memory_options(memory_mode, memory_options)
         device = device or ("cuda" if torch.cuda.is_available() else "cpu")
-        dtype = dtype or (torch.float16 if device.startswith("cuda") else torch.float32)
+        if dtype is None:
+            if device.startswith("cuda"):
+                dtype = torch.float16
+            elif self.memory_options["cpu_bf16"] and _cpu_supports_bf16():
+                dtype = torch.bfloat16
+            else:
+                dtype = torch.float32
+
+        self.model_id = model_id
+        self.device = device
+        self.dtype = dtype
+
+        self.compile_mode: Optional[str] = None    # set by compile()
+        self.embed_cache_size = embed_cache_size
+        self._embed_cache: "OrderedDict[str, torch.Tensor]" = OrderedDict()
+        self._embed_lock = threading.Lock()
+
+        # Sequential offload streams weights from CPU to the GPU per submodule;
+        # on a CPU-only box the weights already live in RAM, so it is a no-op.
+        if self.memory_options["sequential_cpu_offload"] and not device.startswith("cuda"):
+            print("[StableV15Engine] sequential_cpu_offload needs CUDA; ignored on CPU.")
+            self.memory_options["sequential_cpu_offload"] = False
 
         # Load & move to device
         self.pipe = StableDiffusionPipeline.from_pretrained(model_id, torch_dtype=dtype)
-        self.pipe.to(device)            #  ← no .eval() needed
+        self._img2img: Optional[StableDiffusionImg2ImgPipeline] = None
+        if not self.memory_options["sequential_cpu_offload"]:
+            self.pipe.to(device)        #  ← no .eval() needed
+        self._apply_memory_options()
+
+    # ------------- Memory management ------------------------------------------
+    def _apply_memory_options(self) -> None:
+        opts = self.memory_options
+        if opts["sequential_cpu_offload"]:
+            self.pipe.enable_sequential_cpu_offload()
+        if opts["attention_slicing"]:
+            self.pipe.enable_attention_slicing()
+        if opts["vae_slicing"]:
+            self.pipe.vae.enable_slicing()
+        if opts["vae_tiling"]:
+            self.pipe.vae.enable_tiling()
+
+    def unload_unet(self) -> None:
+        """Drop the UNet weights (the largest submodule) until the next illustration."""
+        if self.pipe.unet is None:
+            return
+        self.pipe.unet = None
+        self._img2img = None
+        gc.collect()
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+
+    def load_unet(self) -> None:
+        """Reload the UNet if it was dropped by unload_unet()."""
+        if self.pipe.unet is not None:
+            return
+        unet = UNet2DConditionModel.from_pretrained(
+            self.model_id, subfolder="unet", torch_dtype=self.dtype
+        )
+        if not self.memory_options["sequential_cpu_offload"]:
+            unet.to(self.device)
+        self.pipe.unet = unet
+        self._apply_memory_options()
+        self._compile_unet()
 
+    def compile(self, mode: str = "default") -> None:
+        """torch.compile the UNet (again after every load_unet()); graphs are built on the first image."""
+        if self.memory_options["sequential_cpu_offload"]:
+            raise RuntimeError("torch.compile does not work with sequential_cpu_offload")
+        self.compile_mode = mode
+        self._compile_unet()
+
+    def _compile_unet(self) -> None:
+        if self.compile_mode is not None and self.pipe.unet is not None:
+            self.pipe.unet = torch.compile(self.pipe.unet, mode=self.compile_mode)
+
+    # ------------- Prompt embeddings ------------------------------------------
     @torch.inference_mode()
-    def generate_image(
+    def encode_prompt(self, text: str) -> torch.Tensor:
+        """
+        Return the CLIP text embedding of *text*, shape (1, 77, 768).
+
+        Results are cached by exact text; pass "" for the unconditional
+        embedding used when no negative prompt is given.
+        """
+        with self._embed_lock:
+            cached = self._embed_cache.get(text)
+            if cached is not None:
+                self._embed_cache.move_to_end(text)
+                get_metrics().counter("cache_hits_total", "Cache hits").inc(cache="prompt_embeds")
+                return cached
+        get_metrics().counter("cache_misses_total", "Cache misses").inc(cache="prompt_embeds")
+
+        embeds, _ = self.pipe.encode_prompt(
+            text,
+            self.pipe._execution_device,
+            num_images_per_prompt=1,
+            do_classifier_free_guidance=False,
+        )
+
+        if self.embed_cache_size > 0:
+            with self._embed_lock:
+                self._embed_cache[text] = embeds
+                self._embed_cache.move_to_end(text)
+                while len(self._embed_cache) > self.embed_cache_size:
+                    self._embed_cache.popitem(last=False)
+        return embeds
+
+    def clear_embed_cache(self) -> None:
+        with self._embed_lock:
+            self._embed_cache.clear()
+
+    # ------------- Generation -------------------------------------------------
+    def _img2img_pipe(self) -> StableDiffusionImg2ImgPipeline:
+        # Shares every component with self.pipe, so no weights are copied.
+        # Rebuilt only when the UNet was reloaded in between.
+        if self._img2img is None or self._img2img.unet is not self.pipe.unet:
+            self._img2img = StableDiffusionImg2ImgPipeline(**self.pipe.components)
+        return self._img2img
+
+    def generate_image(self, prompt: str, **kwargs):
+        """Text‑to‑image; returns a PIL image.  See generate_image_with_latents()."""
+        image, _ = self.generate_image_with_latents(prompt, **kwargs)
+        return image
+
+    @profiled("image_generate")
+    @torch.inference_mode()
+    def generate_image_with_latents(
         self,
         prompt: str,
         *,
@@ -34,27 +240,68 @@ class StableV15Engine:
         height: int = 512,
         width: int = 512,
         seed: Optional[int] = None,
+        prompt_embeds: Optional[torch.Tensor] = None,
+        negative_prompt_embeds: Optional[torch.Tensor] = None,
+        init_latents: Optional[torch.Tensor] = None,
+        strength: float = 0.6,
         **kwargs,
-    ):
+    ) -> Tuple[object, torch.Tensor]:
+        """
+        Generate one image and return ``(PIL image, latents)``.
+
+        The returned latents (on CPU, already scaled by the VAE scaling
+        factor) can be passed back as *init_latents* for the next page: the
+        run then starts from a noised copy of them at *strength* and only
+        executes ``int(num_inference_steps * strength)`` denoising steps.
+        """
+        # Precomputed embeddings skip the text encoder entirely; otherwise
+        # both sides go through the LRU.
+        if prompt_embeds is None:
+            prompt_embeds = self.encode_prompt(prompt)
+        if guidance_scale > 1.0 and negative_prompt_embeds is None:
+            negative_prompt_embeds = self.encode_prompt(negative_prompt or "")
+
+        self.load_unet()
         generator = (
             torch.Generator(device=self.pipe.device).manual_seed(seed) if seed is not None else None
         )
-        result = self.pipe(
-            prompt=prompt,
-            negative_prompt=negative_prompt,
+        common = dict(
+            prompt_embeds=prompt_embeds,
+            negative_prompt_embeds=negative_prompt_embeds,
             num_inference_steps=num_inference_steps,
             guidance_scale=guidance_scale,
-            height=height,
-            width=width,
             generator=generator,
+            output_type="latent",
             **kwargs,
         )
-        return result.images[0]
+        try:
+            if init_latents is None:
+                latents = self.pipe(height=height, width=width, **common).images
+            else:
+                # A 4‑channel tensor is taken as latents by the img2img pipeline
+                init = init_latents.to(self.pipe._execution_device, dtype=self.dtype)
+                latents = self._img2img_pipe()(image=init, strength=strength, **common).images
+            image = self.decode_latents(latents, generator=generator)
+        finally:
+            if self.memory_options["unload_unet"]:
+                self.unload_unet()
+        return image, latents.detach().to("cpu")
+
+    @torch.inference_mode()
+    def decode_latents(self, latents: torch.Tensor, generator: Optional[torch.Generator] = None):
+        """VAE‑decode *latents* and run the safety checker, like the pipeline does."""
+        pipe = self.pipe
+        image = pipe.vae.decode(
+            latents / pipe.vae.config.scaling_factor, return_dict=False, generator=generator
+        )[0]
+        image, has_nsfw_concept = pipe.run_safety_checker(image, pipe._execution_device, latents.dtype)
+        if has_nsfw_concept is None:
+            do_denormalize = [True] * image.shape[0]
+        else:
+            do_denormalize = [not has_nsfw for has_nsfw in has_nsfw_concept]
+        return pipe.image_processor.postprocess(image, output_type="pil", do_denormalize=do_denormalize)[0]
 
     @staticmethod
     def save_image(img, path: Union[str, Path]) -> None:
         Path(path).parent.mkdir(parents=True, exist_ok=True)
         img.save(path)
-
-
-
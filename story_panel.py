@@ -0,0 +1,103 @@
+# ── stdlib
+from typing import Dict, List, Optional, Sequence
+
+# ── Qt
+from PySide6.QtCore import QAbstractListModel, QModelIndex, Qt
+from PySide6.QtGui import QFont
+
+
+# ════════════════════════════════════════════════════════════════════
+# StoryPageModel (segments of one page, updated by diff)
+# ════════════════════════════════════════════════════════════════════
+class StoryPageModel(QAbstractListModel):
+    """
+    Rows of one story page for ``ui.chatList_2``.  set_segments() diffs the
+    new segment list against what is shown and emits only the row
+    inserts/removals/dataChanged that differ, so a reply that adds one
+    segment repaints one row.  An empty page shows *placeholder* instead.
+    """
+
+    def __init__(self, placeholder: Optional[str] = None, placeholder_font: Optional[QFont] = None,
+                 parent=None):
+        super().__init__(parent)
+        self.placeholder = placeholder
+        self.placeholder_font = placeholder_font
+        self._shown: List[Optional[str]] = self._rows([])     # rows the views know about
+
+    def _rows(self, segments: Sequence[str]) -> List[Optional[str]]:
+        # None marks the placeholder row
+        if segments:
+            return list(segments)
+        return [None] if self.placeholder is not None else []
+
+    def set_segments(self, segments: Sequence[str]) -> None:
+        old = self._shown
+        new = self._rows(segments)
+
+        # Rows change between begin*Rows and end*Rows only; rows that stay keep
+        # their old text until the insert/removal is done, then get dataChanged
+        if len(new) > len(old):
+            self.beginInsertRows(QModelIndex(), len(old), len(new) - 1)
+            self._shown = old + new[len(old):]
+            self.endInsertRows()
+        elif len(new) < len(old):
+            self.beginRemoveRows(QModelIndex(), len(new), len(old) - 1)
+            self._shown = old[:len(new)]
+            self.endRemoveRows()
+        self._shown = new
+
+        for row in range(min(len(old), len(new))):
+            if old[row] != new[row]:
+                idx = self.index(row)
+                self.dataChanged.emit(idx, idx)
+
+    # ------------- QAbstractListModel ------------------------------------------
+    def rowCount(self, parent=QModelIndex()) -> int:
+        if parent.isValid():
+            return 0
+        return len(self._shown)
+
+    def data(self, index: QModelIndex, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        text = self._shown[index.row()]
+        is_placeholder = text is None
+        if role == Qt.ItemDataRole.DisplayRole:
+            return self.placeholder if is_placeholder else text
+        if role == Qt.ItemDataRole.TextAlignmentRole:
+            return Qt.AlignmentFlag.AlignCenter
+        if role == Qt.ItemDataRole.FontRole and is_placeholder:
+            return self.placeholder_font
+        return None
+
+
+# ════════════════════════════════════════════════════════════════════
+# StoryPageCache
+# ════════════════════════════════════════════════════════════════════
+class StoryPageCache:
+    """
+    One StoryPageModel per page, created on first view and kept, so
+    previous/next page navigation is a setModel() on an already built
+    model (the view keeps its widgets and only re-lays out ≤ 4 rows).
+    """
+
+    def __init__(self, placeholder: Optional[str] = None, placeholder_font: Optional[QFont] = None,
+                 parent=None):
+        self.placeholder = placeholder
+        self.placeholder_font = placeholder_font
+        self.parent = parent
+        self._models: Dict[int, StoryPageModel] = {}
+
+    def model(self, page_idx: int, segments: Sequence[str]) -> StoryPageModel:
+        """Model for *page_idx*, brought up to date with *segments*."""
+        model = self._models.get(page_idx)
+        if model is None:
+            model = StoryPageModel(self.placeholder, self.placeholder_font, self.parent)
+            self._models[page_idx] = model
+        model.set_segments(segments)
+        return model
+
+    def clear(self) -> None:
+        for model in self._models.values():
+            model.deleteLater()
+        self._models.clear()
@@ -0,0 +1,66 @@
+# ── stdlib
+from typing import Dict
+
+# ── Qt
+from PySide6.QtCore import QObject, Qt, Signal
+from PySide6.QtWidgets import QLabel
+
+
+class _TraceBridge(QObject):
+    """Moves tracer callbacks (any thread) onto the GUI thread."""
+
+    spanRecorded = Signal(str, dict)
+
+
+# ════════════════════════════════════════════════════════════════════
+# TraceOverlay
+# ════════════════════════════════════════════════════════════════════
+class TraceOverlay(QLabel):
+    """Small translucent box in the top-right corner with the last turn's span breakdown."""
+
+    ORDER = ("tokenize", "prefill", "decode", "api_request", "json_parse", "turn",
+             "ui_update", "reply_visible", "diffusion", "image_handoff", "image_ui_update")
+
+    def __init__(self, tracer, parent):
+        super().__init__(parent)
+        self.setAttribute(Qt.WidgetAttribute.WA_TransparentForMouseEvents)
+        self.setStyleSheet("""
+            QLabel {
+                background: rgba(0, 0, 0, 0.6);
+                color: #e0f7fa;
+                border-radius: 8px;
+                padding: 6px 10px;
+                font-family: monospace;
+                font-size: 11px;
+            }
+        """)
+        self.setText("trace: waiting for a turn…")
+        self.adjustSize()
+
+        self._bridge = _TraceBridge(self)
+        self._bridge.spanRecorded.connect(self._on_span)
+        tracer.add_listener(self._bridge.spanRecorded.emit)
+        parent.installEventFilter(self)
+        self._reposition()
+        self.show()
+        self.raise_()
+
+    def _on_span(self, turn_id: str, breakdown: Dict[str, float]) -> None:
+        lines = [f"turn {turn_id}"]
+        for name in self.ORDER:
+            if name in breakdown:
+                lines.append(f"{name:<16}{breakdown[name]:>9.1f} ms")
+        if breakdown.get("tokens_per_s"):
+            lines.append(f"{'tokens/s':<16}{breakdown['tokens_per_s']:>9.1f}")
+        self.setText("\n".join(lines))
+        self.adjustSize()
+        self._reposition()
+
+    def _reposition(self) -> None:
+        parent = self.parentWidget()
+        self.move(parent.width() - self.width() - 12, 12)
+
+    def eventFilter(self, obj, event) -> bool:
+        if obj is self.parentWidget() and event.type() == event.Type.Resize:
+            self._reposition()
+        return False
@@ -0,0 +1,225 @@
+# ── stdlib
+import json
+import tempfile
+from array import array
+from collections import OrderedDict, deque
+from typing import Any, Dict, Optional
+
+# ── Qt
+from PySide6.QtCore import QAbstractListModel, QModelIndex, QPointF, QRectF, QSize, Qt
+from PySide6.QtGui import QColor, QFontMetrics, QPainter, QPen, QTextLayout, QTextOption
+from PySide6.QtWidgets import QStyle, QStyledItemDelegate
+
+
+def message_prefix(role: str, kind: Optional[str]) -> str:
+    if role == "user":
+        return "사용자"
+    if kind == "story_line":
+        return "AI (fixed)"
+    return "AI"
+
+
+# ════════════════════════════════════════════════════════════════════
+# TranscriptModel (chat messages, old ones paged out to disk)
+# ════════════════════════════════════════════════════════════════════
+class TranscriptModel(QAbstractListModel):
+    """
+    Chat transcript for ``ui.chatList``.  Appending a message is one
+    beginInsertRows/endInsertRows at the end of the list.
+
+    Only the newest *max_in_memory* messages are kept as Python objects;
+    older ones are written to an anonymous temp file in chunks and read
+    back (through a small LRU) only when scrolled into view.  The view
+    still sees every row, so scrolling and scrollToBottom behave the same.
+    """
+
+    RoleRole = Qt.ItemDataRole.UserRole + 1
+    KindRole = Qt.ItemDataRole.UserRole + 2
+    TextRole = Qt.ItemDataRole.UserRole + 3
+
+    SPILLED_CACHE = 256
+
+    def __init__(self, max_in_memory: int = 1000, parent=None):
+        super().__init__(parent)
+        self.max_in_memory = max(8, int(max_in_memory))
+        self._recent: "deque[tuple]" = deque()     # (role, kind, text)
+        self._spill = None                          # temp file, created on first spill
+        self._offsets = array("q")                  # file offset of each spilled row
+        self._cache: "OrderedDict[int, tuple]" = OrderedDict()
+
+    # ------------- Public API ---------------------------------------------------
+    def append(self, role: str, text: str, kind: Optional[str] = None) -> None:
+        row = self.rowCount()
+        self.beginInsertRows(QModelIndex(), row, row)
+        self._recent.append((role, kind, text))
+        self.endInsertRows()
+        if len(self._recent) > self.max_in_memory:
+            # Spill a quarter at a time so the file is touched rarely
+            self._spill_oldest(self.max_in_memory // 4)
+
+    def extend(self, messages) -> None:
+        """Append many ``{"role", "text", "kind"}`` dicts with a single insert (story loading)."""
+        messages = [(m["role"], m.get("kind"), m["text"]) for m in messages]
+        if not messages:
+            return
+        row = self.rowCount()
+        self.beginInsertRows(QModelIndex(), row, row + len(messages) - 1)
+        self._recent.extend(messages)
+        self.endInsertRows()
+        overflow = len(self._recent) - self.max_in_memory
+        if overflow > 0:
+            self._spill_oldest(overflow)
+
+    def clear(self) -> None:
+        self.beginResetModel()
+        self._recent.clear()
+        self._offsets = array("q")
+        self._cache.clear()
+        if self._spill is not None:
+            self._spill.close()
+            self._spill = None
+        self.endResetModel()
+
+    def message(self, row: int) -> Dict[str, Any]:
+        role, kind, text = self._message(row)
+        return {"role": role, "kind": kind, "text": text}
+
+    # ------------- Paging -------------------------------------------------------
+    def _spill_oldest(self, n: int) -> None:
+        if self._spill is None:
+            self._spill = tempfile.TemporaryFile(prefix="transcript-", suffix=".jsonl")
+        f = self._spill
+        f.seek(0, 2)
+        lines = []
+        offset = f.tell()
+        for _ in range(min(n, len(self._recent))):
+            line = json.dumps(self._recent.popleft(), ensure_ascii=False).encode("utf-8") + b"\n"
+            self._offsets.append(offset)
+            offset += len(line)
+            lines.append(line)
+        f.write(b"".join(lines))
+        f.flush()
+
+    def _message(self, row: int) -> tuple:
+        spilled = len(self._offsets)
+        if row >= spilled:
+            return self._recent[row - spilled]
+
+        msg = self._cache.get(row)
+        if msg is not None:
+            self._cache.move_to_end(row)
+            return msg
+        self._spill.seek(self._offsets[row])
+        msg = tuple(json.loads(self._spill.readline()))
+        self._cache[row] = msg
+        if len(self._cache) > self.SPILLED_CACHE:
+            self._cache.popitem(last=False)
+        return msg
+
+    # ------------- QAbstractListModel ------------------------------------------
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._offsets) + len(self._recent)
+
+    def data(self, index: QModelIndex, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        who, kind, text = self._message(index.row())
+        if role == Qt.ItemDataRole.DisplayRole:
+            return f"{message_prefix(who, kind)}: {text}"
+        if role == Qt.ItemDataRole.ToolTipRole:
+            return text
+        if role == self.RoleRole:
+            return who
+        if role == self.KindRole:
+            return kind
+        if role == self.TextRole:
+            return text
+        return None
+
+
+# ════════════════════════════════════════════════════════════════════
+# ChatBubbleDelegate
+# ════════════════════════════════════════════════════════════════════
+class ChatBubbleDelegate(QStyledItemDelegate):
+    """
+    Paints each message as a rounded bubble (the look the old
+    ``QListWidget::item`` stylesheet gave) with at most *max_lines* lines;
+    longer messages are elided and shown in full as a tooltip.
+
+    Every row has the same height, so the view can run with
+    setUniformItemSizes(True) and never measures rows it does not paint.
+    """
+
+    PADDING_X, PADDING_Y, MARGIN_Y = 15, 12, 4
+    RADIUS = 8
+
+    BG = (QColor(90, 119, 236, 26), QColor(90, 119, 236, 51), QColor(90, 119, 236, 77))
+    BORDER = (QColor(90, 119, 236, 51), QColor(90, 119, 236, 102), QColor(90, 119, 236, 128))
+    TEXT = QColor("#333333")
+
+    def __init__(self, max_lines: int = 3, parent=None):
+        super().__init__(parent)
+        self.max_lines = max(1, int(max_lines))
+        self._row_height = {}       # font key -> row height
+
+    def _height(self, option) -> int:
+        key = option.font.key()
+        h = self._row_height.get(key)
+        if h is None:
+            fm = QFontMetrics(option.font)
+            h = self.max_lines * fm.lineSpacing() + 2 * (self.PADDING_Y + self.MARGIN_Y)
+            self._row_height[key] = h
+        return h
+
+    def sizeHint(self, option, index) -> QSize:
+        return QSize(option.rect.width(), self._height(option))
+
+    def paint(self, painter: QPainter, option, index) -> None:
+        state = 0
+        if option.state & QStyle.StateFlag.State_Selected:
+            state = 2
+        elif option.state & QStyle.StateFlag.State_MouseOver:
+            state = 1
+
+        bubble = QRectF(option.rect).adjusted(0.5, self.MARGIN_Y + 0.5, -0.5, -self.MARGIN_Y - 0.5)
+        painter.save()
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        painter.setPen(QPen(self.BORDER[state], 1))
+        painter.setBrush(self.BG[state])
+        painter.drawRoundedRect(bubble, self.RADIUS, self.RADIUS)
+
+        painter.setPen(self.TEXT)
+        painter.setFont(option.font)
+        text_rect = bubble.adjusted(self.PADDING_X, self.PADDING_Y - self.MARGIN_Y,
+                                    -self.PADDING_X, -(self.PADDING_Y - self.MARGIN_Y))
+        self._draw_text(painter, text_rect, index.data(Qt.ItemDataRole.DisplayRole) or "", option.font)
+        painter.restore()
+
+    def _draw_text(self, painter: QPainter, rect: QRectF, text: str, font) -> None:
+        """Word-wrap *text* into *rect*, eliding the last visible line."""
+        fm = QFontMetrics(font)
+        layout = QTextLayout(text, font)
+        text_option = QTextOption()
+        text_option.setWrapMode(QTextOption.WrapMode.WrapAtWordBoundaryOrAnywhere)
+        layout.setTextOption(text_option)
+
+        width = rect.width()
+        lines = []
+        layout.beginLayout()
+        while len(lines) < self.max_lines:
+            line = layout.createLine()
+            if not line.isValid():
+                break
+            line.setLineWidth(width)
+            line.setPosition(QPointF(0, len(lines) * fm.lineSpacing()))
+            lines.append(line)
+        layout.endLayout()
+
+        for i, line in enumerate(lines):
+            start, length = line.textStart(), line.textLength()
+            if i == len(lines) - 1 and start + length < len(text):
+                rest = text[start:].replace("\n", " ")
+                painter.drawText(QPointF(rect.left(), rect.top() + line.y() + fm.ascent()),
+                                 fm.elidedText(rest, Qt.TextElideMode.ElideRight, int(width)))
+            else:
+                line.draw(painter, rect.topLeft())
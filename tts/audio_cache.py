@@ -0,0 +1,49 @@
+import hashlib
+import sys
+from pathlib import Path
+from typing import Optional
+
+from core.metrics import get_metrics
+
+
+# ════════════════════════════════════════════════════════════════════
+# NarrationCache (content-addressed audio files)
+# ════════════════════════════════════════════════════════════════════
+class NarrationCache:
+    """
+    Pre‑rendered narration files keyed by ``sha256(voice, rate, text)``.
+
+    Files are written under a temporary name and renamed into place, so a
+    path returned by get() is always complete.
+    """
+
+    # pyttsx3 writes AIFF with the macOS driver and WAV elsewhere
+    EXT = ".aiff" if sys.platform == "darwin" else ".wav"
+
+    def __init__(self, cache_dir: str = "cache/tts"):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def key(text: str, voice: Optional[str], rate: int) -> str:
+        h = hashlib.sha256()
+        h.update(f"{voice or ''}\0{rate}\0".encode("utf-8"))
+        h.update(text.strip().encode("utf-8"))
+        return h.hexdigest()
+
+    def path_for(self, text: str, voice: Optional[str], rate: int) -> Path:
+        k = self.key(text, voice, rate)
+        return self.cache_dir / k[:2] / (k + self.EXT)
+
+    def get(self, text: str, voice: Optional[str], rate: int) -> Optional[Path]:
+        path = self.path_for(text, voice, rate)
+        if path.exists() and path.stat().st_size > 0:
+            get_metrics().counter("cache_hits_total", "Cache hits").inc(cache="narration")
+            return path
+        get_metrics().counter("cache_misses_total", "Cache misses").inc(cache="narration")
+        return None
+
+    def temp_path_for(self, text: str, voice: Optional[str], rate: int) -> Path:
+        path = self.path_for(text, voice, rate)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        return path.with_name(path.stem + ".part" + self.EXT)
@@ -1,7 +1,203 @@
+import itertools
+import queue
+import re
+import threading
+from typing import List, Optional
+
 import pyttsx3
+from PySide6.QtCore import QObject, Signal
+
 
 def speech(text: str):
     engine = pyttsx3.init()
     engine.setProperty("rate", 160)  # 말하기 속도 조정
     engine.say(text)                 # 전달받은 문자열 읽기
     engine.runAndWait()              # 실행
+
+
+def split_sentences(text: str) -> List[str]:
+    """Split *text* after '.', '?' or '!' (keeping the terminator)."""
+    parts = re.split(r"(?<=[.?!])\s+", text.strip())
+    return [p for p in parts if p]
+
+
+# ════════════════════════════════════════════════════════════════════
+# SpeechService (persistent TTS thread)
+# ════════════════════════════════════════════════════════════════════
+class SpeechService(QObject):
+    """
+    Owns one pyttsx3 engine on a dedicated thread and speaks queued
+    utterances sentence by sentence, so the UI never blocks and the first
+    sentence starts before the rest is processed.
+
+    With a NarrationCache, render() pre‑renders text to audio files at low
+    priority (live speech always goes first), and speak() plays a cached
+    file instantly instead of synthesizing.
+
+    Signals are emitted from the TTS thread and delivered queued to
+    receivers on the GUI thread.  speak()/stop() must be called from the
+    GUI thread (cached playback uses a QMediaPlayer).
+    """
+
+    sentenceStarted = Signal(int, int, str)    # utterance id, sentence index, sentence
+    wordStarted = Signal(int, int, int, int)   # utterance id, sentence index, char offset, length
+    utteranceFinished = Signal(int, bool)      # utterance id, completed (False = skipped)
+    audioRendered = Signal(str, str)           # text, audio file path
+
+    _SPEAK, _RENDER = 0, 1                     # queue priorities
+
+    def __init__(self, rate: int = 160, voice: Optional[str] = None, cache=None):
+        super().__init__()
+        self.rate = rate
+        self.voice = voice
+        self.cache = cache                     # tts.audio_cache.NarrationCache | None
+
+        self._queue: "queue.PriorityQueue" = queue.PriorityQueue()
+        self._seq = itertools.count()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._cancel_below = 0          # utterance ids < this are dropped (stop())
+        self._skip_ids = set()          # single utterances to drop (skip())
+        self._current = (0, 0)          # (utterance id, sentence index) being spoken
+        self._engine = None
+
+        self._player = None
+        self._audio_output = None
+        self._playing_uid = 0
+
+        self._thread = threading.Thread(target=self._run, name="tts-service", daemon=True)
+        self._thread.start()
+
+    # ------------- Public API ---------------------------------------------------
+    def speak(self, text: str, *, use_cache: bool = True) -> int:
+        """Queue *text* (or play its cached audio) and return its utterance id; 0 if there is nothing to say."""
+        sentences = split_sentences(text)
+        if not sentences:
+            return 0
+        uid = next(self._ids)
+        cached = self.cache.get(text, self.voice, self.rate) if (use_cache and self.cache) else None
+        if cached is not None:
+            self._play_file(uid, text, str(cached))
+            return uid
+
+        for idx, sentence in enumerate(sentences):
+            self._put(self._SPEAK, ("speak", uid, idx, sentence, idx == len(sentences) - 1))
+        return uid
+
+    def render(self, text: str) -> None:
+        """Pre‑render *text* into the narration cache in the background."""
+        if self.cache is None or self.cache.get(text, self.voice, self.rate) is not None:
+            return
+        self._put(self._RENDER, ("render", text))
+
+    def skip(self, uid: Optional[int] = None) -> None:
+        """Drop the rest of utterance *uid* (default: the one being spoken)."""
+        with self._lock:
+            self._skip_ids.add(uid if uid is not None else self._current[0])
+
+    def stop(self) -> None:
+        """Interrupt the current utterance and drop everything queued (renders are kept)."""
+        with self._lock:
+            self._cancel_below = next(self._ids)
+        if self._player is not None and self._playing_uid:
+            self._player.stop()
+            self.utteranceFinished.emit(self._playing_uid, False)
+            self._playing_uid = 0
+
+    def shutdown(self) -> None:
+        self.stop()
+        self._queue.put((-1, next(self._seq), None))
+
+    # ------------- Cached playback (GUI thread) ---------------------------------
+    def _play_file(self, uid: int, text: str, path: str) -> None:
+        from PySide6.QtCore import QUrl
+        from PySide6.QtMultimedia import QAudioOutput, QMediaPlayer
+
+        if self._player is None:
+            self._player = QMediaPlayer(self)
+            self._audio_output = QAudioOutput(self)
+            self._player.setAudioOutput(self._audio_output)
+            self._player.mediaStatusChanged.connect(self._on_media_status)
+
+        if self._playing_uid:
+            self._player.stop()
+            self.utteranceFinished.emit(self._playing_uid, False)
+        self._playing_uid = uid
+        self._player.setSource(QUrl.fromLocalFile(path))
+        self.sentenceStarted.emit(uid, 0, text)
+        self._player.play()
+
+    def _on_media_status(self, status) -> None:
+        from PySide6.QtMultimedia import QMediaPlayer
+
+        if status == QMediaPlayer.MediaStatus.EndOfMedia and self._playing_uid:
+            uid, self._playing_uid = self._playing_uid, 0
+            self.utteranceFinished.emit(uid, True)
+
+    # ------------- TTS thread ---------------------------------------------------
+    def _put(self, priority: int, item: tuple) -> None:
+        self._queue.put((priority, next(self._seq), item))
+
+    def _cancelled(self, uid: int) -> bool:
+        with self._lock:
+            return uid < self._cancel_below or uid in self._skip_ids
+
+    def _on_word(self, name, location, length):
+        uid, idx = self._current
+        if not uid:
+            return                      # rendering to a file
+        if self._cancelled(uid):
+            # stop() is only safe from inside the engine loop
+            self._engine.stop()
+            return
+        self.wordStarted.emit(uid, idx, location, length)
+
+    def _render(self, text: str) -> None:
+        if self.cache.get(text, self.voice, self.rate) is not None:
+            return
+        tmp = self.cache.temp_path_for(text, self.voice, self.rate)
+        self._current = (0, 0)
+        self._engine.save_to_file(text, str(tmp))
+        self._engine.runAndWait()
+        if tmp.exists() and tmp.stat().st_size > 0:
+            final = self.cache.path_for(text, self.voice, self.rate)
+            tmp.replace(final)
+            self.audioRendered.emit(text, str(final))
+
+    def _run(self) -> None:
+        self._engine = pyttsx3.init()
+        self._engine.setProperty("rate", self.rate)
+        if self.voice:
+            self._engine.setProperty("voice", self.voice)
+        self._engine.connect("started-word", self._on_word)
+
+        while True:
+            _, _, item = self._queue.get()
+            if item is None:
+                break
+
+            if item[0] == "render":
+                try:
+                    self._render(item[1])
+                except Exception as e:
+                    print(f"[SpeechService] Failed to render narration: {e}")
+                continue
+
+            _, uid, idx, sentence, last = item
+            if self._cancelled(uid):
+                if last:
+                    with self._lock:
+                        self._skip_ids.discard(uid)
+                    self.utteranceFinished.emit(uid, False)
+                continue
+
+            self._current = (uid, idx)
+            self.sentenceStarted.emit(uid, idx, sentence)
+            self._engine.say(sentence)
+            self._engine.runAndWait()
+
+            if last:
+                completed = not self._cancelled(uid)
+                with self._lock:
+                    self._skip_ids.discard(uid)
+                self.utteranceFinished.emit(uid, completed)